@@ -0,0 +1,67 @@
+"""
+benchmark and accuracy check of the affiliation classifier, it use the labelled affiliations of
+fixtures/affiliations.tsv and compare the classifier with the old 'University' or 'Hospital' check
+---
+USAGE:
+    poetry run python benchmarks/bench_classifier.py [ --repeat 20000 ]
+"""
+import argparse
+import os
+import random
+import time
+
+from get_papers_list.classifier import AffiliationClassifier, ACADEMIC
+
+FIXTURE:str = os.path.join( os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'affiliations.tsv' )
+
+
+def read_fixture() -> list[tuple[str, str]]:
+    labelled:list[tuple[str, str]] = []
+    with open(FIXTURE, encoding='utf-8') as file:
+        for line in file:
+            if line.startswith('#') or line.strip() == '' : continue
+            label, affiliation = line.rstrip('\n').split('\t', 1)
+            labelled.append(( label, affiliation ))
+    return labelled
+
+
+def legacy_is_academic(affiliation:str) -> bool:
+    return 'University' in affiliation or 'Hospital' in affiliation
+
+
+def main() -> None:
+    parser:argparse.ArgumentParser = argparse.ArgumentParser(description='Benchmark the affiliation classifier.')
+    parser.add_argument('--repeat', type=int, default=20000, help='Number of affiliations classified for the timing (default: 20000).')
+    args:argparse.Namespace = parser.parse_args()
+
+    labelled:list[tuple[str, str]] = read_fixture()
+    classifier:AffiliationClassifier = AffiliationClassifier()
+
+    ## accuracy, the filter only care about academic or not
+    legacy:int = sum( 1 for label, affiliation in labelled if legacy_is_academic(affiliation) == ( label == ACADEMIC ) )
+    binary:int = sum( 1 for label, affiliation in labelled if classifier.is_academic(affiliation) == ( label == ACADEMIC ) )
+    exact:int = 0
+    for label, affiliation in labelled:
+        result:str = classifier.classify(affiliation)
+        if result == label:
+            exact += 1
+        else:
+            print(f'  expected {label:<8} got {result:<8} {affiliation}')
+    print(f'{len(labelled)} labelled affiliations')
+    print(f'academic or not   legacy {legacy / len(labelled):6.1%}   classifier {binary / len(labelled):6.1%}')
+    print(f'three classes                         classifier {exact / len(labelled):6.1%}')
+
+    ## speed, unique strings show the regex and repeated strings show the cache
+    unique:list[str] = [ f'{random.choice(labelled)[1]} {i}' for i in range(args.repeat) ]
+    repeated:list[str] = [ random.choice(labelled)[1] for _ in range(args.repeat) ]
+    for name, affiliations in ( ( 'unique', unique ), ( 'repeated', repeated ) ):
+        fresh:AffiliationClassifier = AffiliationClassifier()
+        start:float = time.perf_counter()
+        for affiliation in affiliations:
+            fresh.classify(affiliation)
+        elapsed:float = time.perf_counter() - start
+        print(f'{name:<9} {len(affiliations) / elapsed / 1000:10,.0f} affiliations/ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+benchmark of the memory of the parsed papers, it parse a synthetic medline file into a list of papers and
+report the memory held by the list ( tracemalloc ) for every paper and every author
+---
+USAGE:
+    poetry run python benchmarks/bench_memory.py [ --records 333334 ]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Iterator
+
+from get_papers_list.utils import Processor
+from get_papers_list.models import Paper
+from bench_parser import write_fixture
+
+
+def chunks(path:str) -> Iterator[str]:
+    with open(path) as file:
+        while chunk := file.read(64 * 1024):
+            yield chunk
+
+
+def main() -> None:
+    parser:argparse.ArgumentParser = argparse.ArgumentParser(description='Benchmark the memory of the parsed papers.')
+    parser.add_argument('--records', type=int, default=333334, help='Number of synthetic records, 3 authors each (default: 333334).')
+    args:argparse.Namespace = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path:str = os.path.join(directory, 'synthetic.medline')
+        write_fixture(path, args.records)
+        processor:Processor = Processor()
+        tracemalloc.start()
+        start:float = time.perf_counter()
+        papers:list[Paper] = list( processor.convertor( processor.rectifier( processor.lines( chunks(path) ) ) ) )
+        elapsed:float = time.perf_counter() - start
+        held, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    authors:int = sum( len(paper.authors) for paper in papers )
+    print(f'{len(papers)} papers, {authors} authors parsed in {elapsed:.3f} s')
+    print(f'held  {held / 2**20:8.1f} MB  {held / len(papers):8.0f} bytes/paper  {held / authors:8.0f} bytes/author')
+    print(f'peak  {peak / 2**20:8.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+benchmark of the parse and filter stage with 1 to N processes, it run Processor.runner on a synthetic
+medline file and write the csv into a temporary directory
+---
+USAGE:
+    poetry run python benchmarks/bench_parallel.py [ --records 100000 ] [ --max-workers 4 ]
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Iterator
+
+from get_papers_list.utils import Processor
+from bench_parser import write_fixture
+
+
+def chunks(path:str) -> Iterator[str]:
+    with open(path) as file:
+        while chunk := file.read(64 * 1024):
+            yield chunk
+
+
+def main() -> None:
+    parser:argparse.ArgumentParser = argparse.ArgumentParser(description='Benchmark the parse workers.')
+    parser.add_argument('--records', type=int, default=100000, help='Number of synthetic records (default: 100000).')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1, help='Largest number of workers (default: cpu count).')
+    args:argparse.Namespace = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path:str = os.path.join(directory, 'synthetic.medline')
+        lines:int = write_fixture(path, args.records)
+        print(f'{args.records} records, {lines} lines')
+
+        base:float = 0.0
+        outputs:list[bytes] = []
+        for workers in range(1, args.max_workers + 1):
+            output:str = os.path.join(directory, f'output-{workers}.csv')
+            start:float = time.perf_counter()
+            Processor(workers=workers).runner(chunks(path), output)
+            elapsed:float = time.perf_counter() - start
+            base = base or elapsed
+            with open(output, 'rb') as file:
+                outputs.append(file.read())
+            print(f'workers {workers:>3}  {elapsed:8.3f} s  {args.records / elapsed:>12,.0f} records/sec  {base / elapsed:5.2f}x')
+
+        ## every run has to give the same file
+        print('outputs are same' if all( output == outputs[0] for output in outputs ) else 'OUTPUTS ARE DIFFERENT')
+
+
+if __name__ == '__main__':
+    main()
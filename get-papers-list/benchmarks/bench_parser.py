@@ -0,0 +1,144 @@
+"""
+micro benchmark of the medline parsing core, it compare the old startswith/split parser with the
+fixed width tag dispatcher of Processor on a synthetic medline file
+---
+USAGE:
+    poetry run python benchmarks/bench_parser.py [ --records 100000 ]
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, Iterator
+
+from get_papers_list.utils import Processor
+
+
+def synthetic_record(i:int) -> str:
+    """
+    this function return a medline record that look like a real one ( same tags and line wrapping )
+    """
+    return (
+        f'PMID- {10000000 + i}\n'
+        'OWN - NLM\n'
+        'STAT- MEDLINE\n'
+        'LR  - 20240101\n'
+        'IS  - 1234-5678 (Electronic)\n'
+        'DP  - 2023 Jan\n'
+        f'TI  - A synthetic study number {i} of the effect of something on the other thing in a\n'
+        '      large cohort of patients\n'
+        f'LID - 10.1000/synthetic.{i} [doi]\n'
+        'AB  - Background: this is a long abstract that wrap on many lines like the real ones do\n'
+        '      and it has more words in it than any other field of the record so the rectifier\n'
+        '      has to join it.\n'
+        'FAU - Doe, John\n'
+        'AU  - Doe J\n'
+        'AD  - Pfizer Inc., New York, NY, USA. john.doe@pfizer.com\n'
+        'FAU - Roe, Jane\n'
+        'AU  - Roe J\n'
+        'AD  - Department of Medicine, Harvard University, Boston, MA, USA.\n'
+        'AD  - Massachusetts General Hospital, Boston, MA, USA.\n'
+        'FAU - Smith, Alan\n'
+        'AU  - Smith A\n'
+        'AD  - Novartis AG, Basel, Switzerland.\n'
+        'LA  - eng\n'
+        'PT  - Journal Article\n'
+        'JT  - Journal of Synthetic Results\n'
+        'MH  - Humans\n'
+        'MH  - *Neoplasms/drug therapy\n'
+        'EDAT- 2023/01/01 00:00\n'
+        'SO  - J Synth Res. 2023 Jan;1(1):1-10.\n'
+        '\n'
+    )
+
+
+def write_fixture(path:str, records:int) -> int:
+    """
+    this function write the synthetic medline file and return the number of lines in it
+    """
+    lines:int = 0
+    with open(path, 'w') as file:
+        file.write('\n')
+        for i in range(records):
+            record:str = synthetic_record(i)
+            lines += record.count('\n')
+            file.write(record)
+    return lines
+
+
+## this is the parser as it was before the tag dispatcher, kept here only for comparison
+def legacy_parse(medline_data:str) -> list[dict]:
+    rectified_data:list[str] = []
+    for line in medline_data.splitlines():
+        if line.startswith('      '):
+            rectified_data[-1] += line[4:]
+        else:
+            rectified_data.append(line)
+    papers:list[dict] = []
+    paper:dict = { "pubmedID": "", "DOP": "", "title": "", "authors": [] }
+    for line in rectified_data:
+        if ( line == '' or line == ' ' ) and paper != { "pubmedID": "", "DOP": "", "title": "", "authors": [] }:
+            papers.append(paper)
+            paper = { "pubmedID": "", "DOP": "", "title": "", "authors": [] }
+        else:
+            if line.startswith('PMID- '):
+                paper['pubmedID'] = line.split('PMID- ',1)[1].strip()
+            elif line.startswith('DP  - '):
+                paper['DOP'] = line.split('DP  - ',1)[1].strip()
+            elif line.startswith('TI  - '):
+                paper['title'] = line.split('TI  - ')[1].strip()
+            elif line.startswith('FAU - '):
+                paper['authors'].append({ 'name': line.split('FAU - ',1)[1].strip(), 'aff': '' })
+            elif line.startswith('AD  - ') and len(paper['authors']) != 0 and paper['authors'][-1]['aff'] == '':
+                aff = line.split('AD  - ',1)[1].strip()
+                if 'University' in aff or 'Hospital' in aff:
+                    paper['authors'].pop(-1)
+                else:
+                    paper['authors'][-1]['aff'] = aff
+    papers.append(paper)
+    return papers
+
+
+def run_legacy(path:str) -> int:
+    with open(path) as file:
+        return len(legacy_parse(file.read()))
+
+
+def run_dispatcher(path:str) -> int:
+    processor:Processor = Processor()
+
+    def chunks() -> Iterator[str]:
+        with open(path) as file:
+            while chunk := file.read(64 * 1024):
+                yield chunk
+
+    count:int = 0
+    for _ in processor.convertor_and_filter(processor.rectifier(processor.lines(chunks()))):
+        count += 1
+    return count
+
+
+def measure(name:str, func:Callable[ [str], int], path:str, lines:int) -> float:
+    start:float = time.perf_counter()
+    papers:int = func(path)
+    elapsed:float = time.perf_counter() - start
+    print(f'{name:<12} {papers:>9} papers  {elapsed:8.3f} s  {lines / elapsed:>14,.0f} lines/sec')
+    return elapsed
+
+
+def main() -> None:
+    parser:argparse.ArgumentParser = argparse.ArgumentParser(description='Benchmark the medline parser.')
+    parser.add_argument('--records', type=int, default=100000, help='Number of synthetic records (default: 100000).')
+    args:argparse.Namespace = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path:str = os.path.join(directory, 'synthetic.medline')
+        lines:int = write_fixture(path, args.records)
+        print(f'{args.records} records, {lines} lines')
+        before:float = measure('before', run_legacy, path, lines)
+        after:float = measure('after', run_dispatcher, path, lines)
+        print(f'speedup      {before / after:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
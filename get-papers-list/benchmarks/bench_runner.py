@@ -0,0 +1,63 @@
+"""
+benchmark of Processor.runner alone ( lines, rectifier, parse, filter and write ) on synthetic medline files,
+nothing is downloaded, every case run in a fresh process so the peak RSS is of the runner only
+---
+USAGE:
+    poetry run python benchmarks/bench_runner.py [ --sizes 1k,100k,1m ] [ --parse-workers 1 ] [ --format csv ]
+                                                 [ --json results.json ] [ --baseline results.json ]
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Any, Iterator
+
+from get_papers_list.utils import Processor
+from get_papers_list.writers import detect_format
+from bench_parser import write_fixture
+from fake_eutils import SIZES
+from harness import add_arguments, best, show, finish
+
+
+def chunks(path:str) -> Iterator[str]:
+    with open(path) as file:
+        while chunk := file.read(64 * 1024):
+            yield chunk
+
+
+def run_runner(
+    path:str,
+    records:int,
+    parse_workers:int,
+    format:str,
+) -> dict[ str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        output:str = os.path.join( directory, f'output.{detect_format("", format)}' )
+        start:float = time.perf_counter()
+        Processor( workers=parse_workers, format=format ).runner( chunks(path), output )
+        elapsed:float = time.perf_counter() - start
+    return { 'records': records, 'seconds': round(elapsed, 4), 'records_per_second': round(records / elapsed, 1) }
+
+
+def main() -> None:
+    parser:argparse.ArgumentParser = argparse.ArgumentParser(description='Benchmark Processor.runner on synthetic medline files.')
+    parser.add_argument('--sizes', type=str, default='1k,100k', help=f'Comma separated fixture sizes of {", ".join(SIZES)} (default: 1k,100k).')
+    parser.add_argument('--parse-workers', type=int, default=1, help='Processes that parse the papers (default: 1).')
+    parser.add_argument('--format', type=str, default='csv', help='Output format (default: csv).')
+    add_arguments(parser)
+    args:argparse.Namespace = parser.parse_args()
+
+    results:dict[ str, dict[ str, Any]] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes.split(','):
+            path:str = os.path.join( directory, f'{size}.medline' )
+            write_fixture( path, SIZES[size] )
+            name:str = f'runner/{size}/{args.format}/{args.parse_workers}'
+            results[name] = best( run_runner, args.repeat, path, SIZES[size], args.parse_workers, args.format )
+            show(name, results[name])
+            os.remove(path)
+    finish(results, args)
+
+
+if __name__ == '__main__':
+    main()
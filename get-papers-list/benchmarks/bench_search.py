@@ -0,0 +1,85 @@
+"""
+end to end benchmark of search(), the esearch and efetch requests go to the local fake eutils server
+( fake_eutils.py, started in its own process ) and the papers are written into a temporary file
+every case run in a fresh process, records/sec and peak RSS are reported and can be checked against a baseline
+---
+USAGE:
+    poetry run python benchmarks/bench_search.py [ --sizes 1k,100k ] [ --batch-size 500 ] [ --workers 3 ]
+                                                 [ --latency 0.05 ] [ --throttle 0.1 ] [ --rate 10 ] [ --gzip ]
+                                                 [ --compress gz|zst ] [ --json results.json ] [ --baseline results.json ]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from typing import Any
+
+from get_papers_list.utils import APIs, RateLimiter, search
+from get_papers_list.writers import detect_format
+from get_papers_list.metrics import METRICS
+from fake_eutils import SIZES, spawn
+from harness import add_arguments, best, show, finish
+
+
+def run_search(
+    url:str,
+    records:int,
+    batch_size:int,
+    workers:int,
+    parse_workers:int,
+    rate:float,
+    format:str,
+    compress:str,
+    metrics:bool,
+) -> dict[ str, Any]:
+    logging.disable(logging.CRITICAL)    ## the retries of the 429 log errors
+    if metrics : METRICS.enable()
+    apis:APIs = APIs( api_key='benchmark', workers=workers, base_url=url, retries=10 )
+    ## 0 mean no rate limit, so the time is the time of the tool and not of the NCBI limit
+    apis.rate_limiter = RateLimiter( rate, capacity=1 ) if rate > 0 else RateLimiter( 1e9, capacity=1e9 )
+    with tempfile.TemporaryDirectory() as directory:
+        filepath:str = os.path.join( directory, f'output.{detect_format("", format)}' + ( f'.{compress}' if compress else '' ) )
+        start:float = time.perf_counter()
+        search( 'benchmark', filepath=filepath, apis=apis, batch_size=batch_size, parse_workers=parse_workers, format=format )
+        elapsed:float = time.perf_counter() - start
+        size:int = os.path.getsize(filepath)
+    result:dict[ str, Any] = { 'records': records, 'seconds': round(elapsed, 4), 'records_per_second': round(records / elapsed, 1), 'output_bytes': size }
+    if metrics : result['metrics'] = METRICS.report()
+    return result
+
+
+def main() -> None:
+    parser:argparse.ArgumentParser = argparse.ArgumentParser(description='Benchmark search() against a local fake eutils server.')
+    parser.add_argument('--sizes', type=str, default='1k,100k', help=f'Comma separated fixture sizes of {", ".join(SIZES)} (default: 1k,100k).')
+    parser.add_argument('--batch-size', type=int, default=500, help='Papers downloaded in one request (default: 500).')
+    parser.add_argument('--workers', type=int, default=3, help='Batches downloaded in parallel (default: 3).')
+    parser.add_argument('--parse-workers', type=int, default=1, help='Processes that parse the papers (default: 1).')
+    parser.add_argument('--format', type=str, default='csv', help='Output format (default: csv).')
+    parser.add_argument('--rate', type=float, default=0, help='Requests per second of the rate limiter, 0 for no limit (default: 0).')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds the server wait before every response (default: 0).')
+    parser.add_argument('--throttle', type=float, default=0.0, help='Share of requests the server answer with 429 (default: 0).')
+    parser.add_argument('--compress', choices=( 'gz', 'zst' ), default='', help='Compress the output file (default: not compressed).')
+    parser.add_argument('--gzip', action='store_true', help='The server gzip the responses.')
+    parser.add_argument('--metrics', action='store_true', help='Save the stage metrics of every case with the results.')
+    add_arguments(parser)
+    args:argparse.Namespace = parser.parse_args()
+
+    results:dict[ str, dict[ str, Any]] = {}
+    for size in args.sizes.split(','):
+        process, url = spawn([ '--size', size, '--latency', str(args.latency), '--throttle', str(args.throttle) ] + ( [ '--gzip' ] if args.gzip else [] ))
+        try:
+            name:str = f'search/{size}/{args.format}' + ( f'.{args.compress}' if args.compress else '' ) + ( '/gzip' if args.gzip else '' )
+            results[name] = best(
+                run_search, args.repeat,
+                url, SIZES[size], args.batch_size, args.workers, args.parse_workers, args.rate, args.format, args.compress, args.metrics,
+            )
+            show(name, results[name])
+        finally:
+            process.terminate()
+            process.wait()
+    finish(results, args)
+
+
+if __name__ == '__main__':
+    main()
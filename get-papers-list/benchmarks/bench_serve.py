@@ -0,0 +1,124 @@
+"""
+benchmark of the server mode, many clients run overlapping searches against the local fake eutils server
+( fake_eutils.py, started in its own process ) once as separate searches ( every client has its own session, rate
+limit and no cache, like separate get-papers-list processes ) and once through one SearchService over http
+the serve-warm case run the same clients again on the warm server, so everything come from the memory cache
+every case run in a fresh process, the upstream requests, records/sec and peak RSS are reported
+---
+USAGE:
+    poetry run python benchmarks/bench_serve.py [ --size 10k ] [ --clients 8 ] [ --distinct 2 ] [ --workers 3 ]
+                                                [ --rate 10 ] [ --latency 0.05 ] [ --json results.json ] [ --baseline results.json ]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from get_papers_list.utils import APIs, RateLimiter, search
+from get_papers_list.cache import MemoryCache
+from get_papers_list.server import SearchService, PapersServer
+from get_papers_list.metrics import METRICS
+from fake_eutils import SIZES, spawn
+from harness import add_arguments, best, show, finish
+
+CASES:tuple[str, ...] = ( 'separate', 'serve', 'serve-warm' )
+
+
+def limiter(rate:float) -> RateLimiter:
+    ## 0 mean no rate limit, so the time is the time of the tool and not of the NCBI limit
+    return RateLimiter( rate, capacity=1 ) if rate > 0 else RateLimiter( 1e9, capacity=1e9 )
+
+
+def run_clients(
+    case:str,
+    url:str,
+    records:int,
+    clients:int,
+    distinct:int,
+    workers:int,
+    rate:float,
+) -> dict[ str, Any]:
+    logging.disable(logging.CRITICAL)
+    METRICS.enable()
+    queries:list[str] = [ f'benchmark {index % distinct}' for index in range(clients) ]
+    sizes:list[int] = []
+
+    if case == 'separate':
+        def client(query:str) -> None:
+            apis:APIs = APIs( api_key='benchmark', workers=workers, base_url=url, retries=10 )
+            apis.rate_limiter = limiter(rate)
+            with tempfile.TemporaryDirectory() as directory:
+                filepath:str = os.path.join(directory, 'output.csv')
+                search( query, filepath=filepath, apis=apis )
+                sizes.append( os.path.getsize(filepath) )
+        start:float = time.perf_counter()
+        with ThreadPoolExecutor(clients) as executor:
+            list( executor.map(client, queries) )
+        elapsed:float = time.perf_counter() - start
+    else:
+        apis = APIs( api_key='benchmark', workers=workers, base_url=url, retries=10, cache=MemoryCache(), pool_size=workers * clients )
+        apis.rate_limiter = limiter(rate)     ## one rate limit for all the clients, like the NCBI give
+        service:SearchService = SearchService( apis, query_workers=clients )
+        server:PapersServer = PapersServer( service, port=0 ).start()
+
+        def request(query:str) -> None:
+            with urllib.request.urlopen( server.url + '/search?' + urllib.parse.urlencode({ 'query': query }) ) as response:
+                sizes.append( len(response.read()) )
+
+        rounds:int = 2 if case == 'serve-warm' else 1
+        for number in range(rounds):
+            if number == rounds - 1 : METRICS.enable()     ## only the last round is counted
+            sizes.clear()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(clients) as executor:
+                list( executor.map(request, queries) )
+            elapsed = time.perf_counter() - start
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+    counters:dict[ str, float] = METRICS.report()['counters']
+    total:int = records * clients
+    return {
+        'records': total,
+        'seconds': round(elapsed, 4),
+        'records_per_second': round(total / elapsed, 1),
+        'upstream_requests': int( counters.get('http_requests', 0) ),
+        'coalesced_searches': int( counters.get('coalesced_searches', 0) ),
+        'output_bytes': sum(sizes),
+    }
+
+
+def main() -> None:
+    parser:argparse.ArgumentParser = argparse.ArgumentParser(description='Benchmark overlapping searches, separate or through the server.')
+    parser.add_argument('--size', choices=SIZES, default='10k', help='Fixture size of every search (default: 10k).')
+    parser.add_argument('--clients', type=int, default=8, help='Searches run at the same time (default: 8).')
+    parser.add_argument('--distinct', type=int, default=2, help='Different queries among the clients (default: 2).')
+    parser.add_argument('--workers', type=int, default=3, help='Batches of a search downloaded in parallel (default: 3).')
+    parser.add_argument('--rate', type=float, default=0, help='Requests per second of a rate limiter, 0 for no limit (default: 0).')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds the server wait before every response (default: 0.05).')
+    parser.add_argument('--cases', type=str, default=','.join(CASES), help=f'Comma separated cases of {", ".join(CASES)} (default: all).')
+    add_arguments(parser)
+    args:argparse.Namespace = parser.parse_args()
+
+    results:dict[ str, dict[ str, Any]] = {}
+    process, url = spawn([ '--size', args.size, '--latency', str(args.latency) ])
+    try:
+        for case in args.cases.split(','):
+            name:str = f'{case}/{args.clients}x{args.size}'
+            results[name] = best( run_clients, args.repeat, case, url, SIZES[args.size], args.clients, args.distinct, args.workers, args.rate )
+            show(name, results[name])
+            print(f'{"":<24} {results[name]["upstream_requests"]:>9} upstream requests  {results[name]["coalesced_searches"]:>4} coalesced searches')
+    finally:
+        process.terminate()
+        process.wait()
+    finish(results, args)
+
+
+if __name__ == '__main__':
+    main()
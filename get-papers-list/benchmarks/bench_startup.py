@@ -0,0 +1,131 @@
+"""
+startup benchmark of the cli, every case run the cli ( or an import ) in a fresh interpreter with -X importtime
+and report the import time of the case ( the interpreter startup itself, site, is not counted ), the wall time of
+the process and the modules it imported, a case fail if it is over its import budget or import a module it must not
+---
+USAGE:
+    poetry run python benchmarks/bench_startup.py [ --cases help,bad-args,search ] [ --budget-scale 1.0 ]
+                                                  [ --json results.json ] [ --baseline results.json ]
+"""
+import argparse
+import compileall
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any
+
+from harness import add_arguments
+
+## modules of the search, the cli must not import them before it know that it run a search
+HEAVY:tuple[str, ...] = ( 'requests', 'urllib3', 'charset_normalizer', 'sqlite3', 'multiprocessing', 'concurrent.futures.process', 'pyarrow', 'aiohttp', 'zstandard' )
+## modules only some searches need ( --store, --parse-workers, parquet, the async api, .zst )
+OPTIONAL:tuple[str, ...] = ( 'sqlite3', 'multiprocessing', 'concurrent.futures.process', 'pyarrow', 'aiohttp', 'zstandard' )
+
+CLI:str = 'from get_papers_list.cli import main; main()'
+
+## name: ( python code, arguments, import budget in ms, modules that must not be imported )
+CASES:dict[ str, tuple[ str, list[str], float, tuple[str, ...]]] = {
+    'help': ( CLI, [ '--help' ], 10.0, HEAVY ),
+    'bad-args': ( CLI, [ '--batch-size', 'many', 'query' ], 60.0, HEAVY ),   ## the parser is built, nothing is searched
+    'search': ( 'import get_papers_list.utils', [], 250.0, OPTIONAL ),        ## everything a plain search import
+}
+
+
+def parse_importtime(stderr:str) -> tuple[ float, list[str], dict[ str, float]]:
+    """
+    this function read the -X importtime lines, they come after the imports of the module ( children first )
+    ---
+    OUTPUT:
+        - It return the import time in ms of the top level imports except site, the names of all the imported modules
+          and the own time in ms of every module
+    """
+    total:float = 0.0
+    modules:list[str] = []
+    own:dict[ str, float] = {}
+    in_site:bool = True     ## the first top level import is site ( the startup ), its children come before it
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line : continue
+        self_us, cumulative_us, name = line[ len('import time:') : ].split('|', 2)
+        depth:int = ( len(name) - len(name.lstrip()) - 1 ) // 2
+        name = name.strip()
+        if in_site:
+            if depth == 0 and name == 'site' : in_site = False
+            continue
+        modules.append(name)
+        own[name] = int(self_us) / 1000
+        if depth == 0 : total += int(cumulative_us) / 1000
+    return total, modules, own
+
+
+def run_case(
+    code:str,
+    arguments:list[str],
+    repeat:int,
+) -> dict[ str, Any]:
+    runs:list[dict[ str, Any]] = []
+    for _ in range( max( 1, repeat ) ):
+        start:float = time.perf_counter()
+        process:subprocess.CompletedProcess = subprocess.run(
+            [ sys.executable, '-X', 'importtime', '-c', code, *arguments ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        wall:float = time.perf_counter() - start
+        total, modules, own = parse_importtime(process.stderr)
+        runs.append({ 'import_ms': round(total, 2), 'wall_ms': round(wall * 1000, 2), 'modules': modules, 'own': own })
+    result:dict[ str, Any] = min( runs, key=lambda run: run['import_ms'] )    ## noise only make a run slower
+    result['wall_ms'] = min( run['wall_ms'] for run in runs )
+    return result
+
+
+def main() -> None:
+    parser:argparse.ArgumentParser = argparse.ArgumentParser(description='Benchmark the startup ( imports ) of the cli.')
+    parser.add_argument('--cases', type=str, default=','.join(CASES), help=f'Comma separated cases of {", ".join(CASES)} (default: all).')
+    parser.add_argument('--budget-scale', type=float, default=1.0, help='Multiply the import budgets, for slow machines (default: 1.0).')
+    parser.add_argument('--top', type=int, default=5, help='Slowest modules shown for every case (default: 5).')
+    add_arguments(parser)
+    args:argparse.Namespace = parser.parse_args()
+
+    ## the package is byte compiled like an installed one, otherwise a changed module is compiled in every run
+    import get_papers_list
+    compileall.compile_dir( os.path.dirname(get_papers_list.__file__), quiet=1 )
+
+    results:dict[ str, dict[ str, Any]] = {}
+    failures:list[str] = []
+    python:dict[ str, Any] = run_case( 'pass', [], args.repeat )
+    print(f'{"python":<12} {"":>12}  {python["wall_ms"]:8.1f} ms wall   ( bare interpreter )')
+    for name in args.cases.split(','):
+        code, arguments, budget, forbidden = CASES[name]
+        result:dict[ str, Any] = run_case( code, arguments, args.repeat )
+        budget *= args.budget_scale
+        print(f'{name:<12} {result["import_ms"]:8.1f} ms import  {result["wall_ms"]:8.1f} ms wall  {len(result["modules"]):>4} modules  ( budget {budget:.0f} ms )')
+        for module, ms in sorted( result['own'].items(), key=lambda item: item[1], reverse=True )[ : args.top ]:
+            print(f'{"":<14}{ms:7.1f} ms  {module}')
+        if result['import_ms'] > budget:
+            failures.append(f'{name}: import {result["import_ms"]:.1f} ms, budget {budget:.0f} ms')
+        imported:list[str] = [ module for module in forbidden if module in result['modules'] ]
+        if imported:
+            failures.append(f'{name}: imports {", ".join(imported)}')
+        results[name] = { 'import_ms': result['import_ms'], 'wall_ms': result['wall_ms'], 'modules': len(result['modules']), 'budget_ms': budget }
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'results are saved in {args.json}')
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline:dict[ str, dict[ str, Any]] = json.load(file)
+        for name, result in results.items():
+            if name in baseline and result['import_ms'] > baseline[name]['import_ms'] * ( 1 + args.tolerance ):
+                failures.append(f'{name}: import {result["import_ms"]:.1f} ms, baseline {baseline[name]["import_ms"]:.1f} ms')
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures : sys.exit(1)
+    print('all cases are in budget' + ( f' and not regressed against {args.baseline}' if args.baseline else '' ))
+
+
+if __name__ == '__main__':
+    main()
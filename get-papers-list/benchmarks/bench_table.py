@@ -0,0 +1,91 @@
+"""
+benchmark of the filters of the paper table against the same filters done paper by paper in python, the papers
+are made in memory ( 3 authors each, the affiliations of fixtures/affiliations.tsv made distinct with a unit number )
+so only the filter is timed, every case run in a fresh process with a new classifier ( its cache is empty )
+the filter-window-company cases keep the papers of a date window and the non academic authors of some companies,
+that is a second filter pass over a downloaded search
+---
+USAGE:
+    poetry run python benchmarks/bench_table.py [ --records 300000 ] [ --distinct 20000 ]
+                                                [ --json results.json ] [ --baseline results.json ]
+"""
+import argparse
+import re
+import time
+from datetime import date
+from typing import Any, Callable
+
+from get_papers_list.utils import Processor
+from get_papers_list.models import Paper, Author
+from get_papers_list.classifier import AffiliationClassifier
+from get_papers_list.table import PaperTable, publication_date
+from bench_classifier import read_fixture
+from harness import add_arguments, best, show, finish
+
+DATES:tuple[str, ...] = ( '2021 Jan', '2021 Jun 15', '2022 Spring', '2022 Dec', '2023 Mar 3', '2023 Oct' )
+WINDOW:tuple[date, date] = ( date(2022, 1, 1), date(2023, 6, 30) )
+COMPANIES:tuple[str, ...] = ( 'Pfizer', 'Novartis', 'Roche', 'Genentech' )
+
+
+def make_papers(records:int, distinct:int) -> list[Paper]:
+    affiliations:list[str] = [ affiliation for _, affiliation in read_fixture() ]
+    papers:list[Paper] = []
+    for i in range(records):
+        authors:list[Author] = []
+        for j in range(3):
+            k:int = i * 3 + j
+            affiliation:str = f'{affiliations[ k % len(affiliations) ]} Unit {k % distinct}'
+            authors.append( Author( f'Author {k}', f'A {k}', affiliation, ( affiliation, ) ) )
+        papers.append( Paper( str(i + 1), DATES[ i % len(DATES) ], f'Title {i}', 'Journal', f'10.1000/{i}', '', '', authors, ( 'Humans', ) ) )
+    return papers
+
+
+def python_window_company(papers:list[Paper], classifier:AffiliationClassifier) -> int:
+    processor:Processor = Processor( classifier=classifier )
+    pattern:re.Pattern[str] = re.compile( '|'.join( re.escape(name) for name in COMPANIES ), re.IGNORECASE )
+    count:int = 0
+    for paper in papers:
+        published:Any = publication_date(paper.DOP)
+        if published is None or not WINDOW[0] <= published <= WINDOW[1] : continue
+        kept:Paper = processor.filter(paper)
+        if any( pattern.search(author.aff) for author in kept.authors ) : count += 1
+    return count
+
+
+def run_case(
+    case:str,
+    records:int,
+    distinct:int,
+) -> dict[ str, Any]:
+    papers:list[Paper] = make_papers(records, distinct)
+    classifier:AffiliationClassifier = AffiliationClassifier()
+    table:PaperTable = PaperTable.from_papers(papers) if case.startswith('table/filter') else PaperTable.from_papers([])
+    cases:dict[ str, Callable[ [], Any]] = {
+        'python/filter': lambda: [ Processor( classifier=classifier ).filter(paper) for paper in papers ],
+        'table/build': lambda: PaperTable.from_papers(papers),
+        'table/filter': lambda: table.non_academic(classifier),
+        'python/filter-window-company': lambda: python_window_company(papers, classifier),
+        'table/filter-window-company': lambda: table.published(*WINDOW).non_academic(classifier).companies(COMPANIES).with_authors(),
+    }
+    start:float = time.perf_counter()
+    cases[case]()
+    elapsed:float = time.perf_counter() - start
+    return { 'records': records, 'seconds': round(elapsed, 4), 'records_per_second': round(records / elapsed, 1) }
+
+
+def main() -> None:
+    parser:argparse.ArgumentParser = argparse.ArgumentParser(description='Benchmark the paper table filters against python filters.')
+    parser.add_argument('--records', type=int, default=300000, help='Number of papers, 3 authors each (default: 300000).')
+    parser.add_argument('--distinct', type=int, default=20000, help='Number of distinct affiliations (default: 20000).')
+    add_arguments(parser)
+    args:argparse.Namespace = parser.parse_args()
+
+    results:dict[ str, dict[ str, Any]] = {}
+    for case in ( 'python/filter', 'table/build', 'table/filter', 'python/filter-window-company', 'table/filter-window-company' ):
+        results[case] = best( run_case, args.repeat, case, args.records, args.distinct )
+        show(case, results[case])
+    finish(results, args)
+
+
+if __name__ == '__main__':
+    main()
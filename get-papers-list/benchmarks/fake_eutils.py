@@ -0,0 +1,287 @@
+"""
+a local stand in of the NCBI eutils ( esearch.fcgi and efetch.fcgi ) for the benchmarks, it serve synthetic medline
+records ( or the records of a medline file ) so a whole search can run without network access
+the latency of every response and the share of requests answered with 429 can be set to look like a busy server
+with --gzip the responses are gzipped for the clients that accept it, like the NCBI do, and with --expire the history
+sessions are forgotten after some seconds like the expired WebEnv of the NCBI, with --cut the body of some efetch
+responses is cut in half and the connection is closed, like a connection that drop in the middle of a download
+---
+USAGE:
+    poetry run python benchmarks/fake_eutils.py [ --size 100k | --records N | --fixture FILE ] [ --port 8765 ]
+                                                [ --latency 0.05 ] [ --throttle 0.1 ] [ --seed 0 ] [ --gzip ] [ --expire 60 ]
+                                                [ --cut 2,5 ]
+    then run the tool against it with: APIs( base_url='http://127.0.0.1:8765' )
+"""
+import argparse
+import gzip
+import http.server
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import date
+from typing import Optional
+
+from get_papers_list.utils import parse_date
+from bench_parser import synthetic_record
+
+## these are the fixture sizes used by the benchmarks
+SIZES:dict[ str, int] = { '1k': 1000, '10k': 10000, '100k': 100000, '1m': 1000000 }
+
+FIRST_PMID:int = 10000000      ## pmid of the first synthetic record, same as synthetic_record
+FIRST_DATE:date = date(2000, 1, 1)
+PER_DAY:int = 50               ## synthetic records published on one day, it give the dates for mindate and maxdate
+
+
+## records made on the fly from their index, nothing is kept in memory so 1m records cost nothing
+class SyntheticFixture:
+
+    def __init__(self, records:int) -> None:
+        self.size:int = records
+
+    def record(self, index:int) -> str:
+        return synthetic_record(index)
+
+    def index(self, pmid:str) -> Optional[int]:
+        index:int = int(pmid) - FIRST_PMID
+        return index if 0 <= index < self.size else None
+
+    def pmid(self, index:int) -> str:
+        return str(FIRST_PMID + index)
+
+    def window(self, mindate:str, maxdate:str) -> range:
+        """
+        this function return the records published between the dates, the record i is published on FIRST_DATE + i // PER_DAY
+        """
+        start:int = max( 0, ( parse_date(mindate) - FIRST_DATE ).days * PER_DAY ) if mindate else 0
+        stop:int = min( self.size, ( ( parse_date(maxdate, end=True) - FIRST_DATE ).days + 1 ) * PER_DAY ) if maxdate else self.size
+        return range( start, max( start, stop ) )
+
+
+## records of a real medline file, only the offsets of the records are kept in memory
+class FileFixture:
+
+    def __init__(self, path:str) -> None:
+        self.path:str = path
+        self.offsets:list[int] = []
+        self.pmids:list[str] = []
+        offset:int = 0
+        start:Optional[int] = None
+        with open(path, 'rb') as file:
+            for line in file:
+                if line.strip() == b'':
+                    if start is not None:
+                        self.offsets.append(start)
+                        start = None
+                elif start is None:
+                    start = offset
+                if line.startswith(b'PMID- '):
+                    self.pmids.append(line[6:].strip().decode())
+                offset += len(line)
+        if start is not None : self.offsets.append(start)
+        self.offsets.append(offset)
+        self.size:int = len(self.offsets) - 1
+        self.by_pmid:dict[ str, int] = { pmid: index for index, pmid in enumerate(self.pmids) }
+        self.file = open(path, 'rb')
+        self.lock:threading.Lock = threading.Lock()
+
+    def record(self, index:int) -> str:
+        with self.lock:
+            self.file.seek(self.offsets[index])
+            return self.file.read( self.offsets[index + 1] - self.offsets[index] ).decode().strip('\n') + '\n\n'
+
+    def index(self, pmid:str) -> Optional[int]:
+        return self.by_pmid.get(pmid)
+
+    def pmid(self, index:int) -> str:
+        return self.pmids[index]
+
+    def window(self, mindate:str, maxdate:str) -> range:
+        return range(self.size)    ## the dates of a file are not indexed, every record match
+
+
+## this class is the server, the history server of the esearch is a dict of query_key to the range of records
+class FakeEutils(http.server.ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        fixture:'SyntheticFixture | FileFixture',
+        port:int=0,
+        latency:float=0.0,     ## seconds before every response
+        throttle:float=0.0,    ## share of the requests answered with 429
+        seed:int=0,
+        compress:bool=False,   ## gzip the responses for clients that send Accept-Encoding: gzip
+        expire:float=0.0,      ## seconds a history session live, 0 mean forever
+        cut:frozenset[int]=frozenset(),   ## numbers of the efetch responses ( from 1 ) whose body is cut
+    ) -> None:
+        super().__init__(( '127.0.0.1', port ), Handler)
+        self.fixture = fixture
+        self.latency:float = latency
+        self.throttle:float = throttle
+        self.compress:bool = compress
+        self.expire:float = expire
+        self.cut:frozenset[int] = cut
+        self.efetches:int = 0
+        self.random:random.Random = random.Random(seed)   ## seeded so the same requests are throttled every run
+        self.lock:threading.Lock = threading.Lock()
+        self.searches:dict[ str, tuple[ range, float]] = {}   ## query_key to the records and the time of the search
+        self.requests:int = 0
+        self.throttled:int = 0
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def start(self) -> 'FakeEutils':
+        threading.Thread( target=self.serve_forever, daemon=True ).start()
+        return self
+
+    def handle_error(self, request:object, client_address:object) -> None:
+        ## a client that close its pooled connection is not an error of the server
+        if not isinstance( sys.exc_info()[1], ( ConnectionResetError, BrokenPipeError ) ):
+            super().handle_error(request, client_address)
+
+    def cut_now(self) -> bool:
+        with self.lock:
+            self.efetches += 1
+            return self.efetches in self.cut
+
+    def throttled_now(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            if self.throttle > 0 and self.random.random() < self.throttle:
+                self.throttled += 1
+                return True
+            return False
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    server:FakeEutils
+
+    def log_message(self, *args:object) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.handle_eutil( urllib.parse.parse_qs( urllib.parse.urlsplit(self.path).query ) )
+
+    def do_POST(self) -> None:
+        length:int = int( self.headers.get('Content-Length', 0) )
+        params:dict[ str, list[str]] = urllib.parse.parse_qs( self.rfile.read(length).decode() )
+        params.update( urllib.parse.parse_qs( urllib.parse.urlsplit(self.path).query ) )
+        self.handle_eutil(params)
+
+    def send(self, status:int, body:bytes, content_type:str='text/plain', headers:dict[ str, str]={}, cut:bool=False) -> None:
+        if self.server.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=1)    ## level 1 so the server not take the cpu of the benchmark
+            headers = { **headers, 'Content-Encoding': 'gzip' }
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if cut:
+            ## the client is told the whole length but get only the half, then the connection is closed
+            self.wfile.write( body[ : len(body) // 2 ] )
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def handle_eutil(self, params:dict[ str, list[str]]) -> None:
+        server:FakeEutils = self.server
+        if server.latency > 0 : time.sleep(server.latency)
+        if server.throttled_now():
+            self.send( 429, b'{"error":"API rate limit exceeded"}', 'application/json', { 'Retry-After': '0' } )
+            return
+        get = lambda name, default='': params.get(name, [ default ])[0]
+        utility:str = urllib.parse.urlsplit(self.path).path.rsplit('/', 1)[-1]
+        if utility == 'esearch.fcgi':
+            self.esearch(get)
+        elif utility == 'efetch.fcgi':
+            self.efetch(get)
+        else:
+            self.send( 404, b'unknown utility' )
+
+    def esearch(self, get) -> None:
+        server:FakeEutils = self.server
+        found:range = server.fixture.window( get('mindate'), get('maxdate') )
+        start:int = int(get('retstart', '0'))
+        ids:list[str] = [ server.fixture.pmid(index) for index in found[ start : start + int(get('retmax', '20')) ] ]
+        with server.lock:
+            query_key:str = str( len(server.searches) + 1 )
+            server.searches[query_key] = ( found, time.monotonic() )
+        body:dict = { 'esearchresult': { 'count': str(len(found)), 'retstart': str(start), 'idlist': ids, 'webenv': 'FAKE_WEBENV', 'querykey': query_key } }
+        self.send( 200, json.dumps(body).encode(), 'application/json' )
+
+    def efetch(self, get) -> None:
+        server:FakeEutils = self.server
+        if get('id'):
+            indexes:list[int] = [ index for index in map( server.fixture.index, get('id').split(',') ) if index is not None ]
+        else:
+            session:Optional[tuple[ range, float]] = server.searches.get(get('query_key'))
+            if session is None or ( server.expire > 0 and time.monotonic() - session[1] > server.expire ):
+                self.send( 400, b'{"error":"Unable to obtain query #1"}', 'application/json' )
+                return
+            found:range = session[0]
+            start:int = int(get('retstart', '0'))
+            indexes = list( found[ start : start + int(get('retmax', '20')) ] )
+        self.send( 200, ( '\n' + ''.join( server.fixture.record(index) for index in indexes ) ).encode(), cut=server.cut_now() )
+
+
+def spawn(arguments:list[str]) -> tuple[ subprocess.Popen, str]:
+    """
+    this function start the server in its own process ( so it not share the cpu and memory of the benchmark )
+    and return the process and the url of the server
+    """
+    process:subprocess.Popen = subprocess.Popen(
+        [ sys.executable, __file__, '--port', '0', *arguments ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line:str = process.stdout.readline() if process.stdout else ''
+    if not line.startswith('serving'):
+        process.kill()
+        raise RuntimeError('fake eutils server did not start')
+    return process, line.split()[-1]
+
+
+def make_fixture(args:argparse.Namespace) -> 'SyntheticFixture | FileFixture':
+    if args.fixture : return FileFixture(args.fixture)
+    return SyntheticFixture( args.records if args.records is not None else SIZES[args.size] )
+
+
+def main() -> None:
+    parser:argparse.ArgumentParser = argparse.ArgumentParser(description='Local stand in of the NCBI eutils for benchmarks.')
+    parser.add_argument('--size', choices=SIZES, default='100k', help='Number of synthetic records (default: 100k).')
+    parser.add_argument('--records', type=int, help='Exact number of synthetic records, in place of --size.')
+    parser.add_argument('--fixture', type=str, help='Serve the records of this medline file in place of synthetic ones.')
+    parser.add_argument('--port', type=int, default=8765, help='Port of the server, 0 for any free port (default: 8765).')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds before every response (default: 0).')
+    parser.add_argument('--throttle', type=float, default=0.0, help='Share of requests answered with 429 (default: 0).')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the 429 injection (default: 0).')
+    parser.add_argument('--gzip', action='store_true', help='Gzip the responses for the clients that accept it.')
+    parser.add_argument('--cut', type=str, default='', help='Comma separated numbers of the efetch responses ( from 1 ) cut in half (default: none).')
+    parser.add_argument('--expire', type=float, default=0.0, help='Seconds a history session live, 0 for forever (default: 0).')
+    args:argparse.Namespace = parser.parse_args()
+
+    server:FakeEutils = FakeEutils( make_fixture(args), args.port, args.latency, args.throttle, args.seed, args.gzip, args.expire,
+                                  frozenset( int(number) for number in args.cut.split(',') if number ) )
+    print(f'serving {server.fixture.size} records on {server.url}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f'{server.requests} requests, {server.throttled} throttled', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
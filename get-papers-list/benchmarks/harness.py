@@ -0,0 +1,81 @@
+"""
+helpers shared by the benchmark suites, every measured run is done in a fresh process so its peak RSS is its own
+and the results can be saved as json and compared with a saved baseline to catch regressions
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+
+## a run is slower or bigger than the baseline by more than this share is a regression
+DEFAULT_TOLERANCE:float = 0.10
+
+
+def peak_rss_mb() -> float:
+    """
+    this function return the peak resident memory of this process in MB ( ru_maxrss is KB on linux and bytes on mac )
+    """
+    peak:int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / ( 1024 * 1024 ) if sys.platform == 'darwin' else peak / 1024
+
+
+def _call(func:Callable[ ..., dict[ str, Any]], args:tuple) -> dict[ str, Any]:
+    result:dict[ str, Any] = func(*args)
+    result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return result
+
+
+def isolated(func:Callable[ ..., dict[ str, Any]], *args:Any) -> dict[ str, Any]:
+    """
+    this function run the func in a new process and return its result with the peak rss of the process
+    func has to be on module level so it can be pickled
+    """
+    with ProcessPoolExecutor( max_workers=1, mp_context=multiprocessing.get_context('spawn') ) as executor:
+        return executor.submit(_call, func, args).result()
+
+
+def best(func:Callable[ ..., dict[ str, Any]], repeat:int, *args:Any) -> dict[ str, Any]:
+    """
+    this function run the func repeat times and keep the fastest run, noise only make a run slower
+    """
+    runs:list[dict[ str, Any]] = [ isolated(func, *args) for _ in range( max( 1, repeat ) ) ]
+    return min( runs, key=lambda run: run['seconds'] )
+
+
+def add_arguments(parser:argparse.ArgumentParser) -> None:
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of every case, the fastest is kept (default: 3).')
+    parser.add_argument('--json', type=str, help='Save the results into this json file.')
+    parser.add_argument('--baseline', type=str, help='Compare the results with this saved json file and fail on a regression.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help=f'Allowed regression share (default: {DEFAULT_TOLERANCE}).')
+
+
+def show(name:str, result:dict[ str, Any]) -> None:
+    print(f'{name:<24} {result["records"]:>9} records  {result["seconds"]:8.3f} s  {result["records_per_second"]:>12,.0f} records/sec  {result["peak_rss_mb"]:8.1f} MB peak')
+
+
+def finish(results:dict[ str, dict[ str, Any]], args:argparse.Namespace) -> None:
+    """
+    this function save the results and compare them with the baseline, it exit with 1 if any case regressed
+    """
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'results are saved in {args.json}')
+    if not args.baseline : return
+    with open(args.baseline) as file:
+        baseline:dict[ str, dict[ str, Any]] = json.load(file)
+    regressions:list[str] = []
+    for name, result in results.items():
+        if name not in baseline : continue
+        before:dict[ str, Any] = baseline[name]
+        if result['records_per_second'] < before['records_per_second'] * ( 1 - args.tolerance ):
+            regressions.append(f'{name}: {result["records_per_second"]:,.0f} records/sec, baseline {before["records_per_second"]:,.0f}')
+        if result['peak_rss_mb'] > before['peak_rss_mb'] * ( 1 + args.tolerance ):
+            regressions.append(f'{name}: {result["peak_rss_mb"]:.1f} MB peak, baseline {before["peak_rss_mb"]:.1f}')
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    if regressions : sys.exit(1)
+    print(f'no regression against {args.baseline}')
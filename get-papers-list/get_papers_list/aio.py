@@ -0,0 +1,289 @@
+from typing import AsyncIterator, Optional, Any
+from collections import deque
+import asyncio
+import codecs
+import time
+import logging
+
+from get_papers_list.utils import APIs, Processor, parse_records
+from get_papers_list.models import Paper
+from get_papers_list.classifier import AffiliationClassifier, DEFAULT_CLASSIFIER
+from get_papers_list.errors import PapersError, BadResponseError, RequestFailedError
+from get_papers_list.metrics import METRICS
+
+## setup logging
+logger:logging.Logger = logging.getLogger(name='aio')
+
+
+## this is the token bucket of the RateLimiter for the event loop, waiting is done with asyncio.sleep
+## so the other queries of the loop keep running while one is waiting
+class AsyncRateLimiter:
+
+    def __init__(
+        self,
+        rate:float,          ## tokens ( requests ) per second
+        capacity:float=1,    ## max tokens that can be saved, 1 mean no burst at all
+    ) -> None:
+        self.rate:float = rate
+        self.capacity:float = capacity
+        self.tokens:float = capacity
+        self.last:float = time.monotonic()
+        self.lock:asyncio.Lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """
+        this function wait until a token is available and then take it
+        """
+        async with self.lock:   ## lock is hold while sleeping so the waiting queries are served one by one in order
+            now:float = time.monotonic()
+            self.tokens = min( self.capacity, self.tokens + ( now - self.last ) * self.rate )
+            self.last = now
+            if self.tokens < 1:
+                wait:float = ( 1 - self.tokens ) / self.rate
+                logger.debug(f'Rate limit reached, waiting for {wait:.3f} seconds')
+                METRICS.add('rate_limit_waits')
+                METRICS.add('rate_limit_wait_seconds', wait)
+                await asyncio.sleep(wait)
+                self.last = time.monotonic()
+                self.tokens = 1
+            self.tokens -= 1
+
+
+## this class is the APIs for asyncio, the requests are send with aiohttp and all the queries that share one
+## AsyncAPIs share its connection pool and rate limit, so many queries can run on one event loop
+## the parameters, the backoff and the retry rules are the ones of APIs, only the sending is async
+class AsyncAPIs(APIs):
+
+    def __init__(
+        self,
+        api_key:str='',
+        email:str='',
+        workers:int=3,     ## number of batches of a query downloaded at same time
+        base_url:str='',
+        retries:int=5,
+        backoff:float=0.5,
+        timeout:float=60,
+        pool_size:int=0,   ## connections kept alive, 0 mean the aiohttp default ( 100 )
+        classifier:AffiliationClassifier=DEFAULT_CLASSIFIER,
+        session:Any=None,  ## an aiohttp.ClientSession of the caller, it is not closed by us
+    ) -> None:
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError('aiohttp is needed for the async api, install it with: pip install get-papers-list[async]') from None
+        self.aiohttp:Any = aiohttp
+        super().__init__(api_key=api_key, email=email, workers=workers, base_url=base_url, retries=retries, backoff=backoff, timeout=timeout, pool_size=pool_size, classifier=classifier)
+        self.aio_session:Any = session
+        self.own_session:bool = session is None
+        self.async_rate_limiter:AsyncRateLimiter = AsyncRateLimiter( self.KEY_RATE if api_key != '' else self.RATE )
+
+    def open_session(
+        self,
+        pool_size:int,
+    ) -> None:
+        ## the requests session of APIs is not made, the aiohttp session is made by client on the first request
+        self.pool_size:int = pool_size
+
+    async def __aenter__(self) -> 'AsyncAPIs':
+        return self
+
+    async def __aexit__(self, *exc_info:object) -> None:
+        await self.aclose()
+
+    def client(self) -> Any:
+        """
+        this function return the aiohttp session, it is made on the first request because it need the running loop
+        """
+        if self.aio_session is None:
+            aiohttp:Any = self.aiohttp
+            self.aio_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector( limit=self.pool_size or 100 ),
+                timeout=aiohttp.ClientTimeout( sock_connect=self.timeout, sock_read=self.timeout ),
+            )
+        return self.aio_session
+
+    async def aclose(self) -> None:
+        if self.own_session and self.aio_session is not None:
+            await self.aio_session.close()
+            self.aio_session = None
+
+    async def arequest(
+        self,
+        url:str,
+        params:dict[ str, str],
+    ) -> Any:
+        """
+        this function is the request of APIs for asyncio, it send a GET under the rate limit and retry it when the
+        server give a temporary error ( 429 or 5xx ) or the connection is broken
+        ---
+        OUTPUT:
+            - It return the aiohttp response with the body not read, the caller check the status of it and release it
+        """
+        aiohttp:Any = self.aiohttp
+        attempt:int = 0
+        while True:
+            await self.async_rate_limiter.acquire()
+            METRICS.add('http_requests')
+            try:
+                response:Any = await self.client().get(url, params=params)
+            except ( aiohttp.ClientError, asyncio.TimeoutError ) as error_:
+                if attempt >= self.retries:
+                    raise RequestFailedError(f'Unable to send the request: {error_!r}') from error_
+                wait:float = self.backoff_delay(attempt)
+                logger.error(f'Request failed, retrying in {wait:.2f} seconds')
+            else:
+                if response.status not in self.RETRY_STATUS or attempt >= self.retries:
+                    return response
+                wait = self.retry_after(response, attempt)
+                logger.error(f'Server give {response.status}, retrying in {wait:.2f} seconds')
+                response.release()   ## give the connection back to the pool
+            attempt += 1
+            METRICS.add('http_retries')
+            METRICS.add('retry_wait_seconds', wait)
+            await asyncio.sleep(wait)
+
+    async def aesearch(
+        self,
+        terms:list[str],
+        sort:str,
+        reldate:int,
+        mindate:str,
+        maxdate:str,
+    ) -> tuple[ str, str, int]:
+        """
+        this function is the esearch of APIs for asyncio, it return WebEnv, query_key and count
+        a search without papers give the count 0 and not an error
+        """
+        response:Any = await self.arequest( self.BASE_URL + '/esearch.fcgi', self.esearch_params(terms, sort, reldate, mindate, maxdate) )
+        async with response:
+            if response.status != 200:
+                logger.debug(f'Response is: {await response.text()}')
+                raise BadResponseError('Bad Response', response.status)
+            try:
+                result:dict[ str, Any] = ( await response.json(content_type=None) )['esearchresult']
+                count:int = int(result.get('count', 0))
+                if count == 0 : return '', '', 0
+                return result['webenv'], result['querykey'], count
+            except ( ValueError, KeyError, TypeError, self.aiohttp.ClientError ) as error_:
+                raise PapersError(f'Bad search response: {error_!r}') from error_
+
+    async def aefetch(
+        self,
+        webEnv:str,
+        query_key:str,
+        count:int,
+        batch_size:int=500,
+    ) -> AsyncIterator[str]:
+        """
+        this function is the efetch of APIs for asyncio, it yield the medline data as chunks of string in the order of
+        retstart, with many workers the batches are downloaded at same time and at most 2 * workers are kept in memory
+        """
+        url:str = self.BASE_URL + '/efetch.fcgi'
+        batch_size = max( 1, min( batch_size, self.MAX_BATCH_SIZE ))
+        windows:range = range( 0, count, batch_size )
+
+        if self.workers == 1:
+            for retstart in windows:
+                async for chunk in self._aefetch_batch( url, self.efetch_params(webEnv, query_key, retstart, batch_size) ):
+                    yield chunk
+            return
+
+        async def fetch(retstart:int) -> str:
+            return ''.join([ chunk async for chunk in self._aefetch_batch( url, self.efetch_params(webEnv, query_key, retstart, batch_size) ) ])
+
+        pending:deque[asyncio.Task[str]] = deque()
+        try:
+            for retstart in windows:
+                pending.append( asyncio.ensure_future( fetch(retstart) ) )
+                if len(pending) >= 2 * self.workers:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather( *pending, return_exceptions=True )
+
+    async def _aefetch_batch(
+        self,
+        url:str,
+        params:dict[ str, str],
+    ) -> AsyncIterator[str]:
+        """
+        this function download a single window of the papers and yield it in chunks as they come from the network
+        """
+        logger.info(f'Initicate the Download Request for papers {params["retstart"]} to {int(params["retstart"]) + int(params["retmax"])}')
+        response:Any = await self.arequest(url, params)
+        async with response:
+            if response.status != 200:
+                logger.debug(f'Response is : {await response.text()}')
+                raise BadResponseError('Bad Response', response.status)
+            decoder:codecs.IncrementalDecoder = codecs.getincrementaldecoder( response.charset or 'utf-8' )( errors='replace' )
+            try:
+                async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                    METRICS.add('bytes_downloaded', len(chunk))
+                    text:str = decoder.decode(chunk)
+                    if text : yield text
+            except ( self.aiohttp.ClientError, asyncio.TimeoutError ) as error_:
+                raise RequestFailedError(f'Unable to download the papers: {error_!r}') from error_
+            text = decoder.decode(b'', final=True)
+            if text : yield text
+
+
+async def search_papers(
+    query:str,
+    api_key:str='',
+    email:str='',
+    sort:str='relevance',
+    reldate:int=-1,
+    mindate:str='',
+    maxdate:str='',
+    batch_size:int=500,
+    workers:int=3,
+    base_url:str='',
+    retries:int=5,
+    classifier:AffiliationClassifier=DEFAULT_CLASSIFIER,
+    filter:bool=True,
+    apis:Optional[AsyncAPIs]=None,
+) -> AsyncIterator[Paper]:
+    """
+    this function is the search for asyncio, it yield the papers as they are downloaded and parsed in place of writing them
+    into a file, errors are raised as the PapersError of errors.py and a search without papers yield nothing
+        async for paper in search_papers('cancer research', mindate='2023'):
+            print(paper.pubmedID, paper.authors)
+    ---
+    INPUT:
+        - query, api_key, email, sort, reldate, mindate, maxdate, batch_size, workers, base_url, retries, classifier : same as the search
+        - filter : If true the academic authors are removed from the papers like in the written files, otherwise all the authors are kept
+        - apis : It is an AsyncAPIs shared by many queries, so they share one connection pool and one rate limit ( it is not closed here )
+                 if given api_key, email, workers, base_url and retries are not used
+    """
+    own:bool = apis is None
+    if apis is None:
+        apis = AsyncAPIs(api_key=api_key, email=email, workers=workers, base_url=base_url, retries=retries, classifier=classifier)
+
+    processor:Processor = Processor( classifier=classifier )
+
+    async def parse(text:str) -> list[Paper]:
+        ## parsing is cpu work, it is done in a thread so the other queries of the loop keep running
+        if filter : return await asyncio.to_thread( parse_records, text, classifier )
+        return await asyncio.to_thread( lambda: list( processor.convertor( processor.rectifier( text.split('\n') ) ) ) )
+
+    try:
+        webEnv, query_key, count = await apis.aesearch( query.split(), sort, reldate, mindate, maxdate )
+        logger.info(f'Total Paper Founds: {count}')
+        ## the chunks are parsed as soon as they have whole records, the rest is kept for the next chunk
+        rest:str = ''
+        async for chunk in apis.aefetch( webEnv, query_key, count, batch_size ):
+            if '\r' in chunk:
+                chunk = chunk.replace('\r', '')
+            rest += chunk
+            cut:int = rest.rfind('\n\n')
+            if cut == -1 : continue
+            for paper in await parse( rest[ : cut + 1 ] ):
+                yield paper
+            rest = rest[ cut + 1 : ]
+        for paper in await parse(rest):
+            yield paper
+    finally:
+        if own : await apis.aclose()
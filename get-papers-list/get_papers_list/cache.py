@@ -0,0 +1,255 @@
+from typing import Optional, Any
+from collections import OrderedDict
+import hashlib
+import threading
+import tempfile
+import zlib
+import time
+import os
+import logging
+
+from get_papers_list.metrics import METRICS
+
+## setup logging
+logger:logging.Logger = logging.getLogger(name='cache')
+
+## this is the default place of the cache, it follow the XDG standard
+DEFAULT_CACHE_DIR:str = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join( os.path.expanduser('~'), '.cache' ),
+    'get-papers-list',
+)
+DEFAULT_TTL:int = 24 * 60 * 60              ## one day in seconds
+DEFAULT_MAX_BYTES:int = 512 * 1024 * 1024   ## 512 MB of compressed data
+DEFAULT_MEMORY_BYTES:int = 256 * 1024 * 1024    ## 256 MB of compressed data in memory
+
+
+## this class store the responses of the eutils on the disk, every value is a zlib compressed file
+## the mtime of a file is the time it was written ( for ttl ) and the atime is the last time it was read ( for lru )
+## the size of the cache is counted by one scan and then kept by put, the directory is scanned again only to evict
+class ResponseCache:
+
+    SUFFIX:str = '.z'
+
+    def __init__(
+        self,
+        directory:str=DEFAULT_CACHE_DIR,
+        ttl:int=DEFAULT_TTL,                ## seconds after which a value is stale
+        max_bytes:int=DEFAULT_MAX_BYTES,    ## least recently used values are removed above this size
+        refresh:bool=False,                 ## if true the values are never read but still written
+    ) -> None:
+        self.directory:str = directory
+        self.ttl:int = ttl
+        self.max_bytes:int = max_bytes
+        self.refresh:bool = refresh
+        self.lock:threading.Lock = threading.Lock()
+        self.size:Optional[int] = None     ## bytes of the values, None until the first put scan the directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(*parts:object) -> str:
+        """
+        this function make the key from the parts, strings are normalized so the same query written with
+        different spaces give the same key
+        """
+        normalized:list[str] = [ ' '.join(part.split()) if isinstance(part, str) else repr(part) for part in parts ]
+        return hashlib.sha256( '\x1f'.join(normalized).encode() ).hexdigest()
+
+    def path(self, key:str) -> str:
+        return os.path.join( self.directory, key + self.SUFFIX )
+
+    def has(self, key:str) -> bool:
+        """
+        this function tell that a fresh value is in the cache for the key without reading it
+        """
+        if self.refresh : return False
+        try:
+            return time.time() - os.stat(self.path(key)).st_mtime <= self.ttl
+        except OSError:
+            return False
+
+    def get(self, key:str) -> Optional[str]:
+        """
+        this function return the value of the key, it return None if value is not there or it is stale
+        """
+        if self.refresh : return None
+        path:str = self.path(key)
+        try:
+            stat:os.stat_result = os.stat(path)
+            mtime:float = stat.st_mtime
+            if time.time() - mtime > self.ttl:
+                os.remove(path)
+                with self.lock:
+                    if self.size is not None : self.size -= stat.st_size
+                METRICS.add('cache_misses')
+                return None
+            with open(path, 'rb') as file:
+                value:str = zlib.decompress(file.read()).decode()
+            os.utime(path, ( time.time(), mtime ))  ## marking it recently used, without changing the age
+            logger.debug(f'Cache hit: {key}')
+            METRICS.add('cache_hits')
+            return value
+        except ( OSError, zlib.error, UnicodeDecodeError ):
+            METRICS.add('cache_misses')
+            return None
+
+    def put(self, key:str, value:str) -> None:
+        """
+        this function write the value of the key, file is written under a temporary name and then renamed
+        so a reader never see a half written value
+        """
+        path:str = self.path(key)
+        try:
+            data:bytes = zlib.compress(value.encode(), 6)
+            fd, temp = tempfile.mkstemp( dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            try:
+                old:int = os.stat(path).st_size
+            except OSError:
+                old = 0
+            os.replace(temp, path)
+        except OSError as error_:
+            logger.debug(f'Unable to write the cache: {error_}')
+            return
+        with self.lock:
+            if self.size is not None : self.size += len(data) - old
+            full:bool = self.size is None or self.size > self.max_bytes
+        if full : self.evict()
+
+    def evict(self) -> None:
+        """
+        this function remove the stale values and then the least recently used values until the cache is under max_bytes
+        """
+        with self.lock:
+            now:float = time.time()
+            entries:list[tuple[float, int, str]] = []
+            total:int = 0
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if not entry.name.endswith(self.SUFFIX) : continue
+                    try:
+                        stat:os.stat_result = entry.stat()
+                    except OSError:
+                        continue
+                    if now - stat.st_mtime > self.ttl:
+                        self._remove(entry.path)
+                        continue
+                    entries.append(( stat.st_atime, stat.st_size, entry.path ))
+                    total += stat.st_size
+            if total > self.max_bytes:
+                entries.sort()
+                for _, size, path in entries:
+                    self._remove(path)
+                    total -= size
+                    if total <= self.max_bytes : break
+            self.size = total
+
+    def clear(self) -> None:
+        """
+        this function remove every value of the cache
+        """
+        with self.lock:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name.endswith(self.SUFFIX) or entry.name.endswith('.tmp'):
+                        self._remove(entry.path)
+            self.size = 0
+        logger.info(f'Cache is cleared: {self.directory}')
+
+    def _remove(self, path:str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+## this class keep the responses in memory for a long running process ( like the server ), so the searches of
+## many clients that overlap are served without reading the disk or asking the NCBI again
+## values are zlib compressed ( level 1, it is fast ) and the least recently used are removed above max_bytes
+## a value that is not in memory is looked up in the disk cache if it is given, and every value is also written to it
+class MemoryCache(ResponseCache):
+
+    LEVEL:int = 1    ## zlib level, medline is still 4 to 5 times smaller with it
+
+    def __init__(
+        self,
+        ttl:int=DEFAULT_TTL,                       ## seconds after which a value is stale
+        max_bytes:int=DEFAULT_MEMORY_BYTES,        ## least recently used values are removed above this size
+        disk:Optional[ResponseCache]=None,         ## the on disk cache behind the memory, None mean only memory
+        refresh:bool=False,                        ## if true the values are never read but still written
+    ) -> None:
+        ## no directory is made, so the ResponseCache __init__ is not called
+        self.ttl:int = ttl
+        self.max_bytes:int = max_bytes
+        self.disk:Optional[ResponseCache] = disk
+        self.refresh:bool = refresh
+        self.directory:str = disk.directory if disk is not None else ''
+        self.lock:threading.Lock = threading.Lock()
+        self.values:OrderedDict[ str, tuple[ float, bytes]] = OrderedDict()   ## key: ( time it was written, compressed value ), oldest used first
+        self.size:int = 0
+
+    def _fresh(self, key:str) -> Optional[bytes]:
+        ## it is called with the lock
+        entry:Optional[tuple[ float, bytes]] = self.values.get(key)
+        if entry is None : return None
+        if time.time() - entry[0] > self.ttl:
+            del self.values[key]
+            self.size -= len(entry[1])
+            return None
+        return entry[1]
+
+    def has(self, key:str) -> bool:
+        if self.refresh : return False
+        with self.lock:
+            if self._fresh(key) is not None : return True
+        return self.disk is not None and self.disk.has(key)
+
+    def get(self, key:str) -> Optional[str]:
+        if self.refresh : return None
+        with self.lock:
+            data:Optional[bytes] = self._fresh(key)
+            if data is not None : self.values.move_to_end(key)   ## marking it recently used
+        if data is not None:
+            METRICS.add('memory_cache_hits')
+            return zlib.decompress(data).decode()
+        if self.disk is None:
+            METRICS.add('cache_misses')
+            return None
+        value:Optional[str] = self.disk.get(key)
+        if value is not None : self._keep(key, value)
+        return value
+
+    def put(self, key:str, value:str) -> None:
+        self._keep(key, value)
+        if self.disk is not None : self.disk.put(key, value)
+
+    def _keep(self, key:str, value:str) -> None:
+        data:bytes = zlib.compress(value.encode(), self.LEVEL)
+        with self.lock:
+            old:Optional[tuple[ float, bytes]] = self.values.pop(key, None)
+            if old is not None : self.size -= len(old[1])
+            self.values[key] = ( time.time(), data )
+            self.size += len(data)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        this function remove the least recently used values until the memory is under max_bytes
+        """
+        with self.lock:
+            while self.size > self.max_bytes and self.values:
+                _, ( _, data ) = self.values.popitem(last=False)
+                self.size -= len(data)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.values.clear()
+            self.size = 0
+        if self.disk is not None : self.disk.clear()
+
+    def stats(self) -> dict[ str, Any]:
+        """
+        this function return the number of values and their bytes in memory
+        """
+        with self.lock:
+            return { 'entries': len(self.values), 'bytes': self.size, 'max_bytes': self.max_bytes }
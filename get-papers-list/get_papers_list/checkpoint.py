@@ -0,0 +1,218 @@
+from typing import Iterable, Iterator, Optional, Any, IO
+from collections import deque
+import tempfile
+import json
+import os
+import logging
+
+from get_papers_list.errors import PapersError
+from get_papers_list.models import Paper
+
+## setup logging
+logger:logging.Logger = logging.getLogger(name='checkpoint')
+
+
+## this class save the progress of a search into a small json file, so a search that die halfway ( network, 5xx,
+## killed process ) continue from its last finished batch in place of starting again
+## the state has the history session ( WebEnv, query_key, count ) or the pmids file, the retstart of the next batch
+## ( done ) and the size of the output when that batch was written, the output is cut back to that size on resume
+## a batch is done only when all of its papers are written and flushed to the disk, the batch of a paper is found by
+## the pmid of the last record of every batch, so it work with any number of download and parse workers
+## the state file is written only from the first finished batch, a search that fail before it ( or find nothing )
+## has nothing to resume and leave no file
+class Checkpoint:
+
+    VERSION:int = 1
+
+    def __init__(
+        self,
+        path:str,            ## the state file
+        resume:bool=False,   ## if true the state file is read and the search continue from it
+    ) -> None:
+        self.path:str = path
+        self.resumed:bool = resume
+        self.state:dict[ str, Any] = {}
+        self.file:Optional[IO[str]] = None
+        self.pending:deque[tuple[ int, str]] = deque()   ## ( end, last pmid ) of the batches downloaded but not written yet
+        if resume : self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as file:
+                self.state = json.load(file)
+        except FileNotFoundError:
+            raise PapersError(f'There is no checkpoint to resume: {self.path}') from None
+        except ( OSError, ValueError ) as error_:
+            raise PapersError(f'Unable to read the checkpoint: {self.path}') from error_
+        if self.state.get('version') != self.VERSION:
+            raise PapersError(f'Checkpoint {self.path} is made by another version, it can not be resumed')
+
+    def save(self) -> None:
+        """
+        this function write the state, it is written to a temporary file and renamed so a crash while writing
+        never leave a broken state
+        """
+        directory:str = os.path.dirname( os.path.abspath(self.path) )
+        try:
+            fd, temporary = tempfile.mkstemp( dir=directory, suffix='.tmp' )
+            with os.fdopen(fd, 'w') as file:
+                json.dump(self.state, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, self.path)
+        except OSError as error_:
+            raise PapersError(f'Unable to write the checkpoint: {self.path}') from error_
+
+    def begin(
+        self,
+        key:str,
+        batch_size:int,
+    ) -> int:
+        """
+        this function start a new state for the search, or check that the resumed state is of the same search
+        ---
+        OUTPUT:
+            - It return the batch size, on resume it is the one of the state so the saved offsets stay valid
+        ---
+        INPUT:
+            - key : It is made from everything that change the result of the search ( query, dates, sort, ... )
+            - batch_size : It is the batch size of the search
+        """
+        if self.resumed:
+            if self.state.get('key') != key:
+                raise PapersError(f'Checkpoint {self.path} is of another search, it can not be resumed with this one')
+            logger.info(f'Resuming the search from paper {self.done}')
+            return self.state['batch_size']
+        ## the state of another search is not overwritten, it can still be resumed
+        if os.path.exists(self.path):
+            raise PapersError(f'Checkpoint {self.path} is of an unfinished search, continue it with resume or remove it')
+        self.state = { 'version': self.VERSION, 'key': key, 'batch_size': batch_size, 'done': 0, 'size': 0 }
+        return batch_size
+
+    def update(self, **values:Any) -> None:
+        """
+        this function save values into the state ( like the history session or the pmids file ), they are written
+        only when a batch is finished
+        """
+        self.state.update(values)
+        if self.done > 0 : self.save()
+
+    def get(self, name:str, default:Any=None) -> Any:
+        return self.state.get(name, default)
+
+    @property
+    def done(self) -> int:
+        return self.state.get('done', 0)
+
+    @property
+    def output(self) -> str:
+        return self.state.get('output', '')
+
+    @property
+    def appending(self) -> bool:
+        """
+        this is true when the output already has a part of the papers, so its header is not written again
+        """
+        return self.resumed and self.state.get('size', 0) > 0
+
+    def open(
+        self,
+        filepath:str,
+        encoding:Optional[str]=None,
+        newline:Optional[str]=None,
+    ) -> IO[str]:
+        """
+        this function open the output, on resume the output is cut back to its size at the last finished batch
+        and opened for appending, so the papers of the unfinished batch are not written twice
+        """
+        if self.appending:
+            size:int = self.state['size']
+            if not os.path.isfile(filepath) or os.path.getsize(filepath) < size:
+                raise PapersError(f'Output {filepath} is changed since the checkpoint, it can not be resumed')
+            os.truncate(filepath, size)
+            self.file = open(filepath, 'a', encoding=encoding, newline=newline)
+        else:
+            self.file = open(filepath, 'w', encoding=encoding, newline=newline)
+        self.update( output=filepath )
+        return self.file
+
+    def track(
+        self,
+        batches:Iterable[tuple[ int, Iterable[str]]],
+    ) -> Iterator[str]:
+        """
+        this function join the chunks of the batches ( like efetch ) and note the last pmid of every batch
+        the last chunk of a batch is hold back until the batch is noted, so its papers can't be parsed before it
+        ---
+        INPUT:
+            - batches : It is ( end, chunks ) of every batch, end is the retstart of the next batch
+        """
+        for end, chunks in batches:
+            last:str = ''
+            rest:str = '\n'    ## the unfinished line of the previous chunk, it start with the newline before it
+            held:Optional[str] = None
+            for chunk in chunks:
+                text:str = rest + chunk
+                line_end:int = text.rfind('\n')
+                start:int = text.rfind('\nPMID- ', 0, line_end)
+                if start != -1:
+                    last = text[ start + 7 : text.index('\n', start + 1) ].strip()
+                rest = text[ line_end : ]
+                if held is not None : yield held
+                held = chunk
+            self.pending.append(( end, last ))
+            if held is not None : yield held
+
+    def papers(
+        self,
+        papers:Iterable[Paper],
+    ) -> Iterator[Paper]:
+        """
+        this function pass the papers to the writer and save the state when the last paper of a batch is written
+        a paper is written when the writer ask the next one, so the state is saved only after that
+        """
+        for paper in papers:
+            self.skip_empty()
+            yield paper
+            if self.pending and paper.pubmedID == self.pending[0][1]:
+                self.commit( self.pending.popleft()[0] )
+        while self.pending:    ## everything is written
+            self.commit( self.pending.popleft()[0] )
+
+    def skip_empty(self) -> None:
+        ## a batch without papers is done as soon as the batches before it are done
+        while self.pending and self.pending[0][1] == '':
+            self.commit( self.pending.popleft()[0] )
+
+    def commit(
+        self,
+        end:int,
+    ) -> None:
+        """
+        this function flush the output to the disk and save that the papers before end are written
+        """
+        if self.file is None : return
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.update( done=end, size=os.fstat(self.file.fileno()).st_size )
+        logger.debug(f'Checkpoint at paper {end}')
+
+    @staticmethod
+    def resumable(path:str) -> bool:
+        """
+        this function tell that the file is a state with finished batches, so the search can be resumed from it
+        """
+        try:
+            with open(path) as file:
+                return json.load(file).get('done', 0) > 0
+        except ( OSError, ValueError, AttributeError ):
+            return False
+
+    def finish(self) -> None:
+        """
+        this function remove the state file, it is called when the search is finished
+        """
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,177 @@
+from typing import Optional, Iterable, Any
+from functools import lru_cache
+import json
+import re
+
+## classes of an affiliation
+ACADEMIC:str = 'academic'
+COMPANY:str = 'company'
+UNKNOWN:str = 'unknown'
+
+## these are the markers of a company, a company marker win over an academic one because
+## company departments are often named like academic ones ( like "Pfizer Inc., Department of Oncology" )
+## "AG" has to close the name ( "Bayer AG, Berlin" ) because "AG Müller" is a German research group, and "S.A" can not
+## be a part of a longer abbreviation like "U.S.A."
+COMPANY_WORDS:tuple[str, ...] = (
+    r'Inc', r'Incorporated', r'Corp', r'Corporation', r'LLC', r'L\.L\.C', r'Ltd', r'Limited', r'plc', r'PLC',
+    r'Pvt', r'Co\.,? Ltd', r'K\.K', r'GmbH', r'AG(?=\s*(?:[,;.)]|$))', r'(?<![\w.])S\.A\.?(?![\w.])', r'S\.p\.A', r'SpA', r'S\.r\.l', r'B\.V', r'BV', r'N\.V',
+    r'A/S', r'Oy', r'S\.L', r'S\.A\.S', r'SAS', r'Sarl', r'SARL',
+    r'Pharmaceuticals', r'Therapeutics', r'Biotherapeutics', r'Biosciences', r'Biopharma', r'Biotech',
+    r'Private Practice', r'Consulting',
+    r'Pfizer', r'Novartis', r'Roche', r'Genentech', r'Merck', r'MSD', r'AstraZeneca', r'GlaxoSmithKline', r'GSK',
+    r'Sanofi', r'Bayer', r'Janssen', r'Johnson & Johnson', r'Amgen', r'AbbVie', r'Eli Lilly', r'Lilly',
+    r'Bristol[- ]Myers Squibb', r'Takeda', r'Boehringer Ingelheim', r'Novo Nordisk', r'Gilead', r'Biogen',
+    r'Regeneron', r'Moderna', r'BioNTech', r'Daiichi Sankyo', r'Astellas', r'Eisai', r'Otsuka', r'Servier',
+    r'Ipsen', r'Teva', r'Vertex', r'Illumina', r'Medtronic', r'Siemens Healthineers', r'Philips', r'IQVIA',
+)
+
+## these are the markers of an academic or public institution, in many languages
+ACADEMIC_WORDS:tuple[str, ...] = (
+    r'Univ\w*', r'Universit\w*', r'College', r'Colegio', r'School of', r'Medical School', r'Graduate School',
+    r'Faculty', r'Facult\w+', r'Fakult\w+',
+    r'Hochschule', r'Politecnico', r'Polytechnic', r'Polytechnique', r'Academy', r'Acad[eé]mie', r'Akademie', r'Academia',
+    r'Hospital', r'H[oô]pital', r'Hospitalier', r'Ospedale', r'Klinikum', r'Universit[aä]tsklinikum', r'Clinic', r'Cl[ií]nica',
+    r'Medical Cent(?:er|re)', r'Health Sciences? Cent(?:er|re)', r'Cancer Cent(?:er|re)',
+    r'Institut\w*', r'Instituto', r'Istituto', r'Research Council', r'National Laboratory',
+    r'Max Planck', r'Fraunhofer', r'Helmholtz', r'Karolinska', r'Charit[eé]', r'Pasteur',
+)
+
+## acronyms are matched with case, "Inserm" and "INSERM" are both used so both are here
+ACADEMIC_ACRONYMS:tuple[str, ...] = (
+    r'CNRS', r'INSERM', r'Inserm', r'CNR', r'CSIC', r'ETH', r'EPFL', r'NIH', r'IRCCS', r'CHU', r'AP-HP', r'MRC', r'KU Leuven',
+    r'UCL', r'MIT', r'UCLA', r'UCSF', r'CDC', r'NCI', r'INRAE', r'CEA', r'RIKEN', r'CAS',
+)
+
+## email domains, free mail providers say nothing about the author
+ACADEMIC_DOMAINS:tuple[str, ...] = ( r'edu', r'edu\.\w+', r'ac\.\w+', r'uni-[\w-]+\.de', r'univ-[\w-]+\.fr', r'gov', r'nih\.gov' )
+FREE_DOMAINS:tuple[str, ...] = (
+    'gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'live.com', 'aol.com', 'icloud.com', 'me.com',
+    'qq.com', '163.com', '126.com', 'sina.com', 'foxmail.com', 'protonmail.com', 'mail.ru', 'yandex.ru',
+)
+
+## emails are in the affiliation, mostly after 'Electronic address:'
+EMAIL:re.Pattern[str] = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+
+## these words are used for the esearch pre filter, the server only match whole words in [affil]
+ESEARCH_WORDS:tuple[str, ...] = ( 'Inc', 'Ltd', 'LLC', 'GmbH', 'Corporation', 'Pharmaceuticals', 'Therapeutics', '"Private Practice"' )
+
+
+## this class classify an affiliation as academic, company or unknown, all the markers are compiled into
+## one regex and the results are cached because the same affiliations come again and again
+class AffiliationClassifier:
+
+    CACHE_SIZE:int = 65536
+
+    def __init__(
+        self,
+        company_words:Iterable[str]=COMPANY_WORDS,
+        academic_words:Iterable[str]=ACADEMIC_WORDS,
+        academic_acronyms:Iterable[str]=ACADEMIC_ACRONYMS,
+        academic_domains:Iterable[str]=ACADEMIC_DOMAINS,
+        free_domains:Iterable[str]=FREE_DOMAINS,
+        esearch_words:Iterable[str]=ESEARCH_WORDS,
+    ) -> None:
+        self.config:dict[ str, tuple[str, ...]] = {
+            'company_words': tuple(company_words),
+            'academic_words': tuple(academic_words),
+            'academic_acronyms': tuple(academic_acronyms),
+            'academic_domains': tuple(academic_domains),
+            'free_domains': tuple(free_domains),
+            'esearch_words': tuple(esearch_words),
+        }
+        self._compile()
+
+    def _compile(self) -> None:
+        config:dict[ str, tuple[str, ...]] = self.config
+
+        def alternation(words:tuple[str, ...]) -> str:
+            ## longest first, so "Co., Ltd" is tried before "Co"
+            return '|'.join( sorted(words, key=len, reverse=True) )
+
+        ## company markers are matched with case ( "AG" and "Inc" are not words in a sentence ), academic words without
+        self.pattern:re.Pattern[str] = re.compile(
+            r'(?P<email>[\w.+-]+@(?P<domain>[\w-]+(?:\.[\w-]+)+))'
+            rf'|(?P<company>\b(?:{alternation(config["company_words"])})(?!\w))'
+            rf'|(?P<academic>\b(?i:{alternation(config["academic_words"])})(?!\w)|\b(?:{alternation(config["academic_acronyms"])})\b)'
+        )
+        self.academic_domain:re.Pattern[str] = re.compile( rf'(?:^|\.)(?:{alternation(config["academic_domains"])})$', re.IGNORECASE )
+        self.free_domains:frozenset[str] = frozenset( domain.lower() for domain in config['free_domains'] )
+        self.classify = lru_cache(maxsize=self.CACHE_SIZE)(self._classify)
+
+    @classmethod
+    def from_file(
+        cls,
+        filepath:str,
+    ) -> 'AffiliationClassifier':
+        """
+        this function make the classifier from a json file, the file can have any of the keys company_words, academic_words,
+        academic_acronyms, academic_domains, free_domains and esearch_words, the missing keys use the default lists
+        a key like "extra_company_words" add to the default list in place of replacing it
+        """
+        with open(filepath) as file:
+            config:dict[ str, Any] = json.load(file)
+        defaults:dict[ str, tuple[str, ...]] = cls().config
+        options:dict[ str, list[str]] = {}
+        for key, default in defaults.items():
+            options[key] = list( config.get(key, default) ) + list( config.get(f'extra_{key}', []) )
+        unknown:set[str] = set(config) - set(defaults) - { f'extra_{key}' for key in defaults }
+        if unknown:
+            raise ValueError(f'Unknown keys in {filepath}: {", ".join(sorted(unknown))}')
+        return cls(**options)
+
+    def __getstate__(self) -> dict[ str, Any]:
+        ## the compiled cache can't be pickled, only the config is send to the parse workers
+        return { 'config': self.config }
+
+    def __setstate__(self, state:dict[ str, Any]) -> None:
+        self.config = state['config']
+        self._compile()
+
+    def _classify(
+        self,
+        affiliation:str,
+    ) -> str:
+        """
+        this function return ACADEMIC, COMPANY or UNKNOWN for the affiliation
+        """
+        academic:bool = False
+        domain:Optional[str] = None
+        for match in self.pattern.finditer(affiliation):
+            group:Optional[str] = match.lastgroup
+            if group == 'company':
+                return COMPANY
+            if group == 'academic':
+                academic = True
+            elif domain is None:
+                domain = match.group('domain').lower().rstrip('.')
+        if academic:
+            return ACADEMIC
+        ## without any word the email tell it
+        if domain is not None and domain not in self.free_domains:
+            return ACADEMIC if self.academic_domain.search(domain) else COMPANY
+        return UNKNOWN
+
+    def is_academic(
+        self,
+        affiliation:Optional[str],
+    ) -> bool:
+        return bool(affiliation) and self.classify(affiliation) == ACADEMIC
+
+    def esearch_clause(self) -> str:
+        """
+        this function return the [affil] clause added to the esearch term, so the server send only papers that
+        have at least one author with a company marker
+        """
+        return '(' + ' OR '.join( f'{word}[affil]' for word in self.config['esearch_words'] ) + ')'
+
+
+DEFAULT_CLASSIFIER:AffiliationClassifier = AffiliationClassifier()
+
+
+def emails(
+    affiliation:str,
+) -> list[str]:
+    """
+    this function return the emails written in the affiliation
+    """
+    return EMAIL.findall(affiliation)
@@ -1,18 +1,27 @@
 import argparse
-import logging
-from typing import Any
 import sys
+from typing import Any
 
 
 
-## utils imports
-from get_papers_list.utils import search
+## only light modules are imported with the cli, the modules of the search ( requests, sqlite3, the process pool ... )
+## are imported on the code path that need them, so --help and a bad command line never pay for them
+from get_papers_list.codes import ExitCodes
+from get_papers_list.errors import PapersError, NoResultError, BadResponseError, RequestFailedError, WritingError
 
 ## manual import
 from get_papers_list.man import MANUAL_TEXT
 
-## logger configurations
-logging.basicConfig( level=logging.INFO, format='%(asctime)s [ %(levelname)s ] - %(message)s')
+## the library raise these errors and only here they become the exit codes, PapersError is the last because the others are its subclasses
+EXIT_CODES:dict[ type[PapersError], int] = {
+    NoResultError: ExitCodes.NO_RESULT,
+    BadResponseError: ExitCodes.BAD_RESPONSE,
+    RequestFailedError: ExitCodes.FAIL_REQUEST,
+    WritingError: ExitCodes.WRITING_ERROR,
+    PapersError: ExitCodes.GENERAL_ERROR,
+}
+
+HELP_FLAGS:frozenset[str] = frozenset({ '-h', '--help' })
 
 
 ## command_line interface
@@ -20,6 +29,27 @@ def main() -> None:
     """
     this is the main function that use for cli operations
     """
+    ## the server has its own options, `get-papers-list -- serve` search for the word serve
+    if sys.argv[1:2] == [ 'serve' ]:
+        from get_papers_list.server import main as serve
+        serve(sys.argv[2:])
+        return
+
+    ## --help only print the manual, so it is answered from the argv before the parser is built or anything is imported
+    if HELP_FLAGS.intersection( sys.argv[1:] ):
+        print(MANUAL_TEXT)
+        sys.exit(0)
+
+    import logging
+    import re
+    from contextlib import nullcontext
+    from get_papers_list.cache import ResponseCache, DEFAULT_CACHE_DIR, DEFAULT_TTL
+    from get_papers_list.writers import FORMATS, detect_format, detect_compression
+    from get_papers_list.metrics import METRICS, PROFILERS, profile
+
+    ## logger configurations
+    logging.basicConfig( level=logging.INFO, format='%(asctime)s [ %(levelname)s ] - %(message)s')
+    logger:logging.Logger = logging.getLogger(name='cli')
 
     parser: argparse.ArgumentParser = argparse.ArgumentParser(
             description="Searches the PubMed API for a given query, filters the results, and writes them to a CSV file.",
@@ -39,17 +69,42 @@ def main() -> None:
         )
 
     # Required argument (query)
-    parser.add_argument("query", type=str, help="The search query to use with the PubMed API.")
+    parser.add_argument("query", type=str, nargs='?', help="The search query to use with the PubMed API.")
 
     # Optional arguments
     parser.add_argument("-h","--help", action='store_true')
     parser.add_argument("-f", "--filepath", type=str, default="output.csv", help="The path to the CSV file (default: pubmed_results.csv)")
+    parser.add_argument("--format", type=str, choices=FORMATS, help="Output format (default: from the extension of FILEPATH, else csv).")
     parser.add_argument("-d", "--debug", action="store_true", help="Enable debugging output.")
     parser.add_argument("--api-key", type=str, help="Your NCBI API key.  Required for some PubMed functionality.")
     parser.add_argument("--email", type=str, help="Your email address for PubMed API requests. Required if you provide API key.")
     parser.add_argument("--reldate", type=int, help="For getting i days olders paper for the search")
     parser.add_argument("--date-from", type=str, help="Filter results published after this date (YYYY/MM/DD format).")
     parser.add_argument("--date-to", type=str, help="Filter results published before this date (YYYY/MM/DD format).")
+    parser.add_argument("--batch-size", type=int, help="Number of papers downloaded in one request (1 to 10000, default: 500).")
+    parser.add_argument("--workers", type=int, help="Number of batches downloaded in parallel (default: 3).")
+    parser.add_argument("--parse-workers", type=int, help="Number of processes that parse the downloaded papers (default: 1).")
+    parser.add_argument("--retries", type=int, help="Number of retries for a failed request (default: 5).")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the response cache.")
+    parser.add_argument("--refresh-cache", action="store_true", help="Ignore the cached responses and cache the new ones.")
+    parser.add_argument("--clear-cache", action="store_true", help="Remove every cached response.")
+    parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help=f"Directory of the response cache (default: {DEFAULT_CACHE_DIR}).")
+    parser.add_argument("--cache-ttl", type=int, default=DEFAULT_TTL, help=f"Seconds a cached response stay valid (default: {DEFAULT_TTL}).")
+    parser.add_argument("--store", type=str, help="SQLite file of parsed papers, enables incremental sync ( only new and revised papers are downloaded ).")
+    parser.add_argument("--harvest-ids", type=str, help="List every PMID of the search into this file ( no 10000 limit ) and download the papers by PMID.")
+    parser.add_argument("--affiliation-patterns", type=str, help="JSON file of the academic and company markers used to find non academic authors.")
+    parser.add_argument("--queries-file", type=str, help="File of queries ( one per line, or .jsonl with per query options ) run in one process.")
+    parser.add_argument("--output-dir", type=str, default='', help="Directory of the per query files of --queries-file (default: current directory).")
+    parser.add_argument("--combined", action="store_true", help="Write all the queries of --queries-file into FILEPATH with a Query column.")
+    parser.add_argument("--query-workers", type=int, default=2, help="Number of queries of --queries-file run at same time (default: 2).")
+    parser.add_argument("--table", type=str, help="Directory where every paper is saved with all its authors, affiliations, emails, journal, DOI and MeSH ( parquet ).")
+    parser.add_argument("--from-table", type=str, help="Filter a saved --table again in place of searching, nothing is downloaded.")
+    parser.add_argument("--company", type=str, action="append", help="With --from-table keep only the authors whose affiliation has this name ( can be given many times ).")
+    parser.add_argument("--checkpoint", type=str, nargs='?', const='', help="Save the progress after every written batch into this file (default: FILEPATH.checkpoint).")
+    parser.add_argument("--resume", action="store_true", help="Continue the search saved in the checkpoint from its last finished batch.")
+    parser.add_argument("--metrics", type=str, choices=( 'json', 'text' ), help="Print the time of every stage, bytes, records per second, retries and rate limit waits at the end.")
+    parser.add_argument("--profile", type=str, help="Profile the whole run and write the profile into this file.")
+    parser.add_argument("--profiler", type=str, choices=PROFILERS, default='cprofile', help="Profiler used by --profile (default: cprofile).")
 
     # Mutually exclusive group for ordering
     group: argparse._MutuallyExclusiveGroup = parser.add_mutually_exclusive_group()
@@ -62,15 +117,26 @@ def main() -> None:
     if args.debug : logging.getLogger().setLevel( logging.DEBUG )
 
 
-    ## adding manual
-    if args.help:
-        print(MANUAL_TEXT)
-        sys.exit(0)
+    ## cache is cleared before the search, so only clearing is also possible
+    if args.clear_cache:
+        ResponseCache(args.cache_dir, args.cache_ttl).clear()
+        if args.query is None and args.queries_file is None and args.from_table is None : sys.exit(0)
 
-    arguments: dict[ str, Any] = {}  ## these are the argument we going to pass
+    sources:int = sum( source is not None for source in ( args.query, args.queries_file, args.from_table ) )
+    if sources == 0 : parser.error('the following arguments are required: query')
+    if sources > 1 : parser.error('only one of query, --queries-file and --from-table can be used')
+    if args.company and args.from_table is None : parser.error('--company works only with --from-table')
+    if args.table and args.query is None : parser.error('--table works only for one query')
 
-    arguments['query'] = args.query
-    arguments['filepath'] = args.filepath
+    ## the progress is saved only when it is asked, and only for one query written into a file that can be appended
+    checkpointed:bool = args.checkpoint is not None or args.resume
+    if checkpointed and not (
+        args.query is not None and args.store is None and args.table is None
+        and detect_format(args.filepath, args.format or '') in ( 'csv', 'jsonl' ) and detect_compression(args.filepath) == ''
+    ):
+        parser.error('--checkpoint and --resume work only for one query written into a plain csv or jsonl file, without --store and --table')
+
+    arguments: dict[ str, Any] = {}  ## these are the argument we going to pass
 
     ## adding other args
     if args.api_key : arguments['api_key'] = args.api_key
@@ -80,10 +146,83 @@ def main() -> None:
     if args.reldate : arguments['reldate'] = args.reldate
     if args.date_from : arguments['mindate'] = args.date_from
     if args.date_to : arguments['maxdate'] = args.date_to
+    if args.batch_size : arguments['batch_size'] = args.batch_size
+    if args.workers : arguments['workers'] = args.workers
+    if args.retries is not None : arguments['retries'] = args.retries
+    if args.parse_workers : arguments['parse_workers'] = args.parse_workers
+    if args.format : arguments['format'] = args.format
+    if args.harvest_ids : arguments['harvest'] = args.harvest_ids
+    if args.table : arguments['table'] = args.table
+    if args.affiliation_patterns:
+        from get_papers_list.classifier import AffiliationClassifier
+        try:
+            arguments['classifier'] = AffiliationClassifier.from_file(args.affiliation_patterns)
+        except ( OSError, ValueError, TypeError, re.error ) as error_:
+            parser.error(f'bad --affiliation-patterns file: {error_}')
+    if not args.no_cache : arguments['cache'] = ResponseCache(args.cache_dir, args.cache_ttl, refresh=args.refresh_cache)
+    if args.store:
+        from get_papers_list.store import RecordStore
+        arguments['store'] = RecordStore(args.store)
+    if checkpointed:
+        arguments['checkpoint'] = args.checkpoint or args.filepath + '.checkpoint'
+        arguments['resume'] = args.resume
+
+    if args.metrics : METRICS.enable()
+    try:
+        ## metrics are printed and profile is written also when the search exit with an error
+        with profile(args.profile, args.profiler) if args.profile else nullcontext():
+            code:int = run(args, arguments)
+    except PapersError as error_:
+        logger.critical(f'{error_}')
+        from get_papers_list.checkpoint import Checkpoint
+        if checkpointed and Checkpoint.resumable(arguments['checkpoint']):
+            logger.info(f'The progress is saved in {arguments["checkpoint"]}, run the same command with --resume to continue')
+        code = next( exit_code for error_type, exit_code in EXIT_CODES.items() if isinstance(error_, error_type) )
+    except ImportError as error_:
+        parser.error(f'{error_}')
+    finally:
+        if args.metrics : print(METRICS.dump(args.metrics))
+
+    sys.exit(code)
+
+
+def run(
+    args:argparse.Namespace,
+    arguments:dict[ str, Any],
+) -> int:
+    """
+    this function run the search or the queries file and return the exit code
+    """
+    from get_papers_list.utils import search, search_many, read_queries, filter_table
+    from get_papers_list.classifier import DEFAULT_CLASSIFIER
+
+    if args.from_table is not None:
+        filter_table(
+            args.from_table,
+            filepath=args.filepath,
+            mindate=args.date_from or '',
+            maxdate=args.date_to or '',
+            companies=args.company or (),
+            format=args.format or '',
+            classifier=arguments.get('classifier', DEFAULT_CLASSIFIER),
+        )
+        return 0
+
+    if args.queries_file is not None:
+        failed:int = search_many(
+            read_queries(args.queries_file),
+            output_dir=args.output_dir,
+            combined=args.filepath if args.combined else '',
+            query_workers=args.query_workers,
+            **arguments,
+        )
+        return ExitCodes.GENERAL_ERROR if failed else 0
 
-    search(**arguments)
+    arguments['query'] = args.query
+    arguments['filepath'] = args.filepath
 
-    sys.exit(0)
+    search(**arguments)
+    return 0
 
 
 if __name__ == "__main__":
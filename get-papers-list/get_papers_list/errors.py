@@ -0,0 +1,34 @@
+from typing import Optional
+
+
+## these are the errors raised by the library, the cli turn them into the exit codes of codes.py
+## so a program that use the library get an exception and not an exit of its process
+class PapersError(Exception):
+    pass
+
+
+## the search has no paper
+class NoResultError(PapersError):
+    pass
+
+
+## the server answer with a status that is not 200 ( after the retries )
+class BadResponseError(PapersError):
+
+    def __init__(
+        self,
+        message:str,
+        status:Optional[int]=None,    ## http status of the last response
+    ) -> None:
+        super().__init__(message)
+        self.status:Optional[int] = status
+
+
+## the request could not be send or the connection is broken ( after the retries )
+class RequestFailedError(PapersError):
+    pass
+
+
+## the output file could not be written
+class WritingError(PapersError):
+    pass
@@ -0,0 +1,124 @@
+from typing import Iterable, Iterator, Union, overload
+from array import array
+import heapq
+import os
+import logging
+
+## setup logging
+logger:logging.Logger = logging.getLogger(name='ids')
+
+ITEM_SIZE:int = 4               ## pmids are kept as uint32, 4 bytes each
+RUN_SIZE:int = 1 << 18          ## pmids sorted in memory at once, 1 MB of array
+BLOCK_SIZE:int = 1 << 16        ## pmids read from a run at once while merging
+
+
+def _typecode() -> str:
+    ## 'I' is 4 bytes on every common platform but 'L' is 4 bytes on some, so it is checked
+    for code in ( 'I', 'L' ):
+        if array(code).itemsize == ITEM_SIZE : return code
+    raise RuntimeError('No 4 byte unsigned array type')
+
+TYPECODE:str = _typecode()
+
+
+## this class write the pmids into a compact file, pmids are appended as they come and at the end
+## the file is sorted and de-duplicated with an external merge sort, so memory stay bounded by RUN_SIZE
+class PmidWriter:
+
+    def __init__(
+        self,
+        path:str,
+    ) -> None:
+        self.path:str = path
+        self.runs:list[str] = []
+        self.buffer:array = array(TYPECODE)
+
+    def extend(
+        self,
+        pmids:Iterable[Union[ str, int]],
+    ) -> None:
+        for pmid in pmids:
+            self.buffer.append(int(pmid))
+            if len(self.buffer) >= RUN_SIZE:
+                self._flush()
+
+    def _flush(self) -> None:
+        """
+        this function write the buffer as a sorted run
+        """
+        if not self.buffer : return
+        run:array = array( TYPECODE, sorted(set(self.buffer)) )
+        path:str = f'{self.path}.run{len(self.runs)}'
+        with open(path, 'wb') as file:
+            run.tofile(file)
+        self.runs.append(path)
+        self.buffer = array(TYPECODE)
+
+    def close(self) -> 'PmidArray':
+        """
+        this function merge the runs into the final file and return it
+        """
+        self._flush()
+        try:
+            with open(self.path, 'wb') as file:
+                out:array = array(TYPECODE)
+                last:int = -1
+                for pmid in heapq.merge( *( _read_run(run) for run in self.runs ) ):
+                    if pmid == last : continue
+                    out.append(pmid)
+                    last = pmid
+                    if len(out) >= BLOCK_SIZE:
+                        out.tofile(file)
+                        out = array(TYPECODE)
+                out.tofile(file)
+        finally:
+            for run in self.runs:
+                os.remove(run)
+            self.runs = []
+        return PmidArray(self.path)
+
+
+def _read_run(path:str) -> Iterator[int]:
+    with open(path, 'rb') as file:
+        while True:
+            block:array = array(TYPECODE)
+            block.frombytes( file.read( BLOCK_SIZE * ITEM_SIZE ) )
+            if not block : return
+            yield from block
+
+
+## this class read the sorted pmid file, it can be sliced like a list of pmid strings without loading the file
+class PmidArray:
+
+    def __init__(
+        self,
+        path:str,
+    ) -> None:
+        self.path:str = path
+        self.size:int = os.path.getsize(path) // ITEM_SIZE
+
+    def __len__(self) -> int:
+        return self.size
+
+    @overload
+    def __getitem__(self, index:int) -> str: ...
+    @overload
+    def __getitem__(self, index:slice) -> list[str]: ...
+
+    def __getitem__(self, index:Union[ int, slice]) -> Union[ str, list[str]]:
+        if isinstance(index, int):
+            if index < 0 : index += self.size
+            if not 0 <= index < self.size : raise IndexError('pmid index out of range')
+            return self[ index : index + 1 ][0]
+        start, stop, step = index.indices(self.size)
+        if step != 1 : raise ValueError('only continuous slices are supported')
+        block:array = array(TYPECODE)
+        if stop > start:
+            with open(self.path, 'rb') as file:
+                file.seek( start * ITEM_SIZE )
+                block.frombytes( file.read( ( stop - start ) * ITEM_SIZE ) )
+        return [ str(pmid) for pmid in block ]
+
+    def __iter__(self) -> Iterator[str]:
+        for start in range( 0, self.size, BLOCK_SIZE ):
+            yield from self[ start : start + BLOCK_SIZE ]
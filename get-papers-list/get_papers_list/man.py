@@ -1,5 +1,7 @@
 MANUAL_TEXT = """
 Usage: pubmed_search [OPTIONS] QUERY
+       pubmed_search [OPTIONS] --queries-file FILE
+       pubmed_search serve [SERVE OPTIONS]
 
 Searches the PubMed API for a given query, filters the results, and writes them to a CSV file.
 
@@ -10,6 +12,12 @@ Options:
   -h, --help            Show this help message and exit.
   -f, --filepath FILE   The path to the CSV file where results will be written.
                         (default: pubmed_results.csv)
+  --format FORMAT       Output format: csv, jsonl, parquet or arrow. By default it is taken from the extension
+                        of FILE ( .csv, .jsonl/.ndjson, .parquet, .arrow ) and csv for any other extension.
+                        jsonl, parquet and arrow keep the authors nested in the paper with journal and DOI.
+                        parquet and arrow need pyarrow ( pip install get-papers-list[arrow] ).
+                        A .gz or .zst after the extension ( output.csv.gz, output.jsonl.zst ) compress the csv
+                        and jsonl files while they are written. .zst need zstandard ( pip install get-papers-list[zstd] ).
   -d, --debug           Enable debugging output.
   --api-key TEXT        Your NCBI API key.  Required for some PubMed functionality.
                         If not provided, the script will attempt to use a cached key
@@ -20,9 +28,86 @@ Options:
   --reldate INT         Filter results published with in i days.
   --date-from TEXT      Filter results published after this date (YYYY/MM or YYYY  format).
   --date-to TEXT        Filter results published before this date (YYYY/MM or YYYY format).
+  --batch-size INT      Number of papers downloaded in one request, papers are fetched batch by batch
+                        so memory stay bounded for large results. (1 to 10000, default: 500)
+  --workers INT         Number of batches downloaded in parallel. All workers share one rate limit
+                        of 3 requests/second ( 10 requests/second with API key ). (default: 3)
+  --parse-workers INT   Number of processes that parse and filter the downloaded papers. The data is split
+                        on record boundaries and the papers are written in their original order. (default: 1)
+  --retries INT         Number of retries for a request that fail with 429, 5xx or a broken connection.
+                        A download cut in the middle ask the same papers again, the part already read is skipped.
+                        Retries use exponential backoff with jitter and honor Retry-After. (default: 5)
+  --no-cache            Do not read or write the response cache.
+  --refresh-cache       Ignore the cached responses, download again and cache the new ones.
+  --clear-cache         Remove every cached response. QUERY is optional with this option.
+  --cache-dir DIR       Directory of the response cache. (default: ~/.cache/get-papers-list)
+  --cache-ttl INT       Seconds a cached response stay valid. (default: 86400)
+  --store FILE          SQLite file that keep the parsed papers by PMID. With it the search list only the
+                        PMIDs and download the papers that are not in the store or are revised since the
+                        last run of the same search. ( at most 10000 PMIDs per search )
+  --harvest-ids FILE    For searches bigger than the history server can page. The publication date range is
+                        split in halves until every slice has at most 10000 papers, all the PMIDs are written
+                        to FILE ( sorted, de-duplicated, 4 bytes each ) and the papers are downloaded by PMID
+                        with POST requests. Papers are written in PMID order. With --queries-file every
+                        query without its own harvest file list its PMIDs into FILE.NNN ( NNN is the query number ).
+  --affiliation-patterns FILE
+                        JSON file of the markers that classify an affiliation as academic or company.
+                        Keys: company_words, academic_words, academic_acronyms, academic_domains,
+                        free_domains, esearch_words ( a key replace the default list, and the same key
+                        with extra_ prefix add to it ) like {"extra_company_words": ["Acme"]}
+  --queries-file FILE   Run many queries in one process with one shared connection pool and rate limit.
+                        FILE has one query per line, or for a .jsonl file one json object per line like
+                        {"query": "diabetes", "filepath": "diabetes.csv", "sort": "pub_date", "mindate": "2023"}
+                        ( options: query, filepath, sort, reldate, mindate, maxdate, batch_size, harvest ).
+                        Options given on the command line are the defaults of every query.
+  --output-dir DIR      Directory of the files of the queries that have no filepath, they are named
+                        NNN-query.csv. (default: current directory)
+  --combined            Write all the queries into the FILEPATH file with a Query column, in file order.
+  --query-workers INT   Number of queries run at same time. (default: 2)
+  --table DIR           Save every paper of the search into DIR ( papers.parquet and authors.parquet ) with all its
+                        authors, affiliations, emails, journal, DOI and MeSH headings, before the academic filter.
+                        The filter of the output is then done on whole columns, once for every distinct affiliation.
+                        Needs pyarrow ( pip install get-papers-list[arrow] ). Only for one query.
+  --from-table DIR      Filter a saved --table again in place of searching, nothing is downloaded. --date-from and
+                        --date-to keep the papers published between the dates, FILEPATH and --format are the output.
+  --company NAME        With --from-table keep only the authors whose affiliation has NAME ( case is ignored ), the
+                        papers without such author are removed. Can be given many times.
+  --checkpoint [FILE]   Save the progress of the search into FILE after every written batch: the WebEnv and
+                        query_key ( or the --harvest-ids file ), the finished batches and the size of the output.
+                        It is written from the first finished batch and removed when the search is finished or
+                        find nothing. (default FILE: FILEPATH.checkpoint)
+                        Only one query written into a plain csv or jsonl file can be checkpointed.
+  --resume              Continue the search saved in the checkpoint from its last finished batch, the output is
+                        cut back to that batch and appended. An expired history session is searched again.
+  --metrics FORMAT      Print the metrics of the run at the end as json or text: wall time of every stage
+                        ( esearch_request, efetch_request, download, lines, rectifier, convertor_and_filter,
+                        preprocess, writer ) with items per second, bytes downloaded, records parsed and written
+                        per second, HTTP requests and retries, rate limit waits and cache hits.
+                        Stage time is its own time, a stage run by many threads is summed over the threads.
+  --profile FILE        Profile the whole run and write it into FILE, cprofile write pstats data and
+                        pyinstrument write html for a .html FILE otherwise text. Only the main thread is profiled.
+  --profiler NAME       cprofile or pyinstrument ( pip install pyinstrument ). (default: cprofile)
   --relevance           Order results by relevance (default).
   --date                Order results by date.
 
+Server:
+  serve                 Run a long running server for many clients ( see get-papers-list serve --help ). All the
+                        searches share one connection pool, one NCBI rate limit and a memory cache of the esearch and
+                        efetch responses ( in front of the disk cache ), and the same searches asked at the same time
+                        are downloaded once for all of their clients. The result is the body of the response:
+                          curl "http://127.0.0.1:8080/search?query=diabetes&mindate=2023&format=jsonl"
+                          curl -X POST -d '{"query": "diabetes", "sort": "pub_date"}' http://127.0.0.1:8080/search
+                        ( options: query, sort, reldate, mindate, maxdate, batch_size, format ). /stats give the
+                        searches running, the memory cache and the metrics. A failed search give 404 for no result,
+                        502 for a bad response, 504 for a failed request and 400 for bad options.
+  --host HOST, --port INT
+                        Address of the server. (default: 127.0.0.1:8080)
+  --socket FILE         Listen on a unix socket ( curl --unix-socket FILE http://localhost/search?query=... ).
+  --memory-cache MB     Compressed responses kept in memory, the least recently used are removed. (default: 256)
+  --query-workers INT   Number of searches run at same time. (default: 2)
+                        --api-key, --email, --workers, --retries, --no-cache, --cache-dir, --cache-ttl and
+                        --affiliation-patterns are the same as for a search. To search the word serve use: -- serve
+
 Example Usage:
   pubmed_search "cancer research" -f my_results.csv -r 500 --date-from 2023/01/01 --field "title"
   pubmed_search "diabetes" -d --api-key YOUR_API_KEY --email your.email@example.com
@@ -36,6 +121,11 @@ Exit Codes:
     WRITING_ERROR:int = 5
 
 Notes:
+  - An author is academic when the affiliation has an academic marker ( University, Hospital, Institute, CNRS, ...
+    in many languages, or an academic email domain ) and no company marker ( Inc, Ltd, GmbH, Pharmaceuticals,
+    known company names, or a company email domain ). Only non academic authors are written.
+  - Responses are cached on the disk ( compressed ), so running the same search again is served from the cache.
+    The cache keep at most 512 MB and remove the least recently used responses above it.
   - You can obtain an NCBI API key from: https://www.ncbi.nlm.nih.gov/account/
   - Providing an API key significantly increases the rate limits for PubMed searches.
   - If you don't provide an email address and API Key, the script may not be able to access PubMed.
@@ -0,0 +1,221 @@
+from typing import Iterable, Iterator, Optional, TypeVar, Any
+from contextlib import contextmanager
+import threading
+import time
+import json
+import logging
+
+## setup logging
+logger:logging.Logger = logging.getLogger(name='metrics')
+
+T = TypeVar('T')
+
+## these are the profilers the profile hook can use, pyinstrument is optional
+PROFILERS:tuple[str, ...] = ( 'cprofile', 'pyinstrument' )
+
+
+## this class collect the timing of the stages of the pipeline and the counters ( bytes, retries, waits )
+## it does nothing until it is enabled, so the pipeline pay nothing for it in a normal run
+## the time of a stage is its own time, the time spent in the stages it pull from is not added to it, so the
+## stages of one thread sum up to the wall time, stages run by many threads ( like download ) are summed over the threads
+class Metrics:
+
+    def __init__(self) -> None:
+        self.enabled:bool = False
+        self.lock:threading.Lock = threading.Lock()
+        self.local:threading.local = threading.local()    ## every thread has its own stack of running stages
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.started:float = time.perf_counter()
+            self.stages:dict[ str, list[float]] = {}     ## name: [ seconds, items ]
+            self.counters:dict[ str, float] = {}
+
+    def enable(self) -> None:
+        self.reset()
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def add(
+        self,
+        name:str,
+        value:float=1,
+    ) -> None:
+        """
+        this function add the value to the counter
+        """
+        if not self.enabled : return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _stack(self) -> list[list[float]]:
+        stack:Optional[list[list[float]]] = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def _record(self, name:str, seconds:float, items:int) -> None:
+        with self.lock:
+            stage:list[float] = self.stages.setdefault(name, [ 0.0, 0 ])
+            stage[0] += seconds
+            stage[1] += items
+
+    @contextmanager
+    def stage(
+        self,
+        name:str,
+        items:int=1,
+    ) -> Iterator[None]:
+        """
+        this function time the block as the stage, items is the number of things the block has done
+        """
+        if not self.enabled:
+            yield
+            return
+        stack:list[list[float]] = self._stack()
+        frame:list[float] = [ 0.0 ]     ## time of the stages running inside this one
+        stack.append(frame)
+        start:float = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed:float = time.perf_counter() - start
+            stack.pop()
+            if stack : stack[-1][0] += elapsed
+            self._record( name, elapsed - frame[0], items )
+
+    def timed(
+        self,
+        name:str,
+        items:Iterable[T],
+    ) -> Iterator[T]:
+        """
+        this function time the stage that give the items, only the time of getting the items is counted and not the time
+        the consumer spend on them, every item is counted
+        """
+        if not self.enabled : return iter(items)
+        return self._timed(name, items)
+
+    def _timed(self, name:str, items:Iterable[T]) -> Iterator[T]:
+        iterator:Iterator[T] = iter(items)
+        seconds:float = 0.0
+        count:int = 0
+        try:
+            while True:
+                stack:list[list[float]] = self._stack()    ## taken again every time, a generator can be resumed by another thread
+                frame:list[float] = [ 0.0 ]
+                stack.append(frame)
+                start:float = time.perf_counter()
+                try:
+                    item:T = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed:float = time.perf_counter() - start
+                    stack.pop()
+                    if stack : stack[-1][0] += elapsed
+                    seconds += elapsed - frame[0]
+                count += 1
+                yield item
+        finally:    ## saved once at the end so the lock is not taken for every item
+            self._record(name, seconds, count)
+
+    def counted(
+        self,
+        name:str,
+        items:Iterable[T],
+    ) -> Iterator[T]:
+        """
+        this function count the items into the counter as they pass, without timing them
+        """
+        if not self.enabled : return iter(items)
+        return self._counted(name, items)
+
+    def _counted(self, name:str, items:Iterable[T]) -> Iterator[T]:
+        count:int = 0
+        try:
+            for item in items:
+                count += 1
+                yield item
+        finally:
+            self.add(name, count)
+
+    def report(self) -> dict[ str, Any]:
+        """
+        this function return all the numbers collected since the metrics are enabled
+        """
+        with self.lock:
+            wall:float = time.perf_counter() - self.started
+            stages:dict[ str, dict[ str, float]] = {
+                name: {
+                    'seconds': round(seconds, 6),
+                    'items': int(items),
+                    'items_per_second': round(items / seconds, 1) if seconds > 0 else 0.0,
+                }
+                for name, ( seconds, items ) in self.stages.items()
+            }
+            counters:dict[ str, float] = { name: round(value, 6) for name, value in self.counters.items() }
+        rates:dict[ str, float] = {}
+        for name in ( 'bytes_downloaded', 'records_parsed', 'records_written' ):
+            if name in counters and wall > 0:
+                rates[f'{name}_per_second'] = round(counters[name] / wall, 1)
+        return { 'wall_seconds': round(wall, 6), 'stages': stages, 'counters': counters, 'rates': rates }
+
+    def dump(
+        self,
+        format:str='json',
+    ) -> str:
+        """
+        this function return the report as json or as lines of text
+        """
+        report:dict[ str, Any] = self.report()
+        if format == 'json' : return json.dumps(report, indent=2)
+        lines:list[str] = [ f'wall time: {report["wall_seconds"]:.3f} s' ]
+        for name, stage in report['stages'].items():
+            lines.append(f'  {name:<28}{stage["seconds"]:>10.3f} s {stage["items"]:>12} items {stage["items_per_second"]:>12.1f} /s')
+        for name, value in { **report['counters'], **report['rates'] }.items():
+            lines.append(f'  {name:<28}{value:>12}')
+        return '\n'.join(lines)
+
+
+## one collector for the whole process, the pipeline record into it
+METRICS:Metrics = Metrics()
+
+
+@contextmanager
+def profile(
+    path:str,
+    profiler:str='cprofile',
+) -> Iterator[None]:
+    """
+    this function profile the block and write the result into path, cprofile write pstats data ( for snakeviz or pstats )
+    and pyinstrument write html if path end with .html otherwise text, both only profile the calling thread
+    """
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError('pyinstrument is needed for this profiler, install it with: pip install pyinstrument') from None
+        sampler:Any = Profiler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write( sampler.output_html() if path.endswith('.html') else sampler.output_text() )
+            logger.info(f'Profile is written in this file: {path}')
+        return
+
+    import cProfile
+    tracer:cProfile.Profile = cProfile.Profile()
+    tracer.enable()
+    try:
+        yield
+    finally:
+        tracer.disable()
+        tracer.dump_stats(path)
+        logger.info(f'Profile is written in this file: {path}')
@@ -0,0 +1,76 @@
+from typing import Any
+from dataclasses import dataclass, field
+import sys
+
+## same strings ( affiliations, journals, dates ) come in thousands of records, interned they are kept only once
+intern = sys.intern
+
+
+## these are the parsed records, slots keep them much smaller than dicts ( no __dict__ in every object )
+@dataclass(slots=True)
+class Author:
+    name:str
+    short:str = ''                  ## short name from AU tag
+    aff:str = ''                    ## first affiliation, this is the one we write
+    affs:tuple[str, ...] = ()       ## all the affiliations of author, tuple because most authors have one
+
+    def to_dict(self) -> dict[ str, Any]:
+        return { 'name': self.name, 'short': self.short, 'aff': self.aff, 'affs': list(self.affs) }
+
+    @classmethod
+    def from_dict(cls, data:dict[ str, Any]) -> 'Author':
+        return cls(
+            data['name'],
+            data.get('short', ''),
+            intern( data.get('aff') or '' ),
+            tuple( intern(aff) for aff in data.get('affs', ()) ),
+        )
+
+
+@dataclass(slots=True)
+class Paper:
+    pubmedID:str = ''
+    DOP:str = ''
+    title:str = ''
+    journal:str = ''
+    doi:str = ''
+    abstract:str = ''
+    revised:str = ''                ## LR tag, the date of last revision of the record
+    authors:list[Author] = field(default_factory=list)
+    mesh:tuple[str, ...] = ()       ## MH tags, the MeSH headings like '*Neoplasms/drug therapy'
+
+    def with_authors(self, authors:list[Author]) -> 'Paper':
+        """
+        this function return a copy of the paper with other authors, the strings are shared and not copied
+        """
+        return Paper( self.pubmedID, self.DOP, self.title, self.journal, self.doi, self.abstract, self.revised, authors, self.mesh )
+
+    def to_dict(self) -> dict[ str, Any]:
+        """
+        this function return the paper as a json ready dict, it is the format of the store
+        """
+        return {
+            'pubmedID': self.pubmedID,
+            'DOP': self.DOP,
+            'title': self.title,
+            'journal': self.journal,
+            'doi': self.doi,
+            'abstract': self.abstract,
+            'revised': self.revised,
+            'authors': [ author.to_dict() for author in self.authors ],
+            'mesh': list(self.mesh),
+        }
+
+    @classmethod
+    def from_dict(cls, data:dict[ str, Any]) -> 'Paper':
+        return cls(
+            data['pubmedID'],
+            intern( data.get('DOP', '') ),
+            data.get('title', ''),
+            intern( data.get('journal', '') ),
+            data.get('doi', ''),
+            data.get('abstract', ''),
+            intern( data.get('revised', '') ),
+            [ Author.from_dict(author) for author in data.get('authors', []) ],
+            tuple( intern(heading) for heading in data.get('mesh', ()) ),    ## papers stored before MeSH was kept have none
+        )
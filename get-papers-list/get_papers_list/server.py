@@ -0,0 +1,395 @@
+from typing import Optional, Callable, Iterator, Generic, TypeVar, Any
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import socketserver
+import urllib.parse
+import threading
+import argparse
+import tempfile
+import shutil
+import signal
+import json
+import sys
+import re
+import os
+import logging
+
+from get_papers_list.errors import PapersError, NoResultError, BadResponseError, RequestFailedError, WritingError
+from get_papers_list.cache import ResponseCache, MemoryCache, DEFAULT_CACHE_DIR, DEFAULT_TTL, DEFAULT_MEMORY_BYTES
+from get_papers_list.classifier import AffiliationClassifier, DEFAULT_CLASSIFIER
+from get_papers_list.writers import FORMATS
+from get_papers_list.metrics import METRICS
+from get_papers_list.utils import APIs, search
+
+## setup logging
+logger:logging.Logger = logging.getLogger(name='server')
+
+T = TypeVar('T')
+
+## these are the options a client can give to a search, with their type and default
+SEARCH_OPTIONS:dict[ str, tuple[ type, Any]] = {
+    'query': ( str, '' ),
+    'sort': ( str, 'relevance' ),
+    'reldate': ( int, -1 ),
+    'mindate': ( str, '' ),
+    'maxdate': ( str, '' ),
+    'batch_size': ( int, 500 ),
+    'format': ( str, 'csv' ),
+}
+
+CONTENT_TYPES:dict[ str, str] = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+
+## the errors of the search become these http status, PapersError is the last because the others are its subclasses
+HTTP_STATUS:dict[ type[PapersError], int] = {
+    NoResultError: 404,
+    BadResponseError: 502,
+    RequestFailedError: 504,
+    WritingError: 500,
+    PapersError: 500,
+}
+
+
+## one call that many threads wait for, the first thread run it and the others get its result ( or its error )
+class Flight(Generic[T]):
+
+    def __init__(self) -> None:
+        self.done:threading.Event = threading.Event()
+        self.result:Optional[T] = None
+        self.error:Optional[BaseException] = None
+        self.waiters:int = 0
+
+
+## this class coalesce the same calls that run at the same time, only one of them really run and every caller get
+## its result, the result is cleaned up ( like a temporary file removed ) when the last caller is done with it
+class SingleFlight(Generic[T]):
+
+    def __init__(self) -> None:
+        self.lock:threading.Lock = threading.Lock()
+        self.flights:dict[ str, Flight[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self.flights)
+
+    @contextmanager
+    def join(
+        self,
+        key:str,
+        func:Callable[ [], T],
+        cleanup:Optional[Callable[ [T], None]]=None,
+    ) -> Iterator[T]:
+        """
+        this function run the func, or wait for the same call ( same key ) that is already running, and give its result
+        ---
+        INPUT:
+            - key : It is the key of the call, calls with the same key give the same result
+            - func : It is the call, only the first caller of the key run it
+            - cleanup : It is called with the result when every caller of the flight is done with it
+        """
+        with self.lock:
+            flight:Optional[Flight[T]] = self.flights.get(key)
+            leader:bool = flight is None
+            if flight is None:
+                flight = self.flights[key] = Flight()
+            flight.waiters += 1
+        try:
+            if leader:
+                try:
+                    flight.result = func()
+                except BaseException as error_:
+                    flight.error = error_
+                finally:
+                    with self.lock:    ## a caller that come after this start a new flight
+                        del self.flights[key]
+                    flight.done.set()
+            else:
+                METRICS.add('coalesced_searches')
+                flight.done.wait()
+            if flight.error is not None : raise flight.error
+            yield flight.result
+        finally:
+            with self.lock:
+                flight.waiters -= 1
+                last:bool = flight.waiters == 0
+            if last and cleanup is not None and flight.error is None:
+                cleanup(flight.result)
+
+
+## this class run the searches of the server, all of them share one APIs ( one pooled session, one rate limit
+## and the memory cache ) and the same searches that run at the same time are downloaded only once
+class SearchService:
+
+    def __init__(
+        self,
+        apis:APIs,
+        classifier:AffiliationClassifier=DEFAULT_CLASSIFIER,
+        query_workers:int=2,      ## number of searches run at same time, the others wait for their turn
+        directory:str='',         ## directory of the result files, empty mean a new temporary one
+    ) -> None:
+        self.apis:APIs = apis
+        self.classifier:AffiliationClassifier = classifier
+        self.slots:threading.BoundedSemaphore = threading.BoundedSemaphore( max( 1, query_workers ) )
+        self.flights:SingleFlight[str] = SingleFlight()
+        self.directory:str = directory or tempfile.mkdtemp( prefix='get-papers-list-' )
+        os.makedirs(self.directory, exist_ok=True)
+
+    def options(
+        self,
+        params:dict[ str, Any],
+    ) -> dict[ str, Any]:
+        """
+        this function check the options of a request and fill the missing ones with the defaults
+        it raise ValueError for a bad option
+        """
+        unknown:set[str] = set(params) - set(SEARCH_OPTIONS)
+        if unknown : raise ValueError(f'unknown options {", ".join(sorted(unknown))}')
+        options:dict[ str, Any] = {}
+        for name, ( kind, default ) in SEARCH_OPTIONS.items():
+            value:Any = params.get(name, default)
+            try:
+                options[name] = kind(value)
+            except ( TypeError, ValueError ):
+                raise ValueError(f'{name} has to be {kind.__name__}, not {value!r}') from None
+        if options['query'].strip() == '' : raise ValueError('query is required')
+        if options['format'] not in FORMATS : raise ValueError(f'format has to be one of {", ".join(FORMATS)}')
+        return options
+
+    @contextmanager
+    def search(
+        self,
+        options:dict[ str, Any],
+    ) -> Iterator[str]:
+        """
+        this function run the search ( or join the same search that is running ) and give the file of its result
+        the file is removed when every client of the search has read it
+        """
+        key:str = ResponseCache.key('serve', *options.values())
+        with self.flights.join( key, lambda: self.run(options), cleanup=os.remove ) as path:
+            yield path
+
+    def run(
+        self,
+        options:dict[ str, Any],
+    ) -> str:
+        fd, path = tempfile.mkstemp( dir=self.directory, suffix='.' + options['format'] )
+        os.close(fd)
+        try:
+            with self.slots:
+                METRICS.add('searches')
+                search( filepath=path, apis=self.apis, classifier=self.classifier, **options )
+        except BaseException:
+            os.remove(path)
+            raise
+        return path
+
+    def stats(self) -> dict[ str, Any]:
+        """
+        this function return the state of the server, the searches running and the metrics since it is started
+        """
+        stats:dict[ str, Any] = { 'in_flight': len(self.flights) }
+        if isinstance(self.apis.cache, MemoryCache) : stats['memory_cache'] = self.apis.cache.stats()
+        stats['metrics'] = METRICS.report()
+        return stats
+
+    def close(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    server:'PapersServer'
+
+    def log_message(self, format:str, *args:Any) -> None:
+        logger.debug(f'{self.address_string()} {format % args}')
+
+    def address_string(self) -> str:
+        ## a unix socket client has no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def do_GET(self) -> None:
+        url:urllib.parse.SplitResult = urllib.parse.urlsplit(self.path)
+        if url.path == '/search':
+            self.handle_search({ name: values[-1] for name, values in urllib.parse.parse_qs(url.query).items() })
+        elif url.path == '/stats':
+            self.send_json( 200, self.server.service.stats() )
+        else:
+            self.send_json( 404, { 'error': f'unknown path {url.path}' } )
+
+    def do_POST(self) -> None:
+        if urllib.parse.urlsplit(self.path).path != '/search':
+            self.send_json( 404, { 'error': f'unknown path {self.path}' } )
+            return
+        try:
+            params:Any = json.loads( self.rfile.read( int( self.headers.get('Content-Length', 0) ) ) or b'{}' )
+        except ( ValueError, UnicodeDecodeError ) as error_:
+            self.send_json( 400, { 'error': f'bad json body: {error_}' } )
+            return
+        if not isinstance(params, dict):
+            self.send_json( 400, { 'error': 'json body has to be an object' } )
+            return
+        self.handle_search(params)
+
+    def handle_search(self, params:dict[ str, Any]) -> None:
+        service:SearchService = self.server.service
+        try:
+            options:dict[ str, Any] = service.options(params)
+        except ValueError as error_:
+            self.send_json( 400, { 'error': f'{error_}' } )
+            return
+        try:
+            with service.search(options) as path:
+                self.send_file( path, CONTENT_TYPES[ options['format'] ] )
+        except PapersError as error_:
+            status:int = next( status for error_type, status in HTTP_STATUS.items() if isinstance(error_, error_type) )
+            logger.error(f'Search is failed with {type(error_).__name__} ( {error_} ): {options["query"]}')
+            self.send_json( status, { 'error': f'{error_}', 'type': type(error_).__name__ } )
+        except ConnectionError:
+            raise    ## the client is gone, nothing can be answered
+        except Exception as error_:
+            ## a bug or an error of the machine ( like a full temporary directory ), the client still get an answer
+            logger.exception(f'Search is failed with {type(error_).__name__} ( {error_} ): {options["query"]}')
+            self.send_json( 500, { 'error': f'{error_}', 'type': type(error_).__name__ } )
+
+    def send_file(self, path:str, content_type:str) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str( os.path.getsize(path) ))
+        self.end_headers()
+        with open(path, 'rb') as file:
+            shutil.copyfileobj(file, self.wfile)
+
+    def send_json(self, status:int, body:dict[ str, Any]) -> None:
+        data:bytes = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+## the server over tcp, every request is handled in its own thread
+class PapersServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        service:SearchService,
+        host:str='127.0.0.1',
+        port:int=8080,
+    ) -> None:
+        super().__init__(( host, port ), Handler)
+        self.service:SearchService = service
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+    def start(self) -> 'PapersServer':
+        threading.Thread( target=self.serve_forever, daemon=True ).start()
+        return self
+
+    def handle_error(self, request:object, client_address:object) -> None:
+        ## a client that go away before its result is sent is not an error of the server
+        if not isinstance( sys.exc_info()[1], ( ConnectionResetError, BrokenPipeError ) ):
+            super().handle_error(request, client_address)
+
+
+## the same server over a unix socket ( curl --unix-socket PATH http://localhost/search?query=... )
+class UnixPapersServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        service:SearchService,
+        path:str,
+    ) -> None:
+        if os.path.exists(path) : os.remove(path)     ## the socket of a server that is not running anymore
+        super().__init__(path, Handler)
+        self.service:SearchService = service
+
+    @property
+    def url(self) -> str:
+        return f'unix:{self.server_address}'
+
+    def handle_error(self, request:object, client_address:object) -> None:
+        if not isinstance( sys.exc_info()[1], ( ConnectionResetError, BrokenPipeError ) ):
+            super().handle_error(request, client_address)
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
+
+def main(argv:Optional[list[str]]=None) -> None:
+    """
+    this function is the `get-papers-list serve` command, it run the server until it is stopped ( ctrl-c or SIGTERM )
+    """
+    parser:argparse.ArgumentParser = argparse.ArgumentParser(
+        prog='get-papers-list serve',
+        description='Run the searches of many clients in one process with one connection pool, one rate limit and a memory cache.',
+    )
+    parser.add_argument("--host", type=str, default='127.0.0.1', help="Address the server listen on (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8080, help="Port the server listen on (default: 8080).")
+    parser.add_argument("--socket", type=str, help="Listen on this unix socket in place of --host and --port.")
+    parser.add_argument("-d", "--debug", action="store_true", help="Enable debugging output.")
+    parser.add_argument("--api-key", type=str, default='', help="Your NCBI API key.")
+    parser.add_argument("--email", type=str, default='', help="Your email address for PubMed API requests.")
+    parser.add_argument("--base-url", type=str, default='', help="Url of the eutils server (default: NCBI).")
+    parser.add_argument("--workers", type=int, default=3, help="Number of batches of a search downloaded in parallel (default: 3).")
+    parser.add_argument("--query-workers", type=int, default=2, help="Number of searches run at same time (default: 2).")
+    parser.add_argument("--retries", type=int, default=5, help="Number of retries for a failed request (default: 5).")
+    parser.add_argument("--memory-cache", type=int, default=DEFAULT_MEMORY_BYTES // ( 1024 * 1024 ), help=f"MB of compressed responses kept in memory (default: {DEFAULT_MEMORY_BYTES // ( 1024 * 1024 )}).")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the disk cache, only the memory cache is used.")
+    parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help=f"Directory of the disk cache (default: {DEFAULT_CACHE_DIR}).")
+    parser.add_argument("--cache-ttl", type=int, default=DEFAULT_TTL, help=f"Seconds a cached response stay valid (default: {DEFAULT_TTL}).")
+    parser.add_argument("--affiliation-patterns", type=str, help="JSON file of the academic and company markers used to find non academic authors.")
+    args:argparse.Namespace = parser.parse_args(argv)
+
+    logging.basicConfig( level=logging.DEBUG if args.debug else logging.INFO, format='%(asctime)s [ %(levelname)s ] - %(message)s')
+
+    classifier:AffiliationClassifier = DEFAULT_CLASSIFIER
+    if args.affiliation_patterns:
+        try:
+            classifier = AffiliationClassifier.from_file(args.affiliation_patterns)
+        except ( OSError, ValueError, TypeError, re.error ) as error_:
+            parser.error(f'bad --affiliation-patterns file: {error_}')
+
+    cache:MemoryCache = MemoryCache(
+        ttl=args.cache_ttl,
+        max_bytes=args.memory_cache * 1024 * 1024,
+        disk=None if args.no_cache else ResponseCache(args.cache_dir, args.cache_ttl),
+    )
+    apis:APIs = APIs(
+        api_key=args.api_key,
+        email=args.email,
+        workers=args.workers,
+        base_url=args.base_url,
+        retries=args.retries,
+        cache=cache,
+        pool_size=args.workers * max( 1, args.query_workers ),
+        classifier=classifier,
+    )
+    service:SearchService = SearchService( apis, classifier, args.query_workers )
+    METRICS.enable()    ## the /stats of the server
+
+    server:PapersServer | UnixPapersServer = UnixPapersServer(service, args.socket) if args.socket else PapersServer(service, args.host, args.port)
+    signal.signal( signal.SIGTERM, signal.default_int_handler )    ## SIGTERM stop the server like ctrl-c
+    logger.info(f'Serving on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        logger.info('Server is stopped')
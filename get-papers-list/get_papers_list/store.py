@@ -0,0 +1,102 @@
+from typing import Iterable, Iterator, Optional
+import threading
+import sqlite3
+import json
+import logging
+
+from get_papers_list.models import Paper
+
+## setup logging
+logger:logging.Logger = logging.getLogger(name='store')
+
+
+## this class keep the parsed papers in a sqlite file keyed by the pmid, so a recurring search only
+## download the papers that are new or revised since the last run
+class RecordStore:
+
+    SCHEMA:str = """
+        CREATE TABLE IF NOT EXISTS papers (
+            pmid INTEGER PRIMARY KEY,
+            revised TEXT NOT NULL,      -- LR tag of the record, it change when NLM revise the record
+            data TEXT NOT NULL          -- the paper as json
+        );
+        CREATE TABLE IF NOT EXISTS searches (
+            key TEXT PRIMARY KEY,
+            synced TEXT NOT NULL        -- YYYY/MM/DD of the last sync of the search
+        );
+    """
+
+    def __init__(
+        self,
+        path:str,
+    ) -> None:
+        self.path:str = path
+        self.lock:threading.Lock = threading.Lock()   ## one connection is shared by the threads
+        self.connection:sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+    def revisions(
+        self,
+        pmids:Iterable[str],
+    ) -> dict[ str, str]:
+        """
+        this function return the revision date of the stored papers among the pmids, the missing ones are not in the result
+        """
+        result:dict[ str, str] = {}
+        batch:list[int] = []
+        with self.lock:
+            for pmid in pmids:
+                batch.append(int(pmid))
+                if len(batch) == 500:     ## sqlite allow only limited number of variables in a query
+                    result.update(self._revisions(batch))
+                    batch = []
+            if batch:
+                result.update(self._revisions(batch))
+        return result
+
+    def _revisions(self, batch:list[int]) -> dict[ str, str]:
+        rows = self.connection.execute(
+            f'SELECT pmid, revised FROM papers WHERE pmid IN ({",".join("?" * len(batch))})', batch
+        )
+        return { str(pmid): revised for pmid, revised in rows }
+
+    def upsert(
+        self,
+        papers:Iterable[Paper],
+    ) -> int:
+        """
+        this function insert the papers or replace the stored ones in one transaction, it return the number of papers written
+        the papers are read before the lock is taken, so a lazy iterable ( like a download ) never keep the store locked,
+        give it a batch at a time so every batch is committed on its own
+        """
+        rows:list[tuple[ int, str, str]] = [ ( int(paper.pubmedID), paper.revised, json.dumps(paper.to_dict()) ) for paper in papers ]
+        with self.lock, self.connection:
+            self.connection.executemany( 'INSERT OR REPLACE INTO papers ( pmid, revised, data ) VALUES ( ?, ?, ? )', rows )
+        return len(rows)
+
+    def papers(
+        self,
+        pmids:Iterable[str],
+    ) -> Iterator[Paper]:
+        """
+        this function yield the stored papers in the order of pmids, pmids that are not stored are skipped
+        """
+        for pmid in pmids:
+            with self.lock:
+                row:Optional[tuple[str]] = self.connection.execute( 'SELECT data FROM papers WHERE pmid = ?', ( int(pmid), ) ).fetchone()
+            if row is not None:
+                yield Paper.from_dict( json.loads(row[0]) )
+
+    def last_sync(self, key:str) -> Optional[str]:
+        with self.lock:
+            row:Optional[tuple[str]] = self.connection.execute( 'SELECT synced FROM searches WHERE key = ?', ( key, ) ).fetchone()
+        return row[0] if row is not None else None
+
+    def set_sync(self, key:str, date:str) -> None:
+        with self.lock, self.connection:
+            self.connection.execute( 'INSERT OR REPLACE INTO searches ( key, synced ) VALUES ( ?, ? )', ( key, date ) )
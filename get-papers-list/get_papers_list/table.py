@@ -0,0 +1,302 @@
+from typing import Iterable, Iterator, Optional, Callable, Any
+from datetime import date
+import re
+import os
+import logging
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    raise ImportError('pyarrow is needed for the paper table, install it with: pip install get-papers-list[arrow]') from None
+
+from get_papers_list.models import Paper, Author, intern
+from get_papers_list.classifier import AffiliationClassifier, DEFAULT_CLASSIFIER, emails
+
+## setup logging
+logger:logging.Logger = logging.getLogger(name='table')
+
+TEXT:Any = pa.dictionary( pa.int32(), pa.string() )    ## repeated strings ( journals, affiliations ) are kept once per batch
+
+## one row for every paper
+PAPERS_SCHEMA:Any = pa.schema([
+    pa.field( 'pubmed_id', pa.string() ),
+    pa.field( 'date_of_publication', TEXT ),     ## DP tag as it is written, like '2023 Jan 15' or '2021 Spring'
+    pa.field( 'published', pa.date32() ),        ## first day of the DP, null if it can't be read
+    pa.field( 'title', pa.string() ),
+    pa.field( 'journal', TEXT ),
+    pa.field( 'doi', pa.string() ),
+    pa.field( 'abstract', pa.string() ),
+    pa.field( 'revised', TEXT ),
+    pa.field( 'mesh', pa.list_( pa.string() ) ),
+])
+
+## one row for every author of every paper, in the order of the papers and of the authors in a paper
+AUTHORS_SCHEMA:Any = pa.schema([
+    pa.field( 'pubmed_id', pa.string() ),
+    pa.field( 'position', pa.int16() ),          ## 0 for the first author
+    pa.field( 'name', pa.string() ),
+    pa.field( 'short', pa.string() ),
+    pa.field( 'affiliation', TEXT ),             ## first affiliation, it is the one that is classified, null if none
+    pa.field( 'affiliations', pa.list_( pa.string() ) ),
+    pa.field( 'emails', pa.list_( pa.string() ) ),
+])
+
+MONTHS:dict[ str, int] = { name: number for number, name in enumerate(( 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec' ), 1) }
+SEASONS:dict[ str, int] = { 'Spring': 3, 'Summer': 6, 'Fall': 9, 'Autumn': 9, 'Winter': 12 }
+
+
+def publication_date(
+    value:str,
+) -> Optional[date]:
+    """
+    this function return the first day of a DP tag, DP can be '2023 Jan 15', '2023 Jan', '2023', '2023 Jan-Feb',
+    '2023 Spring' or '2023 Dec 25-31', it return None if the DP can't be read
+    """
+    parts:list[str] = value.replace('-', ' ').split()
+    try:
+        year:int = int( parts[0][:4] )
+        month:int = 1
+        day:int = 1
+        if len(parts) > 1:
+            month = MONTHS.get( parts[1][:3] ) or SEASONS.get( parts[1], 1 )
+            if len(parts) > 2 and parts[2].isdigit() : day = int(parts[2])
+        return date(year, month, day)
+    except ( IndexError, ValueError ):
+        return None
+
+
+## this class keep the papers of a search as two columnar tables ( papers and authors ) with every author, every
+## affiliation, the emails, the journal, the DOI and the MeSH headings, so one download can be filtered many times
+## the filters work on whole columns: an affiliation test is done once for every distinct affiliation ( the column
+## is dictionary encoded ) and its result is spread to the rows with take, dates and pmids are compared by pyarrow
+## every filter return a new table, the tables are not copied because arrow arrays are immutable
+class PaperTable:
+
+    def __init__(
+        self,
+        papers:Any,     ## pyarrow table of PAPERS_SCHEMA
+        authors:Any,    ## pyarrow table of AUTHORS_SCHEMA
+    ) -> None:
+        self.papers:Any = papers
+        self.authors:Any = authors
+
+    def __len__(self) -> int:
+        return self.papers.num_rows
+
+    @classmethod
+    def from_papers(
+        cls,
+        papers:Iterable[Paper],
+    ) -> 'PaperTable':
+        """
+        this function make the table of the papers, the papers have to be not filtered ( all authors in them )
+        """
+        paper_columns:dict[ str, list[Any]] = { name: [] for name in PAPERS_SCHEMA.names }
+        author_columns:dict[ str, list[Any]] = { name: [] for name in AUTHORS_SCHEMA.names }
+        dates:dict[ str, Optional[date]] = {}          ## DP and affiliations are repeated, so they are read once
+        addresses:dict[ str, list[str]] = {}
+        for paper in papers:
+            published:Optional[date] = dates.get(paper.DOP)
+            if published is None and paper.DOP not in dates:
+                published = dates[paper.DOP] = publication_date(paper.DOP)
+            paper_columns['pubmed_id'].append(paper.pubmedID)
+            paper_columns['date_of_publication'].append(paper.DOP)
+            paper_columns['published'].append(published)
+            paper_columns['title'].append(paper.title)
+            paper_columns['journal'].append(paper.journal or None)
+            paper_columns['doi'].append(paper.doi or None)
+            paper_columns['abstract'].append(paper.abstract or None)
+            paper_columns['revised'].append(paper.revised or None)
+            paper_columns['mesh'].append(paper.mesh)
+            for position, author in enumerate(paper.authors):
+                found:list[str] = []
+                for affiliation in author.affs:
+                    if affiliation not in addresses : addresses[affiliation] = emails(affiliation)
+                    found += addresses[affiliation]
+                author_columns['pubmed_id'].append(paper.pubmedID)
+                author_columns['position'].append(position)
+                author_columns['name'].append(author.name)
+                author_columns['short'].append(author.short)
+                author_columns['affiliation'].append(author.aff or None)
+                author_columns['affiliations'].append(author.affs)
+                author_columns['emails'].append(found)
+        return cls(
+            pa.Table.from_pydict( paper_columns, schema=PAPERS_SCHEMA ),
+            pa.Table.from_pydict( author_columns, schema=AUTHORS_SCHEMA ),
+        )
+
+    @classmethod
+    def concat(
+        cls,
+        tables:Iterable['PaperTable'],
+    ) -> 'PaperTable':
+        tables = list(tables)
+        if not tables : return cls.from_papers([])
+        return cls(
+            pa.concat_tables([ table.papers for table in tables ]),
+            pa.concat_tables([ table.authors for table in tables ]),
+        )
+
+    @classmethod
+    def load(
+        cls,
+        directory:str,
+    ) -> 'PaperTable':
+        """
+        this function read the table saved by save or by TableWriter
+        """
+        return cls(
+            pq.read_table( os.path.join(directory, 'papers.parquet') ),
+            pq.read_table( os.path.join(directory, 'authors.parquet') ),
+        )
+
+    def save(
+        self,
+        directory:str,
+    ) -> None:
+        """
+        this function write the table into the directory as papers.parquet and authors.parquet
+        """
+        writer:TableWriter = TableWriter(directory)
+        writer.write(self)
+        writer.close()
+
+    def affiliation_mask(
+        self,
+        test:Callable[ [Any], Any],
+    ) -> Any:
+        """
+        this function run the test on the distinct first affiliations and return the result of every author row
+        ---
+        OUTPUT:
+            - It return a boolean chunked array with one value for every author, false for the authors without affiliation
+        ---
+        INPUT:
+            - test : It take a string array of distinct affiliations and return a boolean array of the same length
+        """
+        chunks:list[Any] = []
+        for chunk in self.authors.column('affiliation').chunks:
+            if not pa.types.is_dictionary(chunk.type) : chunk = chunk.dictionary_encode()
+            chunks.append( pc.fill_null( pc.take( test(chunk.dictionary), chunk.indices ), False ) )
+        return pa.chunked_array( chunks, pa.bool_() )
+
+    def academic(
+        self,
+        classifier:AffiliationClassifier=DEFAULT_CLASSIFIER,
+    ) -> Any:
+        """
+        this function return for every author if it is academic, only the distinct affiliations are classified
+        """
+        return self.affiliation_mask( lambda values: pa.array( [ classifier.is_academic(value) for value in values.to_pylist() ], pa.bool_() ) )
+
+    def non_academic(
+        self,
+        classifier:AffiliationClassifier=DEFAULT_CLASSIFIER,
+    ) -> 'PaperTable':
+        """
+        this function remove the academic authors, the papers are kept also when no author is left ( like the csv )
+        """
+        return PaperTable( self.papers, self.authors.filter( pc.invert( self.academic(classifier) ) ) )
+
+    def companies(
+        self,
+        names:Iterable[str],
+    ) -> 'PaperTable':
+        """
+        this function keep only the authors whose affiliation has one of the names ( case is ignored )
+        """
+        pattern:str = '|'.join( re.escape(name) for name in names )
+        if pattern == '' : return self
+        return PaperTable( self.papers, self.authors.filter(
+            self.affiliation_mask( lambda values: pc.match_substring_regex( values, pattern, ignore_case=True ) )
+        ))
+
+    def published(
+        self,
+        start:Optional[date]=None,
+        end:Optional[date]=None,
+    ) -> 'PaperTable':
+        """
+        this function keep only the papers published between start and end ( both included ) and their authors
+        the papers without a readable publication date are removed when any of the dates is given
+        """
+        if start is None and end is None : return self
+        column:Any = self.papers.column('published')
+        mask:Any = pc.is_valid(column)
+        if start is not None : mask = pc.and_( mask, pc.greater_equal( column, pa.scalar(start, pa.date32()) ) )
+        if end is not None : mask = pc.and_( mask, pc.less_equal( column, pa.scalar(end, pa.date32()) ) )
+        return self.only( self.papers.filter( pc.fill_null(mask, False) ) )
+
+    def with_authors(self) -> 'PaperTable':
+        """
+        this function remove the papers that have no author left after the author filters
+        """
+        return self.only( self.papers.filter( pc.is_in( self.papers.column('pubmed_id'), value_set=pc.unique( self.authors.column('pubmed_id') ) ) ) )
+
+    def only(
+        self,
+        papers:Any,
+    ) -> 'PaperTable':
+        ## the authors of the given papers
+        return PaperTable( papers, self.authors.filter( pc.is_in( self.authors.column('pubmed_id'), value_set=papers.column('pubmed_id').combine_chunks() ) ) )
+
+    def to_papers(self) -> Iterator[Paper]:
+        """
+        this function yield the papers of the table with their authors ( after the filters ), so they can be written
+        by the writers, the rows are read batch by batch
+        """
+        rows:Iterator[tuple[ Any, ...]] = self._author_rows()
+        row:Optional[tuple[ Any, ...]] = next(rows, None)
+        names:tuple[str, ...] = ( 'pubmed_id', 'date_of_publication', 'title', 'journal', 'doi', 'abstract', 'revised', 'mesh' )
+        for batch in self.papers.to_batches():
+            for pmid, dop, title, journal, doi, abstract, revised, mesh in zip( *( batch.column(name).to_pylist() for name in names ) ):
+                authors:list[Author] = []
+                ## the authors are in the order of the papers, so the authors of a paper are the next rows
+                while row is not None and row[0] == pmid:
+                    authors.append( Author( row[1], row[2], intern( row[3] or '' ), tuple( intern(affiliation) for affiliation in row[4] ) ) )
+                    row = next(rows, None)
+                yield Paper(
+                    pmid,
+                    intern(dop),
+                    title,
+                    intern( journal or '' ),
+                    doi or '',
+                    abstract or '',
+                    intern( revised or '' ),
+                    authors,
+                    tuple( intern(heading) for heading in mesh ),
+                )
+
+    def _author_rows(self) -> Iterator[tuple[ Any, ...]]:
+        names:tuple[str, ...] = ( 'pubmed_id', 'name', 'short', 'affiliation', 'affiliations' )
+        for batch in self.authors.to_batches():
+            yield from zip( *( batch.column(name).to_pylist() for name in names ) )
+
+
+## this class write the tables of the batches into a directory as they come, so a big search is never in memory
+class TableWriter:
+
+    def __init__(
+        self,
+        directory:str,
+    ) -> None:
+        self.directory:str = directory
+        os.makedirs(directory, exist_ok=True)
+        self.papers:Any = pq.ParquetWriter( os.path.join(directory, 'papers.parquet'), PAPERS_SCHEMA, compression='zstd' )
+        self.authors:Any = pq.ParquetWriter( os.path.join(directory, 'authors.parquet'), AUTHORS_SCHEMA, compression='zstd' )
+        self.count:int = 0
+
+    def write(
+        self,
+        table:PaperTable,
+    ) -> None:
+        self.papers.write_table(table.papers)
+        self.authors.write_table(table.authors)
+        self.count += len(table)
+
+    def close(self) -> None:
+        self.papers.close()
+        self.authors.close()
+        logger.info(f'{self.count} papers are written in this table: {self.directory}')
@@ -1,29 +1,52 @@
 
-from typing import List, Union, Optional, TypedDict
-import sys
+from typing import List, Union, Optional, Iterator, Iterable, Callable, TypeVar, Any, Sequence, IO, TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor, Executor, Future
+from functools import partial
+from contextlib import contextmanager
+from collections import deque
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone, date, timedelta
+import threading
+import codecs
+import zlib
+import tempfile
+import shutil
+import random
+import json
+import time
+import re
 import requests
+import urllib3
+import http.client
+from requests.adapters import HTTPAdapter
 import csv
 import os
 import logging
 
-## exit code imports
-from get_papers_list.codes import ExitCodes
+## error imports, the exit codes are given by the cli
+from get_papers_list.errors import PapersError, NoResultError, BadResponseError, RequestFailedError, WritingError
+from get_papers_list.cache import ResponseCache
+from get_papers_list.writers import WRITERS, detect_format, detect_compression, open_output
+from get_papers_list.classifier import AffiliationClassifier, DEFAULT_CLASSIFIER
+from get_papers_list.ids import PmidWriter, PmidArray
+from get_papers_list.metrics import METRICS
+from get_papers_list.models import Paper, Author, intern
+from get_papers_list.checkpoint import Checkpoint
+
+## the store ( sqlite3 ) and the table ( pyarrow ) are imported only by the caller that use them, here they are only for the types
+if TYPE_CHECKING:
+    from get_papers_list.store import RecordStore
+    from get_papers_list.table import PaperTable, TableWriter
 
 ## typing defined
 Row = List[ Union[ str, None]]
-Table = List[ Row]
 
-class Author(TypedDict):
-    name: str
-    aff: Optional[str]
+Papers = List[ Paper]
 
-class Paper(TypedDict):
-    pubmedID:str
-    DOP:str
-    title:str
-    authors:List[Author]
+Body = tuple[ bytes, str, str]   ## a downloaded batch as it come from the network: raw bytes, content encoding, charset
 
-Papers = List[ Paper]
+T = TypeVar('T')
+R = TypeVar('R')
 
 ## setup logging
 logger:logging.Logger = logging.getLogger(name='utils') # this take the logger from the main initialization file
@@ -38,55 +61,315 @@ def debug(msg:str) -> None:
 def error(msg:str) -> None:
     logger.error(msg)
 
-def critical(msg:str, code:int=1) -> None:
-    logger.critical(msg)
-    sys.exit(code)
+
+## this is a token bucket, every request take one token and token are refilled on a fixed rate
+## so all the threads that share it together never cross the rate limit of the NCBI
+class RateLimiter:
+
+    def __init__(
+        self,
+        rate:float,          ## tokens ( requests ) per second
+        capacity:float=1,    ## max tokens that can be saved, 1 mean no burst at all
+    ) -> None:
+        self.rate:float = rate
+        self.capacity:float = capacity
+        self.tokens:float = capacity
+        self.last:float = time.monotonic()
+        self.lock:threading.Lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        this function block until a token is available and then take it
+        """
+        with self.lock:   ## lock is hold while sleeping so the waiting threads are served one by one in order
+            now:float = time.monotonic()
+            self.tokens = min( self.capacity, self.tokens + ( now - self.last ) * self.rate )
+            self.last = now
+            if self.tokens < 1:
+                wait:float = ( 1 - self.tokens ) / self.rate
+                debug(f'Rate limit reached, waiting for {wait:.3f} seconds')
+                METRICS.add('rate_limit_waits')
+                METRICS.add('rate_limit_wait_seconds', wait)
+                time.sleep(wait)
+                self.last = time.monotonic()
+                self.tokens = 1
+            self.tokens -= 1
+
+
+def concurrent_map(
+    func:Callable[ [T], R],
+    items:Iterable[T],
+    workers:int,
+    processes:bool=False,
+) -> Iterator[R]:
+    """
+    this function run the func on the items in a thread pool and yield the results in the same order as items
+    ---
+    INPUT:
+        - func : It is function run on every item ( like downloading a retstart window )
+        - items : It is the items for the func
+        - workers : It is the number of threads, at most 2 * workers items are in flight so memory stay bounded
+        - processes : If true a process pool is used in place of threads ( for cpu bound func ), func must be picklable
+    """
+    if workers <= 1:    ## no need of thread pool for one worker
+        for item in items:
+            yield func(item)
+        return
+
+    if processes:
+        from concurrent.futures import ProcessPoolExecutor    ## it import multiprocessing, only the parse workers need it
+        executor:Executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    pending:deque[Future[R]] = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def charset_of(
+    headers:Any,
+) -> str:
+    """
+    this function return the charset of the Content-Type header, medline is utf-8 when the server not tell it
+    ( requests give ISO-8859-1 for any text without charset, that break the names with accents )
+    """
+    for param in headers.get('Content-Type', '').split(';')[1:]:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'charset':
+            try:
+                return codecs.lookup( value.strip().strip('"\'') ).name
+            except LookupError:
+                break
+    return 'utf-8'
+
+
+def decode_body(
+    chunks:Iterable[bytes],
+    content_encoding:str,
+    charset:str,
+) -> Iterator[str]:
+    """
+    this function decompress ( gzip ) and decode the raw chunks of a response as they come, so the whole body
+    is never hold in memory, neither compressed nor as one big string
+    ---
+    INPUT:
+        - chunks : It is the raw bytes of the body, as they are send by the server
+        - content_encoding : It is the Content-Encoding of the response, gzip or empty for none
+        - charset : It is the charset of the text
+    """
+    inflater:Optional[Any] = zlib.decompressobj( 16 + zlib.MAX_WBITS ) if content_encoding == 'gzip' else None  ## 16 + is the gzip header
+    decoder:codecs.IncrementalDecoder = codecs.getincrementaldecoder(charset)( errors='replace' )
+    try:
+        for chunk in chunks:
+            if inflater is not None : chunk = inflater.decompress(chunk)
+            METRICS.add('bytes_decoded', len(chunk))
+            text:str = decoder.decode(chunk)
+            if text : yield text
+        tail:bytes = inflater.flush() if inflater is not None else b''
+    except zlib.error as error_:
+        raise PapersError(f'Bad compressed response: {error_}') from error_
+    text = decoder.decode(tail, final=True)
+    if text : yield text
+
 
 ## this class contains all the api request functions
 class APIs:    ## any sorry for naming, i am terable in it
 
     BASE_URL:str = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils' ## this is base url for entrez application to access nlm database
+    MAX_BATCH_SIZE:int = 10000  ## efetch not return more than 10000 papers in a single call
+    RATE:int = 3                ## requests per second allowed without api key
+    KEY_RATE:int = 10           ## requests per second allowed with api key
+    RETRY_STATUS:frozenset[int] = frozenset({ 429, 500, 502, 503, 504 })  ## these are temporary and worth a retry
+    ## a connection that is lost or drop in the middle of the body, these are temporary too and worth a retry
+    RETRY_ERRORS:tuple[type[Exception], ...] = (
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+        urllib3.exceptions.ProtocolError,
+        urllib3.exceptions.ReadTimeoutError,
+        http.client.IncompleteRead,
+    )
+    MAX_BACKOFF:float = 60.0    ## never sleep more than this between two tries
+    CHUNK_SIZE:int = 64 * 1024  ## bytes read from the network at once while streaming
+    ACCEPT_ENCODING:str = 'gzip'   ## medline text is 5 to 10 times smaller gzipped, it is inflated by us while streaming
 
     def __init__(
         self,
         api_key:str='',    ## achually, anyone can use the API without key on default rate
         email:str='',      ## you can use registered email address for request
+        workers:int=3,     ## number of batches download at same time
+        base_url:str='',   ## for using another server ( like a local stub server ) in place of NCBI
+        retries:int=5,     ## number of retries for a failed request
+        backoff:float=0.5, ## base of the exponential backoff in seconds
+        timeout:float=60,  ## seconds to wait for the server before giving up on a try
+        cache:Optional[ResponseCache]=None,  ## responses are saved in it and reused by the next runs
+        pool_size:int=0,   ## connections kept alive, 0 mean one for every worker
+        classifier:AffiliationClassifier=DEFAULT_CLASSIFIER,  ## it give the [affil] pre filter of the esearch
     ) -> None:             ## but for increased rate you need key for API
         self.api_key:str = api_key
         self.email:str = email
+        self.workers:int = max( 1, workers)
+        self.retries:int = max( 0, retries)
+        self.backoff:float = backoff
+        self.timeout:float = timeout
+        self.cache:Optional[ResponseCache] = cache
+        self.classifier:AffiliationClassifier = classifier
+        if base_url != '' : self.BASE_URL = base_url.rstrip('/')
+        ## one limiter for all the threads, so together they are under the NCBI rate limit
+        self.rate_limiter:RateLimiter = RateLimiter( self.KEY_RATE if api_key != '' else self.RATE )
+        self.open_session(pool_size)
 
-    def esearch(
+    def open_session(
         self,
-        terms:list[str],
-        sort:str,
-        reldate:int,
-        mindate:str,
-        maxdate:str,
-    ) -> Optional[list[str]]:
+        pool_size:int,
+    ) -> None:
         """
-        this function is for search the database and store all the result in the history server of the National Library of Medicine
+        this function make one session for all the requests, so the connections are kept alive and reused between the batches
+        """
+        self.session:requests.Session = requests.Session()
+        adapter:HTTPAdapter = HTTPAdapter( pool_connections=1, pool_maxsize=pool_size or self.workers, max_retries=0)  ## retries are done by us
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Accept-Encoding'] = self.ACCEPT_ENCODING
+
+    def retry_after(
+        self,
+        response:requests.Response,
+        attempt:int,
+    ) -> float:
+        """
+        this function return the seconds to wait before the next try, it use the Retry-After header of the response
+        if the server give it otherwise exponential backoff with full jitter
+        """
+        header:str = response.headers.get('Retry-After', '')
+        if header != '':
+            try:
+                return min( float(header), self.MAX_BACKOFF )
+            except ValueError:  ## it can also be a http date
+                try:
+                    return min( max( 0.0, ( parsedate_to_datetime(header) - datetime.now(timezone.utc) ).total_seconds() ), self.MAX_BACKOFF )
+                except ( TypeError, ValueError ):
+                    pass
+        return self.backoff_delay(attempt)
+
+    def backoff_delay(self, attempt:int) -> float:
+        """
+        this function return the exponential backoff with full jitter for the attempt ( start from 0 )
+        """
+        return random.uniform( 0, min( self.MAX_BACKOFF, self.backoff * ( 2 ** attempt ) ) )
+
+    def request(
+        self,
+        url:str,
+        params:dict,
+        method:str='GET',
+        stream:bool=False,
+    ) -> requests.Response:
+        """
+        this function send the request using the pooled session under the rate limit and retry it when the
+        server give a temporary error ( 429 or 5xx ) or the connection is broken
         ---
         OUTPUT:
-            - WebEnv : It is key for getting in the history server where all the result are stored
-            - query_key : It is the key for getting the result for a given terms search
+            - It return the last response, the caller check the status code of it
         ---
         INPUT:
-            - terms : It is the keys we wanted to search( you can use all search parameters )
-            - sort :options [ pub_date, Author, JournalName, relevance (default) ] : It is the keys for sort the search and you can choose any given value.
-            - reldate : For getting only i days old papers in Esearch
-            - mindate : For getting only papers publish after a date. Format are: YYYY or YYYY/MM
-            - maxdate : For getting only papers publich before a date. Format are: YYYY or YYYY/MM
+            - url : It is the url of the utility
+            - params : It is the parameters, they are send as query for GET and as form for POST
+            - method : GET or POST
+            - stream : If true the body is not downloaded until the caller read it
         """
+        ## time until the response head come ( with the retries and waits ) is the stage of the utility, like esearch_request
+        with METRICS.stage( url.rsplit('/', 1)[-1].split('.', 1)[0] + '_request' ):
+            return self._request(url, params, method, stream)
 
-        url:str = self.BASE_URL + '/esearch.fcgi' # url for the Esearch utility provided
+    def _request(
+        self,
+        url:str,
+        params:dict,
+        method:str,
+        stream:bool,
+    ) -> requests.Response:
+        attempt:int = 0
+        while True:
+            self.rate_limiter.acquire()
+            METRICS.add('http_requests')
+            try:
+                if method == 'POST':
+                    response:requests.Response = self.session.post(url, data=params, stream=stream, timeout=self.timeout)
+                else:
+                    response = self.session.get(url, params=params, stream=stream, timeout=self.timeout)
+            except self.RETRY_ERRORS as error_:
+                if attempt >= self.retries : raise
+                wait:float = self.backoff_delay(attempt)
+                error(f'Request failed, retrying in {wait:.2f} seconds')
+                debug(f'{error_}')
+            else:
+                if response.status_code not in self.RETRY_STATUS or attempt >= self.retries:
+                    return response
+                wait = self.retry_after(response, attempt)
+                error(f'Server give {response.status_code}, retrying in {wait:.2f} seconds')
+                response.close()   ## give the connection back to the pool
+            attempt += 1
+            self.wait_retry(wait)
+
+    def wait_retry(self, wait:float) -> None:
+        METRICS.add('http_retries')
+        METRICS.add('retry_wait_seconds', wait)
+        time.sleep(wait)
 
+    def broken_body(
+        self,
+        error_:Exception,
+        attempt:int,
+    ) -> None:
+        """
+        this function is called when the body of an efetch is cut by the network, it raise the error when no retry is
+        left otherwise it wait the backoff, so the same window is asked again
+        """
+        if attempt >= self.retries : raise error_
+        wait:float = self.backoff_delay(attempt)
+        error(f'Download is broken, asking the same papers again in {wait:.2f} seconds')
+        debug(f'{error_}')
+        self.wait_retry(wait)
+
+    def build_term(
+        self,
+        terms:list[str],
+    ) -> str:
+        """
+        this function join the terms into the esearch term
+        """
         term:str = '+'.join(terms)
 
         ## this is add to include only those paper have atleast one non academic author as the requirement
         ## It also light out the response and make it more easy to use and make it more lightweight and fast
-        term += ' AND (Inc[affil] OR Ltd[affil] OR Corporation[affil] OR "Private Practice"[affil])'
+        term += ' AND ' + self.classifier.esearch_clause()
+        return term
+
+    def esearch_params(
+        self,
+        terms:list[str],
+        sort:str,
+        reldate:int,
+        mindate:str,
+        maxdate:str,
+    ) -> dict[ str, str]:
+        """
+        this function return the parameters of the esearch that save the result in the history server
+        """
+        term:str = self.build_term(terms)
+
         ## these are the parameters we are going to use
-        params:dict[str, Union[ str,list[str]]] = {
+        params:dict[ str, str] = {
             'db': 'pubmed',
             'term': term,
             'sort': sort,
@@ -104,59 +387,273 @@ class APIs:    ## any sorry for naming, i am terable in it
         if reldate != -1 : params['reldate'] = str(reldate)
         if mindate != '' : params['mindate'] = mindate
         if maxdate != '' : params['maxdate'] = maxdate
+        return params
+
+    def esearch(
+        self,
+        terms:list[str],
+        sort:str,
+        reldate:int,
+        mindate:str,
+        maxdate:str,
+    ) -> Optional[list[str]]:
+        """
+        this function is for search the database and store all the result in the history server of the National Library of Medicine
+        ---
+        OUTPUT:
+            - WebEnv : It is key for getting in the history server where all the result are stored
+            - query_key : It is the key for getting the result for a given terms search
+            - count : It is the total number of papers stored behind the query_key
+        ---
+        INPUT:
+            - terms : It is the keys we wanted to search( you can use all search parameters )
+            - sort :options [ pub_date, Author, JournalName, relevance (default) ] : It is the keys for sort the search and you can choose any given value.
+            - reldate : For getting only i days old papers in Esearch
+            - mindate : For getting only papers publish after a date. Format are: YYYY or YYYY/MM
+            - maxdate : For getting only papers publich before a date. Format are: YYYY or YYYY/MM
+        """
+
+        url:str = self.BASE_URL + '/esearch.fcgi' # url for the Esearch utility provided
+
+        params:dict[ str, str] = self.esearch_params(terms, sort, reldate, mindate, maxdate)
 
         try:
             info('Initicate the Search Request')
-            ## now i don't use retry block but we can add this using a decorator and make it as function or a while loop
-            response:requests.Response = requests.get(url,params=params)
+            response:requests.Response = self.request(url,params)
 
             if response.status_code == 200:
                 info('Request is Successful')
                 result:dict[str,dict] = response.json() ## this response in json
-                count:int = result.get('esearchresult',{}).get('count',0) ## total number of paper in the result
-                ## printing the count of papers and if count is zero exit the code
-                info(f'Total Paper Founds: {count}') if count != 0 else critical('No Paper is Found',code=ExitCodes.NO_RESULT)
+                count:int = int(result.get('esearchresult',{}).get('count',0)) ## total number of paper in the result ( it come as string in json )
+                ## printing the count of papers and if count is zero stop the search
+                if count == 0 : raise NoResultError('No Paper is Found')
+                info(f'Total Paper Founds: {count}')
 
                 ## extracting the WebEnv and query_key for response for downloading the papers
                 webEnv:str = result['esearchresult']['webenv']     # by doing this if they are not found we get the error
                 query_key:str = result['esearchresult']['querykey']
-                return [ webEnv, query_key ]
+                return [ webEnv, query_key, str(count) ]
             else:
                 error('Response is Bad')
                 debug(f'Response code is : {response.status_code}')
                 debug(f'Response is: {response.text}')
-                critical('Bad Response', code=ExitCodes.BAD_RESPONSE)
+                raise BadResponseError('Bad Response', response.status_code)
+        except PapersError:
+            raise
         ## getting any request exception
         except requests.exceptions.RequestException as error_:
             info('Unable to send requests')
             debug(f'{error_}')
-            critical('Somethings goes wrong', code=ExitCodes.FAIL_REQUEST)
+            raise RequestFailedError(f'Unable to send the search request: {error_}') from error_
         except Exception as error_:
             debug(f'{error_}')
-        critical('Somethings goes wrong', code=ExitCodes.GENERAL_ERROR)
+            raise PapersError(f'Somethings goes wrong: {error_}') from error_
+
+    def esearch_ids(
+        self,
+        terms:list[str],
+        sort:str,
+        reldate:int,
+        mindate:str,
+        maxdate:str,
+        extra:str='',
+        limit:int=-1,
+    ) -> tuple[ int, list[str]]:
+        """
+        this function search the database like esearch but it return only the list of pmids ( rettype=uilist )
+        and not use the history server, esearch not give more than 10000 pmids for a search
+        ---
+        OUTPUT:
+            - count : It is the number of papers of the search, it can be more than the listed pmids
+            - pmids : It is the pmids of the search in the order of sort
+        ---
+        INPUT:
+            - terms, sort, reldate, mindate, maxdate : same as the esearch ( dates are publication dates )
+            - extra : It is added to the term with AND ( like a modification date range )
+            - limit : It is the max number of pmids listed, 0 mean only count is read ( -1 mean 10000 )
+        """
+        url:str = self.BASE_URL + '/esearch.fcgi'
+
+        term:str = self.build_term(terms)
+        if extra != '' : term += ' AND ' + extra
+
+        params:dict[str, str] = {
+            'db': 'pubmed',
+            'term': term,
+            'sort': sort,
+            'rettype': 'uilist',
+            'retmax': str(self.MAX_BATCH_SIZE),
+            'retmode': 'json'
+        }
+
+        if self.api_key != '' : params['api_key'] = self.api_key
+        if self.email != '' : params['email'] = self.email
+
+        if reldate != -1 : params['reldate'] = str(reldate)
+        if mindate != '' : params['mindate'] = mindate
+        if maxdate != '' : params['maxdate'] = maxdate
+        if reldate != -1 or mindate != '' or maxdate != '' : params['datetype'] = 'pdat'
+
+        limit = self.MAX_BATCH_SIZE if limit < 0 else min( limit, self.MAX_BATCH_SIZE )
+        params['retmax'] = str(limit)
+
+        pmids:list[str] = []
+        try:
+            debug(f'Initicate the ID Search Request {mindate} to {maxdate}')
+            while True:
+                params['retstart'] = str(len(pmids))
+                response:requests.Response = self.request(url,params)
+
+                if response.status_code != 200:
+                    error('Response is Bad')
+                    debug(f'Response code is : {response.status_code}')
+                    debug(f'Response is: {response.text}')
+                    raise BadResponseError('Bad Response', response.status_code)
 
+                result:dict[str,dict] = response.json()
+                count:int = int(result['esearchresult']['count'])
+                if count == 0 and extra == '' and limit != 0 : raise NoResultError('No Paper is Found')
+                page:list[str] = result['esearchresult']['idlist']
+                pmids.extend(page)
+                if len(page) == 0 or len(pmids) >= min( count, limit ):
+                    break
+            if count > len(pmids) and limit == self.MAX_BATCH_SIZE:
+                error(f'Search has {count} papers but only first {len(pmids)} pmids can be listed')
+            debug(f'Total Paper Founds: {count}')
+            return count, pmids
+        except PapersError:
+            raise
+        except requests.exceptions.RequestException as error_:
+            info('Unable to send requests')
+            debug(f'{error_}')
+            raise RequestFailedError(f'Unable to send the search request: {error_}') from error_
+        except Exception as error_:
+            debug(f'{error_}')
+            raise PapersError(f'Somethings goes wrong: {error_}') from error_
 
     def efetch(
         self,
         webEnv:str,
         query_key:str,
-    ) -> Optional[str]:
+        count:int,
+        batch_size:int=500,
+        cache_key:str='',
+        renew:Optional[Callable[ [], tuple[ str, str]]]=None,
+    ) -> Iterator[str]:
         """
-        this function is use for download all the papers from the history server of the nlm
+        this function is use for download all the papers from the history server of the nlm in batches
+        the batches are downloaded by the workers in parallel but yield in the order of retstart
         ---
         OUTPUT:
-            - It return a string that contain all the data
+            - It yield the medline data as chunks of string ( a chunk can end in middle of a line ), so whole result never sit in memory
         ---
         INPUT:
             - WebEnv : It is key for getting in the history server where all the result are stored
             - query_key : It is the key for getting the result for a given terms search
+            - count : It is the total number of papers behind the query_key ( we get it from the esearch )
+            - batch_size : It is number of papers downloaded in one request ( efetch allow at most 10000 )
+            - cache_key : It is the key of the search, batches are looked up in the cache and saved to it under this key
+            - renew : It is called when the history session is expired, it search again and return the new WebEnv and query_key
+        """
+        for _, chunks in self.efetch_batches(webEnv, query_key, count, batch_size, cache_key, renew=renew):
+            yield from chunks
+
+    def efetch_batches(
+        self,
+        webEnv:str,
+        query_key:str,
+        count:int,
+        batch_size:int=500,
+        cache_key:str='',
+        start:int=0,
+        renew:Optional[Callable[ [], tuple[ str, str]]]=None,
+    ) -> Iterator[tuple[ int, Iterator[str]]]:
+        """
+        this function is the efetch, but every batch is yield on its own as ( end, chunks ) where end is the retstart of
+        the next batch, so the caller know where a batch end ( for the checkpoint ), the chunks of a batch has to be read
+        before the next batch is asked
+        ---
+        INPUT:
+            - webEnv, query_key, count, batch_size, cache_key, renew : same as efetch
+            - start : It is the retstart of the first batch, a resumed search start after its finished batches
         """
         url:str = self.BASE_URL + '/efetch.fcgi'
 
+        batch_size = max( 1, min( batch_size, self.MAX_BATCH_SIZE ))
+
+        ## the history session is shared by the workers, the first one that find it expired renew it for all
+        session:list[str] = [ webEnv, query_key ]
+        lock:threading.Lock = threading.Lock()
+
+        def renewing(retstart:int, download:Callable[ [str, dict[ str, str]], R]) -> R:
+            used:list[str] = list(session)
+            try:
+                return download(url, self.efetch_params(used[0], used[1], retstart, batch_size))
+            except BadResponseError as error_:
+                ## an expired ( or lost ) WebEnv give 400, the search is made again and the batch is asked again
+                if renew is None or error_.status != 400 : raise
+                with lock:
+                    if session == used:
+                        error('History session is expired, searching again')
+                        session[:] = renew()
+                return download(url, self.efetch_params(session[0], session[1], retstart, batch_size))
+
+        windows:range = range( start, count, batch_size )
+        cache:Optional[ResponseCache] = self.cache if cache_key != '' else None
+
+        def window_key(retstart:int) -> str:
+            return ResponseCache.key(cache_key, count, retstart, batch_size)
+
+        def saved(retstart:int, chunks:Iterable[str]) -> Iterator[str]:
+            ## the chunks are kept only for writing the batch into the cache
+            if cache is None:
+                yield from chunks
+                return
+            kept:list[str] = []
+            for chunk in chunks:
+                kept.append(chunk)
+                yield chunk
+            cache.put(window_key(retstart), ''.join(kept))
+
+        def fetch(retstart:int) -> Union[ str, Body]:
+            if cache is not None:
+                cached:Optional[str] = cache.get(window_key(retstart))
+                if cached is not None : return cached
+            return renewing(retstart, self._efetch_body)
+
+        if self.workers == 1:
+            ## with one worker the batches are streamed chunk by chunk, nothing more than a chunk is hold in memory
+            for retstart in windows:
+                cached:Optional[str] = cache.get(window_key(retstart)) if cache is not None else None
+                if cached is not None:
+                    yield min( retstart + batch_size, count ), iter([ cached ])
+                    continue
+                yield min( retstart + batch_size, count ), saved( retstart, renewing(retstart, self._efetch_batch) )
+        else:
+            ## with many workers a batch has to be kept until all the batches before it are yield, it is kept
+            ## as it come from the network ( gzipped ) and decoded only when it is its turn
+            for retstart, batch in zip( windows, concurrent_map( fetch, windows, self.workers ) ):
+                if isinstance(batch, str):
+                    yield min( retstart + batch_size, count ), iter([ batch ])
+                    continue
+                yield min( retstart + batch_size, count ), saved( retstart, decode_body( self.body_chunks(batch[0]), batch[1], batch[2] ) )
+
+    def efetch_params(
+        self,
+        webEnv:str,
+        query_key:str,
+        retstart:int,
+        batch_size:int,
+    ) -> dict[ str, str]:
+        """
+        this function return the parameters of the efetch of one window of the papers behind the query_key
+        """
         params:dict[ str, str] = {
             'db': 'pubmed',
             'WebEnv': webEnv,
             'query_key': query_key,
+            'retstart': str(retstart),
+            'retmax': str(batch_size),
             'retmode': 'text',
             'rettype': 'medline',
         }
@@ -164,29 +661,213 @@ class APIs:    ## any sorry for naming, i am terable in it
         # we can use this service without any api key or email
         if self.api_key != '' : params['api_key'] = self.api_key
         if self.email != '' : params['email'] = self.email
+        return params
 
-        try:
-            info('Initicate the Download Request')
-            ## not using retry block there
-            response: requests.Response = requests.get(url,params=params)
+    def cached(
+        self,
+        cache_key:str,
+        count:int,
+        batch_size:int,
+    ) -> bool:
+        """
+        this function tell that all the batches of a search are in the cache, so no request is needed
+        """
+        if self.cache is None : return False
+        batch_size = max( 1, min( batch_size, self.MAX_BATCH_SIZE ))
+        return all( self.cache.has(ResponseCache.key(cache_key, count, retstart, batch_size)) for retstart in range( 0, count, batch_size ) )
 
-            if response.status_code == 200:
-                info('Request is Successful')
-                return response.text  ## this request return a response in medline formamt that is just strings
+    def efetch_ids(
+        self,
+        pmids:Sequence[str],
+        batch_size:int=500,
+    ) -> Iterator[str]:
+        """
+        this function download the papers of the given pmids, the pmids are send with POST in batches
+        ---
+        OUTPUT:
+            - It yield the medline data as chunks of string in the order of pmids
+        ---
+        INPUT:
+            - pmids : It is the pmids of the papers ( a list or a PmidArray, only a batch of it is read at a time )
+            - batch_size : It is number of papers downloaded in one request
+        """
+        for _, chunks in self.efetch_ids_batches(pmids, batch_size):
+            yield from chunks
 
-            else:
-                error('Request is Unsuccessful')
-                debug(f'Response Code is: {response.status_code}')
-                debug(f'Response is : {response.text}')
-                critical('Bad Response', code=ExitCodes.BAD_RESPONSE)
+    def efetch_ids_batches(
+        self,
+        pmids:Sequence[str],
+        batch_size:int=500,
+        start:int=0,
+    ) -> Iterator[tuple[ int, Iterator[str]]]:
+        """
+        this function is the efetch_ids, but every batch is yield on its own as ( end, chunks ) like efetch_batches
+        start is the index of the first pmid downloaded
+        """
+        url:str = self.BASE_URL + '/efetch.fcgi'
 
-        except requests.exceptions.RequestException as error_:
+        batch_size = max( 1, min( batch_size, self.MAX_BATCH_SIZE ))
+
+        def params_for(offset:int) -> dict[ str, str]:
+            params:dict[ str, str] = {
+                'db': 'pubmed',
+                'id': ','.join(pmids[ offset : offset + batch_size ]),
+                'retmode': 'text',
+                'rettype': 'medline',
+            }
+            if self.api_key != '' : params['api_key'] = self.api_key
+            if self.email != '' : params['email'] = self.email
+            return params
+
+        windows:range = range( start, len(pmids), batch_size )
+
+        if self.workers == 1:
+            for offset in windows:
+                yield min( offset + batch_size, len(pmids) ), self._efetch_batch(url, params_for(offset), method='POST')
+        else:
+            for offset, ( data, content_encoding, charset ) in zip( windows, concurrent_map(
+                lambda offset: self._efetch_body(url, params_for(offset), method='POST'),
+                windows,
+                self.workers,
+            )):
+                yield min( offset + batch_size, len(pmids) ), decode_body( self.body_chunks(data), content_encoding, charset )
+
+    def _efetch_batch(
+        self,
+        url:str,
+        params:dict[ str, str],
+        method:str='GET',
+    ) -> Iterator[str]:
+        """
+        this function download a single window ( retstart to retstart + retmax, or a list of ids ) of the papers and yield it in chunks
+        as they come from the network, chunks can end in the middle of a line
+        the request is send when this function is called ( so a bad response is raised here ), the body is read by the iterator
+        """
+        with self.download_errors():
+            response:requests.Response = self._efetch_response(url, params, method)
+        return self._efetch_chunks(url, params, method, response)
+
+    def _efetch_chunks(
+        self,
+        url:str,
+        params:dict[ str, str],
+        method:str,
+        response:requests.Response,
+    ) -> Iterator[str]:
+        ## when the body is cut the window is asked again and the text that is already yield is skipped, the same
+        ## window give the same text, so the caller see the body once and whole
+        sent:int = 0
+        attempt:int = 0
+        with self.download_errors():
+            while True:
+                skip:int = sent
+                try:
+                    with response:
+                        for text in decode_body( self.raw_chunks(response), self.content_encoding(response), charset_of(response.headers) ):
+                            if skip >= len(text):
+                                skip -= len(text)
+                                continue
+                            text, skip = text[skip:], 0
+                            sent += len(text)
+                            yield text
+                    return
+                except self.RETRY_ERRORS as error_:
+                    self.broken_body(error_, attempt)
+                attempt += 1
+                response = self._efetch_response(url, params, method)
+
+    def _efetch_body(
+        self,
+        url:str,
+        params:dict[ str, str],
+        method:str='GET',
+    ) -> Body:
+        """
+        this function download a single window of the papers like _efetch_batch, but the body is returned as it come from
+        the network ( still gzipped ), it is for the batches that wait in memory for their turn
+        """
+        attempt:int = 0
+        with self.download_errors():
+            while True:
+                response:requests.Response = self._efetch_response(url, params, method)
+                try:
+                    with response:
+                        return b''.join( self.raw_chunks(response) ), self.content_encoding(response), charset_of(response.headers)
+                except self.RETRY_ERRORS as error_:
+                    self.broken_body(error_, attempt)
+                attempt += 1
+
+    @contextmanager
+    def download_errors(self) -> Iterator[None]:
+        """
+        this function turn the errors of a download into the errors of errors.py
+        """
+        try:
+            yield
+        except PapersError:
+            raise
+        except ( requests.exceptions.RequestException, urllib3.exceptions.HTTPError, http.client.HTTPException ) as error_:
             error('Unable to Send request')
             debug(f'{error_}')
-            critical('Somethings goes wrongs', code=ExitCodes.FAIL_REQUEST)
+            raise RequestFailedError(f'Unable to download the papers: {error_}') from error_
         except Exception as error_:
             debug(f'{error_}')
-        critical('Something goes wrong', code=ExitCodes.GENERAL_ERROR)
+            raise PapersError(f'Something goes wrong: {error_}') from error_
+
+    def _efetch_response(
+        self,
+        url:str,
+        params:dict[ str, str],
+        method:str,
+    ) -> requests.Response:
+        """
+        this function send the efetch of a window and return the response with the body not read yet
+        """
+        if 'id' in params:
+            info(f'Initicate the Download Request for {params["id"].count(",") + 1} papers')
+        else:
+            info(f'Initicate the Download Request for papers {params["retstart"]} to {int(params["retstart"]) + int(params["retmax"])}')
+        response: requests.Response = self.request(url,params,method=method,stream=True)
+
+        if response.status_code != 200:
+            error('Request is Unsuccessful')
+            debug(f'Response Code is: {response.status_code}')
+            debug(f'Response is : {response.text}')
+            raise BadResponseError('Bad Response', response.status_code)
+        info('Request is Successful')
+        return response
+
+    def content_encoding(
+        self,
+        response:requests.Response,
+    ) -> str:
+        """
+        this function return gzip if the body is gzipped and inflated by decode_body, otherwise empty
+        """
+        return 'gzip' if response.headers.get('Content-Encoding', '').strip().lower() == 'gzip' else ''
+
+    def raw_chunks(
+        self,
+        response:requests.Response,
+    ) -> Iterator[bytes]:
+        """
+        this function yield the body of the response as it come from the network, gzip is not undone by urllib3 so
+        the bytes on the wire are counted and the body can be kept compressed ( any other encoding is undone by urllib3 )
+        """
+        raw:Iterable[bytes] = response.raw.stream( self.CHUNK_SIZE, decode_content=self.content_encoding(response) == '' )
+        for chunk in METRICS.timed( 'download', raw ):
+            METRICS.add('bytes_downloaded', len(chunk))
+            yield chunk
+
+    def body_chunks(
+        self,
+        data:bytes,
+    ) -> Iterator[bytes]:
+        """
+        this function cut a downloaded body in chunks of CHUNK_SIZE, so it is decoded like a streamed one
+        """
+        for start in range( 0, len(data), self.CHUNK_SIZE ):
+            yield data[ start : start + self.CHUNK_SIZE ]
 
 
     def runner(
@@ -196,9 +877,11 @@ class APIs:    ## any sorry for naming, i am terable in it
         reldate:int,
         mindate:str,
         maxdate:str,
-    ) -> Optional[str]:
+        batch_size:int=500,
+        checkpoint:Optional[Checkpoint]=None,
+    ) -> Iterator[str]:
         """
-        this function search the pubmed using api request and return the string contain all the papers in medline format
+        this function search the pubmed using api request and yield the papers in medline format chunk by chunk
         ---
         INPUT:
             - terms : It is the keys we wanted to search( you can use all search parameters )
@@ -206,150 +889,615 @@ class APIs:    ## any sorry for naming, i am terable in it
             - reldate : For getting only i days old papers in Esearch
             - mindate : For getting only papers publish after a date. Format are: YYYY or YYYY/MM
             - maxdate : For getting only papers publich before a date. Format are: YYYY or YYYY/MM
+            - batch_size : It is number of papers downloaded in one efetch request
+            - checkpoint : If given the history session is saved in it and the batches are tracked, a resumed checkpoint
+                           give the history session of the search and the download start after its finished batches
         """
-        webEnv, query_key = self.esearch(
-            terms,
-            sort,
-            reldate,
-            mindate,
-            maxdate,
-        ) or [ '', '']  ## this for remove the error from pyright
-        return self.efetch(webEnv,query_key)
+        cache_key:str = ''
+        if self.cache is not None:
+            ## key is made from everything that change the result of the search
+            cache_key = ResponseCache.key('esearch', self.build_term(terms), sort, reldate, mindate, maxdate)
+
+        def renew() -> tuple[ str, str]:
+            webEnv, query_key, found = self.esearch(terms, sort, reldate, mindate, maxdate) or [ '', '', '0']
+            if int(found) != count:
+                error(f'Search has {found} papers now and not {count}, some papers can be missed or written twice')
+            if checkpoint is not None : checkpoint.update( webenv=webEnv, query_key=query_key )
+            return webEnv, query_key
+
+        if checkpoint is not None and checkpoint.get('count') is not None:
+            ## the history session of the resumed search, it is renewed if it is expired
+            webEnv, query_key, count = checkpoint.get('webenv'), checkpoint.get('query_key'), checkpoint.get('count')
+            info(f'Total Paper Founds: {count} ( from checkpoint )')
+        else:
+            cached_count:Optional[str] = self.cache.get(cache_key) if self.cache is not None else None
+            if cached_count is not None and self.cached(cache_key, int(cached_count), batch_size):
+                info(f'Total Paper Founds: {cached_count} ( from cache )')
+                ## history server is not needed when every batch is in the cache
+                webEnv, query_key, count = '', '', int(cached_count)
+            else:
+                webEnv, query_key, found = self.esearch(
+                    terms,
+                    sort,
+                    reldate,
+                    mindate,
+                    maxdate,
+                ) or [ '', '', '0']  ## this for remove the error from pyright
+                count = int(found)
+                if self.cache is not None : self.cache.put(cache_key, found)
+            if checkpoint is not None : checkpoint.update( webenv=webEnv, query_key=query_key, count=count )
+
+        if checkpoint is None:
+            return self.efetch(webEnv, query_key, count, batch_size, cache_key, renew=renew)
+        return checkpoint.track( self.efetch_batches(webEnv, query_key, count, batch_size, cache_key, start=checkpoint.done, renew=renew) )
+
+
+## these are the medline tag handlers, each one put the value of its tag into the paper
+## the repeated values ( dates, journals, affiliations ) are interned so every copy share one string
+def _pmid(paper:Paper, value:str) -> None:
+    paper.pubmedID = value
+
+def _dp(paper:Paper, value:str) -> None:
+    paper.DOP = intern(value)
+
+def _ti(paper:Paper, value:str) -> None:
+    paper.title = value
+
+def _jt(paper:Paper, value:str) -> None:
+    paper.journal = intern(value)
+
+def _ab(paper:Paper, value:str) -> None:
+    paper.abstract = value
+
+def _lr(paper:Paper, value:str) -> None:
+    paper.revised = intern(value)
+
+def _doi(paper:Paper, value:str) -> None:
+    ## LID and AID are like '10.1000/xyz [doi]', there are also [pii] and [pmc] ones
+    if paper.doi == '' and value.endswith(' [doi]'):
+        paper.doi = value[:-6]
+
+def _mh(paper:Paper, value:str) -> None:
+    paper.mesh += ( intern(value), )    ## same headings ( like 'Humans' ) are in most records
 
+def _fau(paper:Paper, value:str) -> None:
+    paper.authors.append( Author(value) )
+
+def _au(paper:Paper, value:str) -> None:
+    authors:list[Author] = paper.authors
+    value = intern(value)    ## short names like 'Wang Y' are repeated a lot
+    if authors and authors[-1].short == '':
+        authors[-1].short = value
+    else:    ## old records have only AU and not FAU
+        authors.append( Author(value, value) )
+
+def _ad(paper:Paper, value:str) -> None:
+    authors:list[Author] = paper.authors
+    if authors:
+        author:Author = authors[-1]
+        value = intern(value)
+        if author.aff == '':
+            author.aff = value
+        author.affs += ( value, )
+
+TAG_HANDLERS:dict[ str, Callable[ [Paper, str], None]] = {
+    'PMID': _pmid,
+    'DP  ': _dp,
+    'TI  ': _ti,
+    'JT  ': _jt,
+    'AB  ': _ab,
+    'LR  ': _lr,
+    'LID ': _doi,
+    'AID ': _doi,
+    'FAU ': _fau,
+    'AU  ': _au,
+    'AD  ': _ad,
+    'MH  ': _mh,
+}
 
 ## this class contain the function that process the response data and store the useful data into
 ## csv file and it not take care of email because in reponse there is not emial
 class Processor:
 
-    def __init__(self) -> None:
-        pass
+    CHUNK_BYTES:int = 1024 * 1024    ## size of the medline text given to a parse worker at once
+    TABLE_ROWS:int = 10000           ## papers put in the table and filtered at once
+
+    def __init__(
+        self,
+        query:Optional[str]=None,    ## if given it is written in a Query column before every row
+        workers:int=1,               ## number of processes that parse and filter the records
+        format:str='',               ## output format ( csv, jsonl, parquet, arrow ), empty mean from the file extension
+        classifier:AffiliationClassifier=DEFAULT_CLASSIFIER,    ## it tell which authors are academic
+        checkpoint:Optional[Checkpoint]=None,   ## if given the output is opened by it and the finished batches are saved in it
+        table:str='',                ## if given every paper with all its authors is saved in this directory ( see table.py )
+    ) -> None:
+        self.query:Optional[str] = query
+        self.workers:int = max( 1, workers)
+        self.format:str = format
+        self.classifier:AffiliationClassifier = classifier
+        self.checkpoint:Optional[Checkpoint] = checkpoint
+        self.table:str = table
+
+    def lines(
+        self,
+        chunks:Iterable[str],
+    ) -> Iterator[str]:
+        """
+        this function convert the chunks of medline data into lines, a chunk can end in middle of the line so
+        the last part is kept until the next chunk come
+        """
+        rest:str = ''
+        for chunk in chunks:
+            if '\r' in chunk:    ## some servers give windows line endings
+                chunk = chunk.replace('\r', '')
+            parts:list[str] = ( rest + chunk ).split('\n')
+            rest = parts.pop()
+            yield from parts
+        if rest != '':
+            yield rest
 
     def rectifier(
         self,
-        medline_data:str,
-    ) -> list[str]:
+        medline_lines:Iterable[str],
+    ) -> Iterator[str]:
         """
-        this function convert the medline multiline data into a single line medline data array
+        this function convert the medline multiline data into single line medline data
         """
-        rectified_data:list[str] = []
-        for line in medline_data.splitlines():
-            if line.startswith('      '):       ## because the continume line is start with six spaces
-                rectified_data[-1] += line[4:]
+        current:Optional[str] = None
+        parts:Optional[list[str]] = None     ## only made when a line has continuation, most lines don't
+        for line in medline_lines:
+            if line.startswith('      ') and current is not None:       ## because the continume line is start with six spaces
+                if parts is None:
+                    parts = [ current ]
+                parts.append(line[5:])                                     ## keeping one space as separator
             else:
-                rectified_data.append(line)
-        return rectified_data
+                if current is not None:
+                    yield current if parts is None else ''.join(parts)
+                current = line
+                parts = None
+        if current is not None:
+            yield current if parts is None else ''.join(parts)
 
     def convertor_and_filter(
         self,
-        _Data:list[str]
-    ) -> None:
+        _Data:Iterable[str]
+    ) -> Iterator[Paper]:
         """
-        this function that convert single line medline into dict
+        this function that convert single line medline into dict and remove the academic authors from them
         """
-        self.papers:Papers = []  ## i know thats two much
-        paper:Paper = {
-            "pubmedID": "",
-            "DOP": "",
-            "title": "",
-            "authors": []
-        }
+        for paper in self.convertor(_Data):
+            yield self.filter(paper)
+
+    def convertor(
+        self,
+        _Data:Iterable[str]
+    ) -> Iterator[Paper]:
+        """
+        this function that convert single line medline into dict, it yield a paper as soon as its record is end
+        every medline line is 'TAG - value' where TAG is 4 chars wide, so tag is looked up in TAG_HANDLERS
+        and the lines of other tags are skipped without any split
+        """
+        handlers:dict[ str, Callable[ [Paper, str], None]] = TAG_HANDLERS
+        paper:Optional[Paper] = None
         for line in _Data:
-            if ( line == '' or line == ' ' ) and paper != {
-                "pubmedID": "",
-                "DOP": "",
-                "title": "",
-                "authors": []
-            }:
-                self.papers.append(paper)
-                paper:Paper = {
-                    "pubmedID": "",
-                    "DOP": "",
-                    "title": "",
-                    "authors": []
-                }
-            else:
-                if line.startswith('PMID- '):
-                    paper['pubmedID'] = line.split('PMID- ',1)[1].strip()
-                elif line.startswith('DP  - '):
-                    paper['DOP'] = line.split('DP  - ',1)[1].strip()
-                elif line.startswith('TI  - '):
-                    paper['title'] = line.split('TI  - ')[1].strip()
-                elif line.startswith('FAU - '):
-                    author = line.split('FAU - ',1)[1].strip()
-                    if 'authors' not in paper:
-                        paper['authors'] = []
-                    paper['authors'].append({
-                        'name': author,
-                        'aff': '',
-                    })
-                elif line.startswith('AD  - ') and len(paper['authors']) != 0 and paper['authors'][-1]['aff'] == '':
-                    aff = line.split('AD  - ',1)[1].strip()
-                    if 'University' in aff or 'Hospital' in aff:
-                        paper['authors'].pop(-1)
-                    else:
-                        paper['authors'][-1]['aff'] = aff
-        if paper:
-            self.papers.append(paper)
-
-    def preprocess(self) -> None:
-        """
-        this function preprocess the
-        """
-        self.preprocessed:Table = [ [ 'PubMedID' , 'DOP' , 'Title' , 'Author' , 'Affiliation' ] ]
-        for paper in self.papers:
-            if len( paper['authors'] ) == 0 :
-                self.preprocessed.append( [ paper['pubmedID'] , paper['DOP'] , paper['title'] , None , None ] )
+            if line == '' or line == ' ':    ## blank line is the end of record
+                if paper is not None:
+                    yield paper
+                    paper = None
+                continue
+            handler:Optional[Callable[ [Paper, str], None]] = handlers.get(line[:4])
+            if handler is None or not line.startswith('- ', 4):
+                continue
+            if paper is None:
+                paper = Paper()
+            handler(paper, line[6:])
+        if paper is not None:    ## last record not end with blank line
+            yield paper
+
+    def filter(
+        self,
+        paper:Paper,
+    ) -> Paper:
+        """
+        this function remove the academic authors from the paper, author is academic if its first affiliation is academic
+        it give a new paper so the given paper is not changed
+        """
+        is_academic:Callable[ [Optional[str]], bool] = self.classifier.is_academic
+        return paper.with_authors([ author for author in paper.authors if not is_academic(author.aff) ])
+
+    def filtered(
+        self,
+        papers:Iterable[Paper],
+    ) -> Iterator[Paper]:
+        """
+        this function remove the academic authors of the papers, with a table the papers are saved in it first
+        """
+        if self.table != '' : return self.tabled(papers)
+        return ( self.filter(paper) for paper in papers )
+
+    def tabled(
+        self,
+        papers:Iterable[Paper],
+    ) -> Iterator[Paper]:
+        """
+        this function save the papers ( with all their authors ) into the table batch by batch and yield them filtered,
+        the academic authors of a batch are found on the columns of its table, every distinct affiliation is classified once
+        """
+        from get_papers_list.table import TableWriter    ## pyarrow is imported only with a table
+        writer:'TableWriter' = TableWriter(self.table)
+        try:
+            batch:list[Paper] = []
+            for paper in papers:
+                batch.append(paper)
+                if len(batch) < self.TABLE_ROWS : continue
+                yield from self.table_batch(writer, batch)
+                batch = []
+            yield from self.table_batch(writer, batch)
+        finally:
+            writer.close()
+
+    def table_batch(
+        self,
+        writer:'TableWriter',
+        batch:list[Paper],
+    ) -> Iterator[Paper]:
+        from get_papers_list.table import PaperTable
+        if not batch : return
+        table:'PaperTable' = PaperTable.from_papers(batch)
+        writer.write(table)
+        ## one flag for every author, in the order of the papers and their authors
+        academic:list[bool] = table.academic(self.classifier).to_pylist()
+        start:int = 0
+        for paper in batch:
+            flags:list[bool] = academic[ start : start + len(paper.authors) ]
+            start += len(paper.authors)
+            yield paper.with_authors([ author for author, flag in zip(paper.authors, flags) if not flag ])
+
+    def preprocess(
+        self,
+        papers:Iterable[Paper],
+    ) -> Iterator[Row]:
+        """
+        this function convert the papers into the rows of the csv, one row for every author of the paper
+        """
+        if self.query is None:
+            return self.rows(papers)
+        query:str = self.query
+        return ( [ 'Query' if index == 0 else query , *row ] for index, row in enumerate(self.rows(papers)) )
+
+    def rows(
+        self,
+        papers:Iterable[Paper],
+    ) -> Iterator[Row]:
+        yield [ 'PubMedID' , 'DOP' , 'Title' , 'Author' , 'Affiliation' ]
+        for paper in papers:
+            authors:list[Author] = paper.authors
+            if len( authors ) == 0 :
+                yield [ paper.pubmedID , paper.DOP , paper.title , None , None ]
             else:
-                self.preprocessed.append( [ paper['pubmedID'] , paper['DOP'] , paper['title'] , paper['authors'][0]['name'] , paper['authors'][0]['aff'] ] )
-                for author in paper['authors'][1:] :
-                    self.preprocessed.append( [  None , None , None , author['name'] , author['aff'] ])
+                yield [ paper.pubmedID , paper.DOP , paper.title , authors[0].name , authors[0].aff ]
+                for author in authors[1:] :
+                    yield [  None , None , None , author.name , author.aff ]
 
     def writer(
         self,
+        rows:Iterable[Row],
         filepath:str
     ) -> None:
         """
-        this function, write all the rectified and filtered papers into the file
+        this function, write the rows into the file as they come
         ---
         INPUT:
+            - rows: It is the rows we write ( first one is the header )
             - filepath: it is file path in which all the papers i write
         """
-        if filepath == 'output.csv':
-            filename:str = 'output.csv'
-            BASE_PATH:str = os.getcwd()
-            count:int = 1
-            while( os.path.isfile(os.path.join( BASE_PATH , filename) )):
-                filename = f'output({count}).csv'
-                count += 1
-            filepath = os.path.join( BASE_PATH , filename )
-            info(f'All the papers is written in this file: {filepath}')
-
         try:
-            with open(filepath,'w',newline='') as file:
+            with self.open_output(filepath,newline='') as file:   ## .csv.gz and .csv.zst are compressed while written
+                if self.checkpoint is not None and self.checkpoint.appending:
+                    next( iter(rows), None )    ## resumed file has the header already
                 _writter = csv.writer(file, quotechar='"', quoting=csv.QUOTE_ALL) ## here we adding the quoting because data contains commas
-                for line in self.preprocessed:                                    ## and that make difficult to open the csv properly
+                for line in rows:                                                 ## and that make difficult to open the csv properly
                     _writter.writerow(line)
             info('Enverything is written to file')
-        except Exception as error_:
+        except OSError as error_:
             debug(f'{error_}')
-            critical(f'Unable to Write to File: {filepath}', code=ExitCodes.WRITING_ERROR)
+            raise WritingError(f'Unable to Write to File: {filepath}') from error_
+
+    def open_output(
+        self,
+        filepath:str,
+        encoding:Optional[str]=None,
+        newline:Optional[str]=None,
+    ) -> IO[str]:
+        """
+        this function open the output for writing, with a checkpoint it is opened by the checkpoint ( appended on resume )
+        """
+        if self.checkpoint is not None : return self.checkpoint.open(filepath, encoding=encoding, newline=newline)
+        return open_output(filepath, encoding=encoding, newline=newline)
+
+    def output_path(
+        self,
+        filepath:str,
+        format:str,
+    ) -> str:
+        """
+        this function give a new file in the current directory when the default filepath is used, so old results are not overwritten
+        """
+        if filepath != 'output.csv' : return filepath
+        extension:str = 'csv' if format == 'csv' else format
+        filename:str = f'output.{extension}'
+        BASE_PATH:str = os.getcwd()
+        count:int = 1
+        while( os.path.isfile(os.path.join( BASE_PATH , filename) )):
+            filename = f'output({count}).{extension}'
+            count += 1
+        filepath = os.path.join( BASE_PATH , filename )
+        info(f'All the papers is written in this file: {filepath}')
+        return filepath
 
     def runner(
         self,
-        medlineData:str,
+        medlineData:Iterable[str],
         filepath:str,
     ) -> None:
         """
-        this function is run all the functions
+        this function is run all the functions, every stage is a generator so only one record is in process at a time
+        the medlineData is chunks of medline data as they come from the efetch
+        """
+        medlineData = METRICS.timed( 'efetch', medlineData )
+        filter:bool = self.table == ''     ## with a table the papers are filtered after they are saved in it
+        if self.workers > 1:
+            papers:Iterator[Paper] = METRICS.timed( 'parse', self.parallel_convertor_and_filter(medlineData, filter) )
+        else:
+            papers = METRICS.timed( 'convertor_and_filter',
+                ( self.convertor_and_filter if filter else self.convertor )(
+                    METRICS.timed( 'rectifier',
+                        self.rectifier(
+                            METRICS.timed( 'lines', self.lines(medlineData) )
+                        )
+                    )
+                )
+            )
+        if not filter : papers = METRICS.timed( 'table', self.tabled(papers) )
+        self.output( METRICS.counted( 'records_parsed', papers ), filepath )
+
+    def records(
+        self,
+        chunks:Iterable[str],
+    ) -> Iterator[str]:
+        """
+        this function join the chunks of medline data into pieces of about CHUNK_BYTES that end on a record
+        boundary ( blank line ), so every piece can be parsed on its own
+        """
+        buffer:list[str] = []
+        size:int = 0
+        for chunk in chunks:
+            if '\r' in chunk:    ## windows line endings are removed here, else a blank line is never found
+                chunk = chunk.replace('\r', '')
+            buffer.append(chunk)
+            size += len(chunk)
+            if size < self.CHUNK_BYTES : continue
+            text:str = ''.join(buffer)
+            cut:int = text.rfind('\n\n')
+            if cut == -1:    ## a single record bigger than the piece, wait for its end
+                buffer, size = [ text ], len(text)
+                continue
+            yield text[ : cut + 1 ]
+            buffer, size = [ text[ cut + 1 : ] ], len(text) - cut - 1
+        if size:
+            yield ''.join(buffer)
+
+    def parallel_convertor_and_filter(
+        self,
+        chunks:Iterable[str],
+        filter:bool=True,
+    ) -> Iterator[Paper]:
         """
+        this function parse and filter the records in a process pool, the pieces are parsed by the workers
+        and the papers are yield in the same order as they come in the medline data, with filter false all authors are kept
+        """
+        parse:Callable[ [str], list[Paper]] = partial( parse_records, classifier=self.classifier, filter=filter )
+        for papers in concurrent_map( parse, self.records(chunks), self.workers, processes=True ):
+            yield from papers
+
+    def output(
+        self,
+        papers:Iterable[Paper],
+        filepath:str,
+    ) -> None:
+        """
+        this function write the already parsed and filtered papers into the file, the writer is selected
+        by the format or by the extension of the file
+        """
+        format:str = detect_format(filepath, self.format)
+        if format not in ( 'csv', 'jsonl' ) and detect_compression(filepath) != '':
+            raise PapersError(f'Only csv and jsonl files can be compressed, {format} is compressed inside already')
+        if self.checkpoint is not None:
+            if format not in ( 'csv', 'jsonl' ) or detect_compression(filepath) != '':
+                raise PapersError('Only a plain csv or jsonl output can be checkpointed, other files can not be appended')
+            papers = self.checkpoint.papers(papers)
+        ## a resumed search write into the output of its checkpoint
+        filepath = ( self.checkpoint.output if self.checkpoint is not None else '' ) or self.output_path(filepath, format)
+        papers = METRICS.counted( 'records_written', papers )
         try:
-            DATA:list[str] = self.rectifier(medlineData)
-            self.convertor_and_filter(DATA)
-            self.preprocess()
-            self.writer(filepath)
+            if format == 'csv':
+                with METRICS.stage('writer'):
+                    self.writer( METRICS.timed( 'preprocess', self.preprocess(papers) ), filepath )
+                return
+            with METRICS.stage('writer'):
+                if self.checkpoint is not None:
+                    with self.open_output(filepath, encoding='utf-8') as file:
+                        count:int = WRITERS[format](filepath, self.query, file=file).write(papers)
+                else:
+                    count = WRITERS[format](filepath, self.query).write(papers)
+            info(f'{count} papers are written to file')
+        except PapersError:
+            raise
+        except ImportError as error_:
+            raise PapersError(f'{error_}') from error_
+        except OSError as error_:
+            debug(f'{error_}')
+            raise WritingError(f'Unable to Write to File: {filepath}') from error_
         except Exception as error_:
             debug(f'{error_}')
-            critical('Somethings go wrong', code=ExitCodes.GENERAL_ERROR)
+            raise PapersError(f'Somethings go wrong: {error_}') from error_
+
+
+### this function is run in the parse workers, it has to be on module level so the process pool can pickle it
+def parse_records(
+    text:str,
+    classifier:AffiliationClassifier=DEFAULT_CLASSIFIER,
+    filter:bool=True,
+) -> list[Paper]:
+    """
+    this function parse and filter a piece of medline data that start and end on record boundary
+    """
+    processor:Processor = Processor( classifier=classifier )
+    if not filter : return list( processor.convertor( processor.rectifier( text.split('\n') ) ) )
+    return list( processor.convertor_and_filter( processor.rectifier( text.split('\n') ) ) )
+
+
+### these are for splitting a search by publication date
+def parse_date(
+    value:str,
+    end:bool=False,
+) -> date:
+    """
+    this function convert YYYY, YYYY/MM or YYYY/MM/DD into a date, with end it give the last day of the year or month
+    """
+    parts:list[int] = [ int(part) for part in value.replace('-', '/').split('/') ]
+    if len(parts) == 3 : return date(*parts)
+    if len(parts) == 2:
+        if not end : return date(parts[0], parts[1], 1)
+        return date( parts[0] + parts[1] // 12, parts[1] % 12 + 1, 1 ) - timedelta(days=1)
+    return date(parts[0], 12, 31) if end else date(parts[0], 1, 1)
+
+
+def harvest_ids(
+    apis:APIs,
+    terms:list[str],
+    sort:str,
+    reldate:int,
+    mindate:str,
+    maxdate:str,
+    path:str,
+    extra:str='',
+) -> PmidArray:
+    """
+    this function list all the pmids of a search of any size, esearch give at most 10000 pmids so the publication
+    date range is split in halves until every slice has at most 10000 papers, pmids of the slices are written into
+    a sorted and de-duplicated uint32 file
+    ---
+    OUTPUT:
+        - It return the PmidArray of the file
+    ---
+    INPUT:
+        - apis : It is the APIs used for the requests
+        - terms, sort, reldate, mindate, maxdate : same as the search
+        - path : It is the file where the pmids are written
+        - extra : It is added to the term with AND, like in esearch_ids
+    """
+    today:date = date.today()
+    first:date = parse_date(mindate) if mindate != '' else date(1781, 1, 1)    ## oldest papers of pubmed are from 1781
+    last:date = parse_date(maxdate, end=True) if maxdate != '' else today
+    if reldate != -1 : first = max( first, today - timedelta(days=reldate) )
+
+    def count(start:date, end:date) -> int:
+        return apis.esearch_ids(terms, sort, -1, start.strftime('%Y/%m/%d'), end.strftime('%Y/%m/%d'), extra=extra, limit=0)[0]
+
+    total:int = count(first, last)
+    if total == 0 : raise NoResultError('No Paper is Found')
+    info(f'Total Paper Founds: {total}')
+
+    writer:PmidWriter = PmidWriter(path)
+    listed:int = 0
+    slices:list[tuple[date, date, Optional[int]]] = [ ( first, last, total ) ]   ## count is None until it is asked
+    while slices:
+        start, end, found = slices.pop()
+        if found is None : found = count(start, end)
+        if found == 0 : continue
+        if found > apis.MAX_BATCH_SIZE and start < end:
+            middle:date = start + ( end - start ) / 2
+            slices.append(( middle + timedelta(days=1), end, None ))    ## later half is popped after the first half
+            slices.append(( start, middle, None ))
+            continue
+        ## a single day with more than 10000 papers can't be split more, only its first 10000 are listed
+        _, pmids = apis.esearch_ids(terms, sort, -1, start.strftime('%Y/%m/%d'), end.strftime('%Y/%m/%d'), extra=extra)
+        writer.extend(pmids)
+        listed += len(pmids)
+        info(f'Listed {listed} of {total} pmids')
+
+    pmid_array:PmidArray = writer.close()
+    info(f'{len(pmid_array)} unique pmids are written in this file: {path}')
+    return pmid_array
+
+
+### this function bring the store up to date with a search and return the pmids of the search
+def sync(
+    apis:APIs,
+    store:'RecordStore',
+    terms:list[str],
+    sort:str,
+    reldate:int,
+    mindate:str,
+    maxdate:str,
+    batch_size:int=500,
+) -> list[str]:
+    """
+    this function list the pmids of the search and download only the papers that are not in the store
+    or are modified ( mdat ) since the last sync of the same search, so a recurring search is a delta fetch
+    ---
+    OUTPUT:
+        - It return the pmids of the search, all of them are in the store after this
+    ---
+    INPUT:
+        - apis : It is the APIs used for the requests
+        - store : It is the store of the papers
+        - terms, sort, reldate, mindate, maxdate, batch_size : same as the search
+    """
+    key:str = ResponseCache.key('sync', apis.build_term(terms), sort, reldate, mindate, maxdate)
+    today:str = date.today().strftime('%Y/%m/%d')   ## taken before the search so nothing modified during the run is missed
+
+    def listed(extra:str='') -> list[str]:
+        ## every pmid of the search, esearch list at most 10000 so a bigger search is harvested by date like --harvest-ids
+        count:int = apis.esearch_ids(terms, sort, reldate, mindate, maxdate, extra=extra, limit=0)[0]
+        if count <= apis.MAX_BATCH_SIZE : return apis.esearch_ids(terms, sort, reldate, mindate, maxdate, extra=extra)[1]
+        fd, path = tempfile.mkstemp( dir=os.path.dirname( os.path.abspath(store.path) ), suffix='.pmids' )
+        os.close(fd)
+        try:
+            return list( harvest_ids(apis, terms, sort, reldate, mindate, maxdate, path, extra=extra) )
+        finally:
+            os.remove(path)
+
+    pmids:list[str] = listed()
+    info(f'Total Paper Founds: {len(pmids)}')
+
+    last:Optional[str] = store.last_sync(key)
+    modified:set[str] = set()
+    if last is not None:
+        ## papers of the search that are revised since the last sync
+        modified = set( listed( f'("{last}"[mdat] : "3000"[mdat])' ) )
+
+    stored:dict[ str, str] = store.revisions(pmids)
+    wanted:list[str] = [ pmid for pmid in pmids if pmid not in stored or pmid in modified ]
+    info(f'{len(stored)} papers are in the store, {len(modified)} are revised, downloading {len(wanted)} papers')
+
+    if wanted:
+        processor:Processor = Processor()
+        written:int = 0
+        ## every efetch batch is parsed and committed on its own, so the store is never locked while downloading and
+        ## a failed download keep the batches before it ( the next sync download only the rest )
+        for _, chunks in apis.efetch_ids_batches(wanted, batch_size):
+            ## a modified paper is only written when its revision date ( LR ) is really changed
+            fresh:list[Paper] = [
+                paper for paper in processor.convertor( processor.rectifier( processor.lines(chunks) ) )
+                if stored.get(paper.pubmedID) != paper.revised
+            ]
+            written += store.upsert(fresh)
+        info(f'{written} papers are written to the store')
+
+    store.set_sync(key, today)
+    return pmids
 
 
 ### the search function this function run the upper two classes to get the desired result
@@ -362,6 +1510,21 @@ def search(
     reldate:int=-1,
     mindate:str='',
     maxdate:str='',
+    batch_size:int=500,
+    workers:int=3,
+    base_url:str='',
+    retries:int=5,
+    cache:Optional[ResponseCache]=None,
+    store:Optional['RecordStore']=None,
+    apis:Optional[APIs]=None,
+    query_column:bool=False,
+    parse_workers:int=1,
+    format:str='',
+    classifier:AffiliationClassifier=DEFAULT_CLASSIFIER,
+    harvest:str='',
+    checkpoint:str='',
+    resume:bool=False,
+    table:str='',
 ) -> None:
     """
     this function is for run the APIs and Processor Class, it take the input then run the program and it return None
@@ -375,20 +1538,245 @@ def search(
         - reldate : For getting only i days old papers in Esearch
         - mindate : For getting only papers publish after a date. Format are: YYYY or YYYY/MM
         - maxdate : For getting only papers publich before a date. Format are: YYYY or YYYY/MM
+        - batch_size : It is number of papers downloaded in one request ( 1 to 10000 )
+        - workers : It is number of batches downloaded at same time ( all share the same rate limit )
+        - base_url : It is url of the eutils server, empty mean NCBI
+        - retries : It is number of times a failed request is retried before giving up
+        - cache : It is the on disk cache of the responses, None mean every request go to the server
+        - store : It is the store of the parsed papers, if given only new and revised papers are downloaded
+        - apis : It is an already made APIs to share its session and rate limit, if given api_key, email, workers, base_url, retries and cache are not used
+        - query_column : If true the query is written in the first column of every row
+        - parse_workers : It is number of processes that parse and filter the downloaded records
+        - format : It is the output format ( csv, jsonl, parquet, arrow ), empty mean it is taken from the extension of filepath
+        - classifier : It is the affiliation classifier that give the esearch pre filter and find the academic authors
+        - harvest : If given all the pmids are listed into this file ( split by date, no 10000 limit ) and the papers
+                    are downloaded by pmid in the order of pmid
+        - checkpoint : If given the progress is saved into this file after every written batch, it is removed when the search is finished
+                       ( only for a plain csv or jsonl output )
+        - resume : If true the search continue from the checkpoint file, the finished batches are not downloaded again
+        - table : If given every paper with all its authors, affiliations, emails, journal, DOI and MeSH headings is saved
+                  into this directory as parquet ( needs pyarrow ), filter_table filter it again without downloading
     """
     terms:list[ str] = query.split()
 
-    DATA:str = APIs(api_key=api_key,email=email).runner(
-        terms=terms,
-        sort=sort,
-        reldate=reldate,
-        mindate=mindate,
-        maxdate=maxdate,
-    ) or ""
+    if apis is None:
+        apis = APIs(api_key=api_key,email=email,workers=workers,base_url=base_url,retries=retries,cache=cache,classifier=classifier)
+
+    state:Optional[Checkpoint] = None
+    if checkpoint != '':
+        if store is not None : raise PapersError('A search with a store can not be checkpointed, the store already skip the downloaded papers')
+        if table != '' : raise PapersError('A search with a table can not be checkpointed, the table can not be appended')
+        state = Checkpoint(checkpoint, resume)
+        batch_size = state.begin( ResponseCache.key('checkpoint', query, sort, reldate, mindate, maxdate, harvest != '', query_column, format), batch_size )
+    elif resume:
+        raise PapersError('A search can be resumed only from a checkpoint file')
+
+    processor:Processor = Processor( query if query_column else None, workers=parse_workers, format=format, classifier=classifier, checkpoint=state, table=table )
+
+    if store is not None:
+        pmids:list[str] = sync(apis, store, terms, sort, reldate, mindate, maxdate, batch_size)
+        processor.output( processor.filtered( store.papers(pmids) ), filepath )
+        return
+
+    try:
+        if harvest != '':
+            if state is not None and state.get('pmids') is not None and os.path.isfile(state.get('pmids')):
+                pmids:PmidArray = PmidArray( state.get('pmids') )    ## listed before the search died, it is not listed again
+                info(f'{len(pmids)} pmids are taken from this file: {state.get("pmids")}')
+            else:
+                pmids = harvest_ids(apis, terms, sort, reldate, mindate, maxdate, harvest)
+                if state is not None : state.update( pmids=os.path.abspath(harvest) )
+            processor.runner(
+                medlineData=apis.efetch_ids( pmids, batch_size ) if state is None else state.track( apis.efetch_ids_batches(pmids, batch_size, start=state.done) ),
+                filepath=filepath
+            )
+        else:
+            DATA:Iterator[str] = apis.runner(
+                terms=terms,
+                sort=sort,
+                reldate=reldate,
+                mindate=mindate,
+                maxdate=maxdate,
+                batch_size=batch_size,
+                checkpoint=state,
+            )
+
+            processor.runner(
+                medlineData=DATA,
+                filepath=filepath
+            )
+    except NoResultError:
+        if state is not None : state.finish()    ## a search without papers has nothing to resume
+        raise
+
+    if state is not None : state.finish()
+
+
+### this function filter the table of a search again, nothing is downloaded
+def filter_table(
+    directory:str,
+    filepath:str='output.csv',
+    mindate:str='',
+    maxdate:str='',
+    companies:Sequence[str]=(),
+    format:str='',
+    classifier:AffiliationClassifier=DEFAULT_CLASSIFIER,
+) -> None:
+    """
+    this function write the papers of a table saved by a search ( search with table ) after filtering it again, the filters
+    run on the columns of the whole table, so one download can give many outputs
+    ---
+    INPUT:
+        - directory : It is the directory of the table
+        - filepath : It is the path of file where the papers are written
+        - mindate, maxdate : Only the papers published between them are kept. Format are: YYYY, YYYY/MM or YYYY/MM/DD
+        - companies : If given only the authors whose affiliation has one of these names are kept, and the papers without them are removed
+        - format : It is the output format ( csv, jsonl, parquet, arrow ), empty mean it is taken from the extension of filepath
+        - classifier : It is the affiliation classifier that find the academic authors, they are always removed
+    """
+    from get_papers_list.table import PaperTable
+    try:
+        start:Optional[date] = parse_date(mindate) if mindate != '' else None
+        end:Optional[date] = parse_date(maxdate, end=True) if maxdate != '' else None
+    except ValueError as error_:
+        raise PapersError(f'Bad date: {error_}') from error_
+    try:
+        table:'PaperTable' = PaperTable.load(directory)
+    except OSError as error_:
+        debug(f'{error_}')
+        raise PapersError(f'Unable to read the table: {directory}') from error_
+    info(f'{len(table)} papers are in this table: {directory}')
 
-    if DATA.__len__() == 0 : critical('Somethings goes Wrong', code=ExitCodes.GENERAL_ERROR)
+    with METRICS.stage('table_filter'):
+        table = table.published(start, end).non_academic(classifier)
+        if companies : table = table.companies(companies).with_authors()
+    if len(table) == 0 : raise NoResultError('No Paper is Found')
+    info(f'{len(table)} papers are left after the filters')
 
-    Processor().runner(
-        medlineData=DATA,
-        filepath=filepath
+    Processor( format=format, classifier=classifier ).output( table.to_papers(), filepath )
+
+
+## these are the options a query can have in the queries file
+QUERY_OPTIONS:frozenset[str] = frozenset({ 'query', 'filepath', 'sort', 'reldate', 'mindate', 'maxdate', 'batch_size', 'harvest' })
+
+def read_queries(
+    filepath:str,
+) -> list[dict[ str, Any]]:
+    """
+    this function read the queries file, a .jsonl file has one json object per line with the query and its own options
+    ( filepath, sort, reldate, mindate, maxdate, batch_size, harvest ) and any other file has one query per line
+    blank lines and lines starting with # are skipped
+    """
+    queries:list[dict[ str, Any]] = []
+    try:
+        with open(filepath) as file:
+            for number, line in enumerate(file, 1):
+                line = line.strip()
+                if line == '' or line.startswith('#') : continue
+                if not filepath.endswith('.jsonl'):
+                    queries.append({ 'query': line })
+                    continue
+                options:dict[ str, Any] = json.loads(line)
+                unknown:set[str] = set(options) - QUERY_OPTIONS
+                if 'query' not in options or unknown:
+                    raise PapersError(f'Bad query at line {number} of {filepath}: {"no query" if "query" not in options else "unknown options " + ", ".join(sorted(unknown))}')
+                queries.append(options)
+    except ( OSError, json.JSONDecodeError ) as error_:
+        debug(f'{error_}')
+        raise PapersError(f'Unable to read the queries file: {filepath}') from error_
+    return queries
+
+
+def search_many(
+    queries:list[dict[ str, Any]],
+    output_dir:str='',
+    combined:str='',
+    query_workers:int=2,
+    api_key:str='',
+    email:str='',
+    workers:int=3,
+    base_url:str='',
+    retries:int=5,
+    cache:Optional[ResponseCache]=None,
+    store:Optional['RecordStore']=None,
+    classifier:AffiliationClassifier=DEFAULT_CLASSIFIER,
+    **defaults:Any,
+) -> int:
+    """
+    this function run many searches in one process, all of them share one session and one rate limit
+    ---
+    OUTPUT:
+        - It return the number of queries that are failed
+    ---
+    INPUT:
+        - queries : It is the queries with their options ( see read_queries )
+        - output_dir : It is the directory of the per query files, a query without filepath is written to NNN-query.csv in it
+        - combined : If given all the queries are written in this one file with a Query column, in the order of queries ( csv or jsonl only )
+        - query_workers : It is number of queries run at the same time
+        - api_key, email, workers, base_url, retries, cache, store, classifier : same as the search
+        - defaults : It is the options ( sort, reldate, ... ) used for the queries that not have their own, a default
+                     harvest file is made per query as HARVEST.NNN, so the queries never write the same pmids file
+    """
+    query_workers = max( 1, query_workers)
+    harvests:list[str] = [ options['harvest'] for options in queries if options.get('harvest') ]
+    if len(harvests) != len(set(harvests)):
+        raise PapersError('Every query need its own harvest file, the queries run at the same time')
+    format:str = detect_format(combined, defaults.get('format', ''))
+    if combined != '' and format not in ( 'csv', 'jsonl' ):
+        raise PapersError(f'Combined output can only be csv or jsonl, not {format}')
+
+    apis:APIs = APIs(
+        api_key=api_key,
+        email=email,
+        workers=workers,
+        base_url=base_url,
+        retries=retries,
+        cache=cache,
+        pool_size=workers * query_workers,
+        classifier=classifier,
     )
+
+    def run(item:tuple[int, dict[ str, Any]]) -> Optional[str]:
+        index, options = item
+        if defaults.get('harvest') and not options.get('harvest'):
+            options = { **options, 'harvest': f'{defaults["harvest"]}.{index:03d}' }
+        options = { **defaults, **options }
+        if combined != '':
+            ## every query is written to its own part and parts are joined in order at the end
+            fd, options['filepath'] = tempfile.mkstemp( dir=os.path.dirname(os.path.abspath(combined)), suffix='.part')
+            os.close(fd)
+            options['format'] = format
+        elif 'filepath' not in options:
+            slug:str = re.sub( r'[^A-Za-z0-9]+', '_', options['query'] ).strip('_')[:50]
+            extension:str = detect_format('', options.get('format', ''))
+            options['filepath'] = os.path.join( output_dir or os.getcwd(), f'{index:03d}-{slug}.{extension}' )
+        try:
+            info(f'Running query {index}: {options["query"]}')
+            search( apis=apis, store=store, classifier=classifier, query_column=combined != '', **options )
+        except PapersError as error_:   ## a failed query not stop the others
+            error(f'Query {index} is failed with {type(error_).__name__} ( {error_} ): {options["query"]}')
+            if combined != '' : os.remove(options['filepath'])
+            return None
+        return options['filepath']
+
+    outputs:list[Optional[str]] = list( concurrent_map( run, enumerate(queries, 1), query_workers ) )
+
+    if combined != '':
+        try:
+            with open_output(combined, binary=True) as file:   ## the parts are plain, only the combined file is compressed
+                header:bool = True
+                for part in outputs:
+                    if part is None : continue
+                    with open(part, 'rb') as source:
+                        if format == 'csv':    ## every part has the csv header
+                            first:bytes = source.readline()
+                            if header : file.write(first)
+                            header = False
+                        shutil.copyfileobj(source, file)
+                    os.remove(part)
+            info(f'All the queries are written in this file: {combined}')
+        except OSError as error_:
+            debug(f'{error_}')
+            raise WritingError(f'Unable to Write to File: {combined}') from error_
+
+    return sum( 1 for output in outputs if output is None )
@@ -0,0 +1,268 @@
+from typing import Iterable, Optional, Any, IO
+from contextlib import nullcontext
+from abc import ABC, abstractmethod
+import json
+import gzip
+import io
+import os
+import logging
+
+from get_papers_list.models import Paper
+
+## setup logging
+logger:logging.Logger = logging.getLogger(name='writers')
+
+## these are the output formats and the file extensions that select them
+FORMATS:tuple[str, ...] = ( 'csv', 'jsonl', 'parquet', 'arrow' )
+EXTENSIONS:dict[ str, str] = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.arrows': 'arrow',
+}
+## a second extension compress the csv and jsonl files while they are written ( like output.csv.gz )
+COMPRESSIONS:dict[ str, str] = {
+    '.gz': 'gzip',
+    '.zst': 'zstd',
+}
+GZIP_LEVEL:int = 6     ## same as the gzip command
+ZSTD_LEVEL:int = 3     ## default of zstd, it is faster and smaller than gzip 6
+
+
+def detect_compression(
+    filepath:str,
+) -> str:
+    """
+    this function return the compression of the file from its last extension ( gzip, zstd ), empty mean not compressed
+    """
+    return COMPRESSIONS.get( os.path.splitext(filepath)[1].lower(), '' )
+
+
+def detect_format(
+    filepath:str,
+    format:str='',
+) -> str:
+    """
+    this function return the output format, the given format win over the extension of the file and csv is the default
+    the compression extension is not the format, output.jsonl.gz is jsonl
+    """
+    if format != '' : return format
+    if detect_compression(filepath) != '':
+        filepath = os.path.splitext(filepath)[0]
+    return EXTENSIONS.get( os.path.splitext(filepath)[1].lower(), 'csv' )
+
+
+def open_output(
+    filepath:str,
+    binary:bool=False,
+    encoding:Optional[str]=None,
+    newline:Optional[str]=None,
+) -> IO[Any]:
+    """
+    this function open the file for writing, if its extension is .gz or .zst the data is compressed as it is written
+    so the compressed file is made in one pass without the plain file on disk
+    ---
+    INPUT:
+        - filepath : It is the path of the file, its extension select the compression
+        - binary : If true the file is opened for bytes, otherwise for text
+        - encoding, newline : same as open, only for text
+    """
+    compression:str = detect_compression(filepath)
+    if compression == 'gzip':
+        if binary : return gzip.open(filepath, 'wb', compresslevel=GZIP_LEVEL)
+        return gzip.open(filepath, 'wt', compresslevel=GZIP_LEVEL, encoding=encoding, newline=newline)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('zstandard is needed for .zst output, install it with: pip install get-papers-list[zstd]') from None
+        stream:IO[bytes] = zstandard.ZstdCompressor( level=ZSTD_LEVEL ).stream_writer( open(filepath, 'wb') )
+        if binary : return stream
+        return io.TextIOWrapper(stream, encoding=encoding, newline=newline)
+    if binary : return open(filepath, 'wb')
+    return open(filepath, 'w', encoding=encoding, newline=newline)
+
+
+## this is the base of the writers that write the parsed papers, every writer stream the papers into the file
+## the csv writer is Processor.writer in utils because it write the flat rows and not the papers
+## it is abstract, so a writer without write fail when it is made and not in the middle of a file
+class PaperWriter(ABC):
+
+    def __init__(
+        self,
+        filepath:str,
+        query:Optional[str]=None,    ## if given it is written with every paper
+        file:Optional[IO[str]]=None, ## an already opened file, it is written in place of filepath and not closed
+    ) -> None:
+        self.filepath:str = filepath
+        self.query:Optional[str] = query
+        self.file:Optional[IO[str]] = file
+
+    def record(
+        self,
+        paper:Paper,
+    ) -> dict[ str, Any]:
+        """
+        this function convert the paper into the normalized record that is written, authors are nested in it
+        """
+        record:dict[ str, Any] = {} if self.query is None else { 'query': self.query }
+        record.update({
+            'pubmed_id': paper.pubmedID,
+            'date_of_publication': paper.DOP,
+            'title': paper.title,
+            'journal': paper.journal,
+            'doi': paper.doi,
+            'authors': [ { 'name': author.name, 'affiliation': author.aff or None } for author in paper.authors ],
+        })
+        return record
+
+    @abstractmethod
+    def write(
+        self,
+        papers:Iterable[Paper],
+    ) -> int:
+        """
+        this function write all the papers and return the number of papers written
+        """
+
+
+## one json object per line, it is written as the papers come so it can be read while it is written
+class JSONLWriter(PaperWriter):
+
+    def write(
+        self,
+        papers:Iterable[Paper],
+    ) -> int:
+        count:int = 0
+        with nullcontext(self.file) if self.file is not None else open_output(self.filepath, encoding='utf-8') as file:
+            for paper in papers:
+                file.write( json.dumps( self.record(paper), ensure_ascii=False ) )
+                file.write('\n')
+                count += 1
+        return count
+
+
+## parquet and arrow are columnar so the papers are collected into batches and every batch is written as one
+## record batch, affiliation and journal are dictionary encoded because same strings are repeated many times
+## the authors of a batch are kept in two flat columns ( name, affiliation ) with the offsets of the papers, so
+## no dict is made for a paper or an author
+class ArrowWriter(PaperWriter):
+
+    BATCH_SIZE:int = 10000    ## papers in one record batch
+
+    def __init__(
+        self,
+        filepath:str,
+        query:Optional[str]=None,
+        batch_size:int=BATCH_SIZE,
+    ) -> None:
+        super().__init__(filepath, query)
+        self.batch_size:int = batch_size
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError('pyarrow is needed for parquet and arrow output, install it with: pip install get-papers-list[arrow]') from None
+        self.pa:Any = pyarrow
+
+    def schema(self) -> Any:
+        pa:Any = self.pa
+        text:Any = pa.dictionary( pa.int32(), pa.string() )
+        fields:list[Any] = [ pa.field('query', text) ] if self.query is not None else []
+        return pa.schema( fields + [
+            pa.field( 'pubmed_id', pa.string() ),
+            pa.field( 'date_of_publication', text ),
+            pa.field( 'title', pa.string() ),
+            pa.field( 'journal', text ),
+            pa.field( 'doi', pa.string() ),
+            pa.field( 'authors', pa.list_( pa.struct([
+                pa.field( 'name', pa.string() ),
+                pa.field( 'affiliation', text ),
+            ]))),
+        ])
+
+    @abstractmethod
+    def open(self, schema:Any) -> Any:
+        """
+        this function return the writer of the file, it need write_table and close
+        """
+
+    def table(
+        self,
+        schema:Any,
+        papers:list[Paper],
+    ) -> Any:
+        """
+        this function make the table of a batch of papers
+        """
+        pa:Any = self.pa
+        text:Any = pa.dictionary( pa.int32(), pa.string() )
+        offsets:list[int] = [ 0 ]
+        names:list[str] = []
+        affiliations:list[Optional[str]] = []
+        for paper in papers:
+            for author in paper.authors:
+                names.append(author.name)
+                affiliations.append(author.aff or None)
+            offsets.append(len(names))
+        author_type:Any = schema.field('authors').type.value_type
+        columns:list[Any] = [] if self.query is None else [ pa.array( [ self.query ] * len(papers), text ) ]
+        columns += [
+            pa.array( [ paper.pubmedID for paper in papers ], pa.string() ),
+            pa.array( [ paper.DOP for paper in papers ], text ),
+            pa.array( [ paper.title for paper in papers ], pa.string() ),
+            pa.array( [ paper.journal for paper in papers ], text ),
+            pa.array( [ paper.doi for paper in papers ], pa.string() ),
+            pa.ListArray.from_arrays(
+                pa.array( offsets, pa.int32() ),
+                pa.StructArray.from_arrays(
+                    [ pa.array( names, pa.string() ), pa.array( affiliations, text ) ],
+                    fields=list(author_type),
+                ),
+            ),
+        ]
+        return pa.Table.from_arrays( columns, schema=schema )
+
+    def write(
+        self,
+        papers:Iterable[Paper],
+    ) -> int:
+        schema:Any = self.schema()
+        writer:Any = self.open(schema)
+        count:int = 0
+        try:
+            batch:list[Paper] = []
+            for paper in papers:
+                batch.append(paper)
+                count += 1
+                if len(batch) == self.batch_size:
+                    writer.write_table( self.table(schema, batch) )
+                    batch = []
+            if batch or count == 0:
+                writer.write_table( self.table(schema, batch) )
+        finally:
+            writer.close()
+        return count
+
+
+class ParquetWriter(ArrowWriter):
+
+    def open(self, schema:Any) -> Any:
+        import pyarrow.parquet
+        return pyarrow.parquet.ParquetWriter( self.filepath, schema, compression='zstd' )
+
+
+## arrow ipc stream format, stream and not file format because the dictionaries change between the batches
+class ArrowStreamWriter(ArrowWriter):
+
+    def open(self, schema:Any) -> Any:
+        import pyarrow.ipc
+        return pyarrow.ipc.new_stream( self.filepath, schema )
+
+
+WRITERS:dict[ str, type[PaperWriter]] = {
+    'jsonl': JSONLWriter,
+    'parquet': ParquetWriter,
+    'arrow': ArrowStreamWriter,
+}
@@ -0,0 +1,43 @@
+"""
+fixtures of the tests, the searches run against the fake eutils server of the benchmarks ( benchmarks/fake_eutils.py )
+started in a thread of the test process, so no test need the network
+"""
+from typing import Callable, Iterator, Any
+
+import pytest
+
+from get_papers_list.utils import APIs, RateLimiter
+from fake_eutils import FakeEutils, SyntheticFixture
+
+
+@pytest.fixture
+def eutils() -> Iterator[Callable[ ..., FakeEutils]]:
+    """
+    this fixture give a function that start a fake eutils server of some synthetic records, the options are the ones
+    of FakeEutils ( compress, cut, expire ... ), every server is stopped at the end of the test
+    """
+    servers:list[FakeEutils] = []
+
+    def start(records:int, **options:Any) -> FakeEutils:
+        server:FakeEutils = FakeEutils( SyntheticFixture(records), **options ).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def client() -> Callable[ ..., APIs]:
+    """
+    this fixture give a function that return the APIs of a server without the NCBI rate limit, so the tests are not
+    slowed by it, the options are the ones of APIs ( workers, retries ... )
+    """
+    def make(server:FakeEutils, **options:Any) -> APIs:
+        apis:APIs = APIs( base_url=server.url, backoff=0.01, **options )
+        apis.rate_limiter = RateLimiter( 1e9, capacity=1e9 )
+        return apis
+
+    return make
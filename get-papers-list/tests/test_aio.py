@@ -0,0 +1,71 @@
+from typing import Callable, Any
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from get_papers_list.aio import AsyncAPIs, AsyncRateLimiter, search_papers
+from get_papers_list.models import Paper
+from get_papers_list.utils import parse_records
+from fake_eutils import FakeEutils
+
+
+@pytest.fixture
+def async_client() -> Callable[ ..., AsyncAPIs]:
+    """
+    this fixture is the client fixture for the async api, the APIs has no NCBI rate limit
+    """
+    def make(server:FakeEutils, **options:Any) -> AsyncAPIs:
+        apis:AsyncAPIs = AsyncAPIs( base_url=server.url, backoff=0.01, **options )
+        apis.async_rate_limiter = AsyncRateLimiter( 1e9, capacity=1e9 )
+        return apis
+
+    return make
+
+
+def collect(apis:AsyncAPIs, query:str='cancer', **options:Any) -> list[Paper]:
+    async def run() -> list[Paper]:
+        async with apis:
+            return [ paper async for paper in search_papers( query, apis=apis, **options ) ]
+
+    return asyncio.run( run() )
+
+
+@pytest.mark.parametrize('workers', [ 1, 3 ])
+def test_papers_are_given_in_order(eutils:Callable[ ..., FakeEutils], async_client:Callable[ ..., AsyncAPIs], workers:int) -> None:
+    server:FakeEutils = eutils(1200)
+    papers:list[Paper] = collect( async_client(server, workers=workers), batch_size=100, filter=False )
+    expected:list[Paper] = parse_records( ''.join( server.fixture.record(index) for index in range(1200) ), filter=False )
+    assert papers == expected
+
+
+def test_academic_authors_are_removed(eutils:Callable[ ..., FakeEutils], async_client:Callable[ ..., AsyncAPIs]) -> None:
+    server:FakeEutils = eutils(50)
+    papers:list[Paper] = collect( async_client(server) )
+    assert papers == parse_records( ''.join( server.fixture.record(index) for index in range(50) ) )
+
+
+def test_throttled_requests_are_retried(eutils:Callable[ ..., FakeEutils], async_client:Callable[ ..., AsyncAPIs]) -> None:
+    server:FakeEutils = eutils( 500, throttle=0.3 )
+    papers:list[Paper] = collect( async_client(server, retries=20), batch_size=50 )
+    assert len(papers) == 500
+    assert server.throttled > 0
+
+
+def test_queries_share_one_session(eutils:Callable[ ..., FakeEutils], async_client:Callable[ ..., AsyncAPIs]) -> None:
+    server:FakeEutils = eutils(300)
+    apis:AsyncAPIs = async_client(server)
+    assert not hasattr(apis, 'session')    ## the requests session of APIs is not made
+
+    async def run() -> list[list[Paper]]:
+        async with apis:
+            async def one(query:str) -> list[Paper]:
+                return [ paper async for paper in search_papers( query, apis=apis, batch_size=50 ) ]
+            results:list[list[Paper]] = await asyncio.gather( one('cancer'), one('diabetes'), one('asthma') )
+            assert apis.aio_session is not None and not apis.aio_session.closed    ## not closed by the queries
+            return results
+
+    results:list[list[Paper]] = asyncio.run( run() )
+    assert [ len(papers) for papers in results ] == [ 300 ] * 3
+    assert apis.aio_session is None
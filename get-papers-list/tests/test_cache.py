@@ -0,0 +1,66 @@
+import os
+import time
+
+from get_papers_list.cache import ResponseCache, MemoryCache
+
+
+def test_stale_value_is_removed(tmp_path) -> None:
+    cache:ResponseCache = ResponseCache( str(tmp_path), ttl=60 )
+    cache.put('fresh', 'a')
+    cache.put('stale', 'b')
+    old:float = time.time() - 120
+    os.utime( cache.path('stale'), ( old, old ) )
+    assert cache.get('fresh') == 'a'
+    assert not cache.has('stale')
+    assert cache.get('stale') is None
+    assert not os.path.exists( cache.path('stale') )
+
+
+def test_least_recently_used_is_evicted(tmp_path) -> None:
+    cache:ResponseCache = ResponseCache( str(tmp_path) )
+    values:dict[ str, str] = { key: os.urandom(1000).hex() for key in ( 'first', 'second', 'third' ) }   ## random, so zlib can't shrink them
+    now:float = time.time()
+    for age, ( key, value ) in zip( ( 30, 20, 10 ), values.items() ):
+        cache.put(key, value)
+        os.utime( cache.path(key), ( now - age, now ) )    ## atime is the last read
+    cache.get('first')     ## first is now the most recently used
+    size:int = os.path.getsize( cache.path('first') )
+    cache.max_bytes = 2 * size + size // 2
+    cache.evict()
+    assert [ cache.has(key) for key in values ] == [ True, False, True ]
+
+
+def test_memory_cache_evict_least_recently_used() -> None:
+    cache:MemoryCache = MemoryCache( max_bytes=10 ** 9 )
+    for key in ( 'first', 'second', 'third' ):
+        cache.put( key, os.urandom(1000).hex() )
+    cache.get('first')
+    cache.max_bytes = cache.size - 1     ## one value has to go, the least recently used
+    cache.evict()
+    assert [ cache.has(key) for key in ( 'first', 'second', 'third' ) ] == [ True, False, True ]
+    assert cache.stats()['entries'] == 2
+
+
+def test_memory_cache_fall_back_to_disk(tmp_path) -> None:
+    disk:ResponseCache = ResponseCache( str(tmp_path) )
+    disk.put('key', 'value')
+    cache:MemoryCache = MemoryCache( disk=disk )
+    assert cache.get('key') == 'value'
+    assert cache.stats()['entries'] == 1    ## it is kept in memory for the next get
+
+
+def test_put_keep_the_size_without_scanning(tmp_path, monkeypatch) -> None:
+    cache:ResponseCache = ResponseCache( str(tmp_path), max_bytes=10 ** 9 )
+    cache.put( 'first', 'a' * 1000 )     ## the first put count the directory
+    scans:list[str] = []
+    scandir = os.scandir
+    monkeypatch.setattr( os, 'scandir', lambda path: scans.append(path) or scandir(path) )
+    for number in range(20):
+        cache.put( f'key {number}', os.urandom(100).hex() )
+    cache.put( 'first', 'b' )            ## replaced, its old size is taken out
+    assert scans == []
+    assert cache.size == sum( os.path.getsize( cache.path(key) ) for key in [ 'first', *( f'key {number}' for number in range(20) ) ] )
+    cache.max_bytes = cache.size // 2
+    cache.put( 'last', 'c' )             ## over max_bytes, now it is evicted
+    assert len(scans) == 1
+    assert cache.size <= cache.max_bytes
@@ -0,0 +1,26 @@
+import pytest
+
+from get_papers_list.classifier import AffiliationClassifier, DEFAULT_CLASSIFIER, ACADEMIC, COMPANY
+from bench_classifier import read_fixture
+
+
+def test_labelled_affiliations() -> None:
+    labelled:list[tuple[str, str]] = read_fixture()
+    wrong:list[tuple[str, str, str]] = [
+        ( label, DEFAULT_CLASSIFIER.classify(affiliation), affiliation )
+        for label, affiliation in labelled
+        if DEFAULT_CLASSIFIER.classify(affiliation) != label
+    ]
+    assert wrong == []
+
+
+@pytest.mark.parametrize('affiliation, label', [
+    ( 'Department of Medicine, Harvard University, Boston, MA, U.S.A.', ACADEMIC ),
+    ( 'AG Müller, Institut für Biochemie, Universität Hamburg, Hamburg, Germany.', ACADEMIC ),
+    ( 'Bayer AG, Berlin, Germany.', COMPANY ),
+    ( 'Novartis Pharma AG', COMPANY ),
+    ( 'Grupo Ferrer Internacional S.A., Barcelona, Spain.', COMPANY ),
+    ( 'Sanofi S.A.S., Paris, France.', COMPANY ),
+])
+def test_company_abbreviations(affiliation:str, label:str) -> None:
+    assert AffiliationClassifier().classify(affiliation) == label
@@ -0,0 +1,39 @@
+import http.client
+import json
+import urllib.error
+import urllib.request
+from typing import Callable
+
+import pytest
+
+from fake_eutils import FakeEutils
+
+
+def fetch(url:str) -> bytes:
+    with urllib.request.urlopen(url) as response:
+        return response.read()
+
+
+def test_esearch_and_efetch(eutils:Callable[ ..., FakeEutils]) -> None:
+    server:FakeEutils = eutils(120)
+    result:dict = json.loads( fetch( server.url + '/esearch.fcgi?term=x&retmax=5' ) )['esearchresult']
+    assert result['count'] == '120'
+    assert len(result['idlist']) == 5
+    text:str = fetch( server.url + f'/efetch.fcgi?query_key={result["querykey"]}&retstart=100&retmax=50' ).decode()
+    assert text.count('PMID- ') == 20      ## only the records after retstart
+
+
+def test_cut_body(eutils:Callable[ ..., FakeEutils]) -> None:
+    server:FakeEutils = eutils( 120, cut=frozenset({ 1 }) )
+    query_key:str = json.loads( fetch( server.url + '/esearch.fcgi?term=x' ) )['esearchresult']['querykey']
+    with pytest.raises(http.client.IncompleteRead):
+        fetch( server.url + f'/efetch.fcgi?query_key={query_key}&retmax=120' )
+    assert fetch( server.url + f'/efetch.fcgi?query_key={query_key}&retmax=120' ).decode().count('PMID- ') == 120
+
+
+def test_expired_session(eutils:Callable[ ..., FakeEutils]) -> None:
+    server:FakeEutils = eutils( 10, expire=1e-9 )
+    query_key:str = json.loads( fetch( server.url + '/esearch.fcgi?term=x' ) )['esearchresult']['querykey']
+    with pytest.raises(urllib.error.HTTPError) as raised:
+        fetch( server.url + f'/efetch.fcgi?query_key={query_key}' )
+    assert raised.value.code == 400
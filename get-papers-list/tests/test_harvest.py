@@ -0,0 +1,52 @@
+import random
+from typing import Callable, Any
+
+import pytest
+
+from get_papers_list import ids
+from get_papers_list.ids import PmidWriter, PmidArray
+from get_papers_list.utils import APIs, harvest_ids, search, search_many
+from get_papers_list.errors import PapersError
+from fake_eutils import FakeEutils, SyntheticFixture
+
+
+def test_pmids_are_merged_sorted_and_unique(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(ids, 'RUN_SIZE', 100)     ## many runs, so the external merge is used
+    pmids:list[int] = [ random.randrange(1, 2000) for _ in range(5000) ]
+    writer:PmidWriter = PmidWriter( str( tmp_path / 'pmids' ) )
+    writer.extend( str(pmid) for pmid in pmids )
+    writer.extend( pmids[ : 500 ] )    ## listed again, like the papers of two overlapping slices
+    array:PmidArray = writer.close()
+    assert list(array) == [ str(pmid) for pmid in sorted( set(pmids) ) ]
+    assert array[ 1 : 3 ] == list(array)[ 1 : 3 ]
+    assert [ path.name for path in tmp_path.iterdir() ] == [ 'pmids' ]    ## the runs are removed
+
+
+def test_harvest_list_every_pmid_once(tmp_path, eutils:Callable[ ..., FakeEutils], client:Callable[ ..., APIs]) -> None:
+    ## more than the 10000 of one esearch, so the date range is split
+    server:FakeEutils = eutils(25000)
+    array:PmidArray = harvest_ids( client(server), [ 'cancer' ], 'relevance', -1, '', '', str( tmp_path / 'pmids' ) )
+    fixture:SyntheticFixture = server.fixture
+    assert list(array) == sorted( fixture.pmid(index) for index in range(25000) )
+
+
+def test_queries_harvest_their_own_file(tmp_path, eutils:Callable[ ..., FakeEutils], monkeypatch) -> None:
+    monkeypatch.setattr(APIs, 'RATE', 1e9)     ## search_many make its own APIs, it is not slowed by the NCBI rate limit
+    server:FakeEutils = eutils(30000)
+    expected:str = str( tmp_path / 'expected.csv' )
+    search( 'cancer', filepath=expected, harvest=str( tmp_path / 'alone' ), apis=APIs(base_url=server.url) )
+    queries:list[dict[ str, Any]] = [ { 'query': 'cancer', 'filepath': str( tmp_path / f'{number}.csv' ) } for number in ( 1, 2 ) ]
+    failed:int = search_many( queries, query_workers=2, base_url=server.url, harvest=str( tmp_path / 'ids' ) )
+    assert failed == 0
+    with open(expected) as file:
+        text:str = file.read()
+    for number in ( 1, 2 ):
+        with open( tmp_path / f'{number}.csv' ) as file:
+            assert file.read() == text
+    assert len( PmidArray( str( tmp_path / 'ids.001' ) ) ) == 30000
+
+
+def test_queries_can_not_share_a_harvest_file(tmp_path) -> None:
+    queries:list[dict[ str, Any]] = [ { 'query': query, 'harvest': str( tmp_path / 'ids' ) } for query in ( 'cancer', 'diabetes' ) ]
+    with pytest.raises(PapersError):
+        search_many(queries)
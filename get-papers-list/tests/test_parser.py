@@ -0,0 +1,49 @@
+from get_papers_list.models import Paper
+from get_papers_list.utils import Processor, parse_records
+from bench_parser import synthetic_record
+
+
+def test_synthetic_records() -> None:
+    papers:list[Paper] = parse_records( synthetic_record(1) + synthetic_record(2), filter=False )
+    assert [ paper.pubmedID for paper in papers ] == [ '10000001', '10000002' ]
+    paper:Paper = papers[0]
+    assert paper.DOP == '2023 Jan'
+    assert paper.title == 'A synthetic study number 1 of the effect of something on the other thing in a large cohort of patients'
+    assert paper.journal == 'Journal of Synthetic Results'
+    assert paper.doi == '10.1000/synthetic.1'
+    assert paper.revised == '20240101'
+    assert paper.abstract.endswith('so the rectifier has to join it.')
+    assert [ ( author.name, author.short ) for author in paper.authors ] == [ ( 'Doe, John', 'Doe J' ), ( 'Roe, Jane', 'Roe J' ), ( 'Smith, Alan', 'Smith A' ) ]
+    assert paper.authors[1].aff == 'Department of Medicine, Harvard University, Boston, MA, USA.'
+    assert paper.authors[1].affs == ( 'Department of Medicine, Harvard University, Boston, MA, USA.', 'Massachusetts General Hospital, Boston, MA, USA.' )
+
+
+def test_academic_authors_are_removed() -> None:
+    paper:Paper = parse_records( synthetic_record(1) )[0]
+    assert [ author.name for author in paper.authors ] == [ 'Doe, John', 'Smith, Alan' ]
+
+
+def test_other_tags_are_skipped() -> None:
+    text:str = (
+        'PMID- 1\n'
+        'AID - S0140-6736(23)00001-1 [pii]\n'
+        'AID - 10.1016/S0140-6736(23)00001-1 [doi]\n'
+        'LID - 10.1000/other [doi]\n'
+        'TIX - not a title\n'      ## same start as TI but another tag
+        'TI  - Title\n'
+        'AU  - Old A\n'           ## old records have only AU
+        'AD  - Acme Inc, Springfield.\n'
+        '\n'
+    )
+    paper:Paper = parse_records(text, filter=False)[0]
+    assert paper.title == 'Title'
+    assert paper.doi == '10.1016/S0140-6736(23)00001-1'    ## the first doi is kept
+    assert [ ( author.name, author.short, author.aff ) for author in paper.authors ] == [ ( 'Old A', 'Old A', 'Acme Inc, Springfield.' ) ]
+
+
+def test_chunks_split_in_lines() -> None:
+    processor:Processor = Processor()
+    text:str = synthetic_record(1) + synthetic_record(2)
+    chunks:list[str] = [ text[ start : start + 7 ] for start in range( 0, len(text), 7 ) ]
+    papers:list[Paper] = list( processor.convertor( processor.rectifier( processor.lines(chunks) ) ) )
+    assert papers == parse_records(text, filter=False)
@@ -0,0 +1,54 @@
+import os
+from typing import Callable
+
+import pytest
+
+from get_papers_list.utils import APIs, search
+from get_papers_list.checkpoint import Checkpoint
+from get_papers_list.errors import RequestFailedError, NoResultError, PapersError
+from fake_eutils import FakeEutils
+
+RECORDS:int = 3000
+BATCH:int = 500
+
+
+@pytest.mark.parametrize('workers', [ 1, 3 ])
+@pytest.mark.parametrize('compress', [ False, True ])
+def test_resume_after_failure(tmp_path, eutils:Callable[ ..., FakeEutils], client:Callable[ ..., APIs], workers:int, compress:bool) -> None:
+    expected:str = str( tmp_path / 'expected.csv' )
+    search( 'cancer', filepath=expected, apis=client( eutils(RECORDS, compress=compress) ), batch_size=BATCH )
+
+    ## the 4th efetch is cut and there is no retry, so the search die after some written batches
+    server:FakeEutils = eutils( RECORDS, compress=compress, cut=frozenset({ 4 }) )
+    output:str = str( tmp_path / 'output.csv' )
+    checkpoint:str = output + '.checkpoint'
+    with pytest.raises(RequestFailedError):
+        search( 'cancer', filepath=output, apis=client( server, workers=workers, retries=0 ), batch_size=BATCH, checkpoint=checkpoint )
+    assert Checkpoint.resumable(checkpoint)
+    with open(output) as file, open(expected) as whole:
+        assert 1 < len( file.readlines() ) < len( whole.readlines() )
+
+    search( 'cancer', filepath=output, apis=client( server, workers=workers, retries=0 ), batch_size=BATCH, checkpoint=checkpoint, resume=True )
+    with open(output) as file, open(expected) as whole:
+        text:str = file.read()
+        assert text == whole.read()      ## no row is written twice or missed
+    assert text.count('PubMedID') == 1
+    assert not os.path.exists(checkpoint)
+
+
+def test_no_result_leave_no_checkpoint(tmp_path, eutils:Callable[ ..., FakeEutils], client:Callable[ ..., APIs]) -> None:
+    output:str = str( tmp_path / 'output.csv' )
+    with pytest.raises(NoResultError):
+        search( 'cancer', filepath=output, mindate='2100', apis=client( eutils(RECORDS) ), checkpoint=output + '.checkpoint' )
+    assert os.listdir(tmp_path) == []
+
+
+def test_unfinished_checkpoint_is_not_overwritten(tmp_path, eutils:Callable[ ..., FakeEutils], client:Callable[ ..., APIs]) -> None:
+    server:FakeEutils = eutils( RECORDS, cut=frozenset({ 3 }) )
+    output:str = str( tmp_path / 'output.csv' )
+    checkpoint:str = output + '.checkpoint'
+    with pytest.raises(RequestFailedError):
+        search( 'cancer', filepath=output, apis=client( server, workers=1, retries=0 ), batch_size=BATCH, checkpoint=checkpoint )
+    with pytest.raises(PapersError, match='unfinished'):
+        search( 'cancer', filepath=output, apis=client(server), batch_size=BATCH, checkpoint=checkpoint )
+    assert Checkpoint.resumable(checkpoint)
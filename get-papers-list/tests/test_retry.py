@@ -0,0 +1,45 @@
+from typing import Callable
+
+import pytest
+
+from get_papers_list.utils import APIs, search
+from get_papers_list.metrics import METRICS
+from get_papers_list.errors import RequestFailedError
+from fake_eutils import FakeEutils
+
+RECORDS:int = 3000
+BATCH:int = 500
+
+
+@pytest.fixture
+def expected(tmp_path, eutils:Callable[ ..., FakeEutils], client:Callable[ ..., APIs]) -> str:
+    path:str = str( tmp_path / 'expected.csv' )
+    search( 'cancer', filepath=path, apis=client( eutils(RECORDS) ), batch_size=BATCH )
+    with open(path) as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('workers', [ 1, 3 ])
+@pytest.mark.parametrize('compress', [ False, True ])
+def test_broken_body_is_retried(tmp_path, eutils:Callable[ ..., FakeEutils], client:Callable[ ..., APIs], expected:str, workers:int, compress:bool) -> None:
+    output:str = str( tmp_path / 'output.csv' )
+    METRICS.enable()
+    try:
+        search( 'cancer', filepath=output, apis=client( eutils( RECORDS, compress=compress, cut=frozenset({ 1, 2, 5 }) ), workers=workers ), batch_size=BATCH )
+        assert METRICS.report()['counters']['http_retries'] == 3
+    finally:
+        METRICS.disable()
+    with open(output) as file:
+        assert file.read() == expected     ## the part read before the cut is not written twice
+
+
+def test_throttled_requests_are_retried(tmp_path, eutils:Callable[ ..., FakeEutils], client:Callable[ ..., APIs], expected:str) -> None:
+    output:str = str( tmp_path / 'output.csv' )
+    search( 'cancer', filepath=output, apis=client( eutils( RECORDS, throttle=0.3 ), retries=20 ), batch_size=BATCH )
+    with open(output) as file:
+        assert file.read() == expected
+
+
+def test_no_retry_left(tmp_path, eutils:Callable[ ..., FakeEutils], client:Callable[ ..., APIs]) -> None:
+    with pytest.raises(RequestFailedError):
+        search( 'cancer', filepath=str( tmp_path / 'output.csv' ), apis=client( eutils( RECORDS, cut=frozenset({ 1 }) ), retries=0 ), batch_size=BATCH )
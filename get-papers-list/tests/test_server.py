@@ -0,0 +1,90 @@
+from typing import Any, Iterator
+import urllib.request
+import urllib.error
+import threading
+import json
+import time
+
+import pytest
+
+from get_papers_list.server import SingleFlight, SearchService, PapersServer
+
+
+def test_same_calls_run_once() -> None:
+    flights:SingleFlight[int] = SingleFlight()
+    calls:list[int] = []
+    cleaned:list[int] = []
+    results:list[int] = []
+
+    def work() -> int:
+        time.sleep(0.2)     ## long enough for every caller to join
+        calls.append(1)
+        return 42
+
+    def caller() -> None:
+        with flights.join( 'key', work, cleaned.append ) as result:
+            results.append(result)
+
+    threads:list[threading.Thread] = [ threading.Thread(target=caller) for _ in range(5) ]
+    for thread in threads : thread.start()
+    for thread in threads : thread.join()
+    assert calls == [ 1 ]
+    assert results == [ 42 ] * 5
+    assert cleaned == [ 42 ]     ## cleaned once, by the last caller
+    assert len(flights) == 0
+
+
+def test_error_is_given_to_every_caller() -> None:
+    flights:SingleFlight[int] = SingleFlight()
+
+    def work() -> int:
+        raise ValueError('broken')
+
+    with pytest.raises(ValueError):
+        with flights.join( 'key', work ):
+            pass
+    assert len(flights) == 0
+
+
+@pytest.fixture
+def server(eutils:Any, client:Any) -> Iterator[PapersServer]:
+    service:SearchService = SearchService( client( eutils(30), workers=1 ) )
+    server:PapersServer = PapersServer( service, port=0 ).start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+def get(url:str) -> tuple[ int, bytes]:
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as error_:
+        return error_.code, error_.read()
+
+
+def test_search_is_sent(server:PapersServer) -> None:
+    status, body = get(f'{server.url}/search?query=cancer&format=jsonl')
+    assert status == 200
+    assert body.count(b'\n') > 0
+
+
+def test_bad_option_is_400(server:PapersServer) -> None:
+    status, body = get(f'{server.url}/search?query=cancer&format=xml')
+    assert status == 400
+    assert 'format' in json.loads(body)['error']
+
+
+def test_unexpected_error_is_500(server:PapersServer, monkeypatch:pytest.MonkeyPatch) -> None:
+    def broken(self:SearchService, options:dict[ str, Any]) -> str:
+        raise OSError('No space left on device')
+
+    monkeypatch.setattr(SearchService, 'run', broken)
+    status, body = get(f'{server.url}/search?query=cancer')
+    assert status == 500
+    assert json.loads(body) == { 'error': 'No space left on device', 'type': 'OSError' }
+    ## the server still answer the next request
+    assert get(f'{server.url}/stats')[0] == 200
@@ -0,0 +1,20 @@
+import os
+
+import pytest
+
+import bench_startup
+
+## the import budgets of bench_startup are for a quiet machine, the test give them a margin so a loaded ci
+## does not fail it ( only a real regression, like importing requests for --help, is many times over the budget )
+## STARTUP_BUDGET_SCALE=0 skip the timing and keep only the check of the imported modules
+SCALE:float = float( os.environ.get('STARTUP_BUDGET_SCALE', '4.0') )
+
+
+@pytest.mark.parametrize('name', list(bench_startup.CASES))
+def test_startup_imports(name:str) -> None:
+    code, arguments, budget, forbidden = bench_startup.CASES[name]
+    result = bench_startup.run_case( code, arguments, repeat=5 )
+    assert result['modules'], 'no -X importtime output'
+    assert [ module for module in forbidden if module in result['modules'] ] == []
+    if SCALE > 0:
+        assert result['import_ms'] <= budget * SCALE, f'{name} import take {result["import_ms"]} ms, budget {budget} ms'
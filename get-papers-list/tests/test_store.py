@@ -0,0 +1,47 @@
+import sqlite3
+from typing import Callable
+
+import pytest
+
+from get_papers_list.utils import APIs, search, sync
+from get_papers_list.store import RecordStore
+from get_papers_list.models import Paper, Author
+from get_papers_list.errors import RequestFailedError
+from fake_eutils import FakeEutils
+
+
+def stored(path:str) -> int:
+    with sqlite3.connect(path) as connection:
+        return connection.execute('SELECT count(*) FROM papers').fetchone()[0]
+
+
+def test_papers_round_trip(tmp_path) -> None:
+    store:RecordStore = RecordStore( str( tmp_path / 'store.db' ) )
+    paper:Paper = Paper( '12', '2023 Jan', 'Title', 'Journal', '10.1/2', 'Abstract', '20230101', [ Author( 'Doe, John', 'Doe J', 'Acme Inc.', ( 'Acme Inc.', ) ) ], ( 'Humans', ) )
+    assert store.upsert( iter([ paper ]) ) == 1
+    assert store.revisions([ '12', '13' ]) == { '12': '20230101' }
+    assert [ found.to_dict() for found in store.papers([ '13', '12' ]) ] == [ paper.to_dict() ]
+    store.close()
+
+
+def test_search_bigger_than_one_esearch(tmp_path, eutils:Callable[ ..., FakeEutils], client:Callable[ ..., APIs]) -> None:
+    ## more than the 10000 pmids of one esearch, every paper has to be in the store and in the output
+    server:FakeEutils = eutils(12000)
+    expected:str = str( tmp_path / 'expected.csv' )
+    search( 'cancer', filepath=expected, apis=client(server), batch_size=2000 )
+    output:str = str( tmp_path / 'output.csv' )
+    search( 'cancer', filepath=output, apis=client(server), batch_size=2000, store=RecordStore( str( tmp_path / 'store.db' ) ) )
+    assert stored( str( tmp_path / 'store.db' ) ) == 12000
+    with open(output) as file, open(expected) as whole:
+        assert file.read() == whole.read()
+
+
+def test_failed_download_keep_finished_batches(tmp_path, eutils:Callable[ ..., FakeEutils], client:Callable[ ..., APIs]) -> None:
+    server:FakeEutils = eutils( 3000, cut=frozenset({ 4 }) )
+    path:str = str( tmp_path / 'store.db' )
+    store:RecordStore = RecordStore(path)
+    with pytest.raises(RequestFailedError):
+        sync( client( server, workers=1, retries=0 ), store, [ 'cancer' ], 'relevance', -1, '', '', 500 )
+    assert stored(path) == 1500     ## the 3 batches before the broken one are committed
+    assert len( sync( client(server), store, [ 'cancer' ], 'relevance', -1, '', '', 500 ) ) == 3000
+    assert stored(path) == 3000
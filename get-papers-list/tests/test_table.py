@@ -0,0 +1,84 @@
+from typing import Callable, Optional
+from datetime import date
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from get_papers_list.table import PaperTable, publication_date
+from get_papers_list.models import Paper, Author
+from get_papers_list.utils import APIs, Processor, parse_records, search, filter_table
+from get_papers_list.errors import NoResultError
+from bench_parser import synthetic_record
+from fake_eutils import FakeEutils
+
+
+def dated(pmid:str, dop:str, *affiliations:str) -> Paper:
+    return Paper( pmid, dop, f'Title {pmid}', authors=[ Author(f'Author {number}', '', affiliation, ( affiliation, )) for number, affiliation in enumerate(affiliations) ] )
+
+
+@pytest.mark.parametrize('value, expected', [
+    ( '2023 Jan 15', date(2023, 1, 15) ),
+    ( '2023 Jan', date(2023, 1, 1) ),
+    ( '2023', date(2023, 1, 1) ),
+    ( '2023 Jan-Feb', date(2023, 1, 1) ),
+    ( '2021 Spring', date(2021, 3, 1) ),
+    ( '2023 Dec 25-31', date(2023, 12, 25) ),
+    ( 'unknown', None ),
+    ( '', None ),
+])
+def test_publication_date(value:str, expected:Optional[date]) -> None:
+    assert publication_date(value) == expected
+
+
+def test_papers_come_back_from_the_table(tmp_path) -> None:
+    papers:list[Paper] = parse_records( ''.join( synthetic_record(i) for i in range(20) ), filter=False )
+    PaperTable.from_papers(papers).save( str(tmp_path) )
+    table:PaperTable = PaperTable.load( str(tmp_path) )
+    assert len(table) == 20
+    assert list( table.to_papers() ) == papers
+    assert table.authors.column('emails').to_pylist()[0] == [ 'john.doe@pfizer.com' ]
+
+
+def test_academic_filter_is_the_one_of_the_papers() -> None:
+    papers:list[Paper] = parse_records( ''.join( synthetic_record(i) for i in range(20) ), filter=False )
+    processor:Processor = Processor()
+    assert list( PaperTable.from_papers(papers).non_academic().to_papers() ) == [ processor.filter(paper) for paper in papers ]
+
+
+def test_published_window() -> None:
+    table:PaperTable = PaperTable.from_papers([
+        dated( '1', '2022 Dec 31', 'Acme Inc.' ),
+        dated( '2', '2023 Jan', 'Acme Inc.' ),
+        dated( '3', '2023 Summer', 'Acme Inc.' ),
+        dated( '4', '2024', 'Acme Inc.' ),
+        dated( '5', 'unknown', 'Acme Inc.' ),
+    ])
+    assert len( table.published() ) == 5
+    window:PaperTable = table.published( date(2023, 1, 1), date(2023, 12, 31) )
+    assert window.papers.column('pubmed_id').to_pylist() == [ '2', '3' ]
+    assert window.authors.column('pubmed_id').to_pylist() == [ '2', '3' ]
+    assert table.published( end=date(2023, 1, 1) ).papers.column('pubmed_id').to_pylist() == [ '1', '2' ]
+
+
+def test_companies() -> None:
+    table:PaperTable = PaperTable.from_papers([
+        dated( '1', '2023', 'Pfizer Inc., New York.', 'Harvard University.' ),
+        dated( '2', '2023', 'Novartis AG, Basel.' ),
+        dated( '3', '2023' ),
+    ])
+    found:PaperTable = table.companies([ 'pfizer', 'Acme' ])
+    assert found.authors.column('affiliation').to_pylist() == [ 'Pfizer Inc., New York.' ]
+    assert len(found) == 3    ## papers are kept until with_authors
+    assert found.with_authors().papers.column('pubmed_id').to_pylist() == [ '1' ]
+    assert table.companies([]) is table
+
+
+def test_filter_table_give_the_output_of_the_search(tmp_path, eutils:Callable[ ..., FakeEutils], client:Callable[ ..., APIs]) -> None:
+    server:FakeEutils = eutils(300)
+    search( 'cancer', filepath=str( tmp_path / 'search.csv' ), apis=client(server), table=str( tmp_path / 'table' ), batch_size=100 )
+    filter_table( str( tmp_path / 'table' ), filepath=str( tmp_path / 'table.csv' ) )
+    with open( tmp_path / 'search.csv' ) as searched, open( tmp_path / 'table.csv' ) as filtered:
+        assert filtered.read() == searched.read()
+    with pytest.raises(NoResultError):
+        filter_table( str( tmp_path / 'table' ), filepath=str( tmp_path / 'none.csv' ), mindate='2024' )
@@ -0,0 +1,133 @@
+from typing import Callable
+import json
+import gzip
+
+import pytest
+
+from get_papers_list.utils import APIs, search
+from get_papers_list.metrics import METRICS
+from get_papers_list.models import Paper, Author
+from get_papers_list.writers import PaperWriter, JSONLWriter, ArrowWriter, WRITERS, detect_format, detect_compression
+from fake_eutils import FakeEutils
+
+
+def papers(count:int) -> list[Paper]:
+    return [
+        Paper( str(pmid), '2023 Jan', f'Title {pmid}', 'Journal', f'10.1000/{pmid}', authors=[ Author('Doe, John', 'Doe J', 'Acme Inc.'), Author('Roe, Jane') ] )
+        for pmid in range( 1, count + 1 )
+    ]
+
+
+def test_format_is_taken_from_the_extension() -> None:
+    assert detect_format('out.csv') == 'csv'
+    assert detect_format('out.ndjson') == 'jsonl'
+    assert detect_format('out.PARQUET') == 'parquet'
+    assert detect_format('out.arrows') == 'arrow'
+    assert detect_format('out.txt') == 'csv'
+    assert detect_format('out.csv', 'jsonl') == 'jsonl'
+
+
+def test_writer_without_write_fail_when_made() -> None:
+    class Broken(PaperWriter):
+        pass
+
+    with pytest.raises(TypeError):
+        Broken('out.jsonl')
+    with pytest.raises(TypeError):
+        ArrowWriter('out.parquet')
+
+
+def test_jsonl(tmp_path) -> None:
+    path:str = str( tmp_path / 'out.jsonl' )
+    assert JSONLWriter( path, query='cancer' ).write( papers(2) ) == 2
+    with open(path, encoding='utf-8') as file:
+        records:list[dict] = [ json.loads(line) for line in file ]
+    assert records[1] == {
+        'query': 'cancer',
+        'pubmed_id': '2',
+        'date_of_publication': '2023 Jan',
+        'title': 'Title 2',
+        'journal': 'Journal',
+        'doi': '10.1000/2',
+        'authors': [ { 'name': 'Doe, John', 'affiliation': 'Acme Inc.' }, { 'name': 'Roe, Jane', 'affiliation': None } ],
+    }
+
+
+@pytest.mark.parametrize('format', [ 'parquet', 'arrow' ])
+def test_columnar(tmp_path, format:str) -> None:
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+    import pyarrow.ipc
+    path:str = str( tmp_path / f'out.{format}' )
+    ## many batches, the dictionaries of every batch are different
+    assert WRITERS[format]( path, batch_size=3 ).write( papers(10) ) == 10
+    if format == 'parquet':
+        table:pyarrow.Table = pyarrow.parquet.read_table(path)
+    else:
+        table = pyarrow.ipc.open_stream( pyarrow.OSFile(path) ).read_all()
+    assert table.column_names == [ 'pubmed_id', 'date_of_publication', 'title', 'journal', 'doi', 'authors' ]
+    assert table.column('pubmed_id').to_pylist() == [ str(pmid) for pmid in range( 1, 11 ) ]
+    assert table.column('authors').to_pylist()[0] == [ { 'name': 'Doe, John', 'affiliation': 'Acme Inc.' }, { 'name': 'Roe, Jane', 'affiliation': None } ]
+
+
+def test_columnar_without_papers(tmp_path) -> None:
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+    path:str = str( tmp_path / 'out.parquet' )
+    assert WRITERS['parquet'](path).write([]) == 0
+    assert pyarrow.parquet.read_table(path).num_rows == 0
+
+
+def test_search_write_the_format_of_the_extension(tmp_path, eutils:Callable[ ..., FakeEutils], client:Callable[ ..., APIs]) -> None:
+    server:FakeEutils = eutils(50)
+    search( 'cancer', filepath=str( tmp_path / 'out.csv' ), apis=client(server) )
+    search( 'cancer', filepath=str( tmp_path / 'out.jsonl' ), apis=client(server) )
+    with open( tmp_path / 'out.csv', encoding='utf-8' ) as file:
+        rows:int = len( file.read().splitlines() ) - 1
+    with open( tmp_path / 'out.jsonl', encoding='utf-8' ) as file:
+        records:list[dict] = [ json.loads(line) for line in file ]
+    assert len(records) == 50
+    ## the csv has one row for every non academic author, jsonl one line for every paper with its authors
+    assert rows == sum( len( record['authors'] ) for record in records )
+
+
+def test_compression_is_taken_from_the_last_extension() -> None:
+    assert detect_compression('out.csv.gz') == 'gzip'
+    assert detect_compression('out.jsonl.ZST') == 'zstd'
+    assert detect_compression('out.csv') == ''
+    assert detect_format('out.jsonl.gz') == 'jsonl'
+    assert detect_format('out.gz') == 'csv'
+
+
+def read_compressed(path:str) -> str:
+    if path.endswith('.gz'):
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as file:
+            return file.read()
+    zstandard = pytest.importorskip('zstandard')
+    with open(path, 'rb') as file:
+        return zstandard.ZstdDecompressor().stream_reader(file).read().decode('utf-8')
+
+
+@pytest.mark.parametrize('name', [ 'out.csv.gz', 'out.jsonl.gz', 'out.csv.zst', 'out.jsonl.zst' ])
+def test_compressed_output(tmp_path, eutils:Callable[ ..., FakeEutils], client:Callable[ ..., APIs], name:str) -> None:
+    if name.endswith('.zst') : pytest.importorskip('zstandard')
+    server:FakeEutils = eutils(50)
+    plain:str = str( tmp_path / name.rsplit('.', 1)[0] )
+    search( 'cancer', filepath=plain, apis=client(server) )
+    search( 'cancer', filepath=str( tmp_path / name ), apis=client(server) )
+    with open(plain, encoding='utf-8', newline='') as file:
+        assert read_compressed( str( tmp_path / name ) ) == file.read()
+
+
+def test_gzipped_download_give_the_same_papers(tmp_path, eutils:Callable[ ..., FakeEutils], client:Callable[ ..., APIs]) -> None:
+    downloaded:list[float] = []
+    for compress in ( False, True ):
+        METRICS.enable()
+        try:
+            search( 'cancer', filepath=str( tmp_path / f'{compress}.csv' ), apis=client( eutils( 500, compress=compress ) ), batch_size=100 )
+            downloaded.append( METRICS.report()['counters']['bytes_downloaded'] )
+        finally:
+            METRICS.disable()
+    with open( tmp_path / 'False.csv' ) as plain, open( tmp_path / 'True.csv' ) as inflated:
+        assert inflated.read() == plain.read()
+    assert downloaded[1] < downloaded[0] / 3     ## the bytes on the wire are the gzipped ones